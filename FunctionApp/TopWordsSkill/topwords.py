@@ -0,0 +1,112 @@
+import array
+import heapq
+import json
+import os
+import re
+
+from collections import Counter
+from itertools import islice
+
+# This module implements the tokenizer and top-words engine of the TopWordsSkill
+# Azure Function.  It has no dependency on azure.functions so that it can be unit
+# tested and benchmarked locally; see FunctionApp/benchmark_topwords.py.
+# Chris Joakim, Microsoft, 2020/10/19
+
+max_words = 2000
+top_n = 20
+
+# The scope is either 'prefix', counting the first max_words words as originally
+# implemented, or 'document', counting every word with a bounded-memory TopKCounter.
+top_words_scope = os.environ.get('TOPWORDS_SCOPE', 'prefix')
+
+# TODO - enhance this set of stopwords
+stopwords = frozenset(["i", "me", "my", "myself", "we", "our", "ours", "ourselves", "you", "your", "yours", "yourself", "yourselves", "he", "him", "his", "himself", "she", "her", "hers", "herself", "it", "its", "itself", "they", "them", "their", "theirs", "themselves", "what", "which", "who", "whom", "this", "that", "these", "those", "am", "is", "are", "was", "were", "be", "been", "being", "have", "has", "had", "having", "do", "does", "did", "doing", "a", "an", "the", "and", "but", "if", "or", "because", "as", "until", "while", "of", "at", "by", "for", "with", "about", "against", "between", "into", "through", "during", "before", "after", "above", "below", "to", "from", "up", "down", "in", "out", "on", "off", "over", "under", "again", "further", "then", "once", "here", "there", "when", "where", "why", "how", "all", "any", "both", "each", "few", "more", "most", "other", "some", "such", "no", "nor", "not", "only", "own", "same", "so", "than", "too", "very", "s", "t", "can", "will", "just", "don", "should", "now"])
+
+# Words are delimited by spaces, newlines, tabs and periods; a compiled regex yields
+# them lazily in a single pass, so scanning stops as soon as max_words are found.
+# Quotes, brackets and punctuation are then deleted from each word with a translate table.
+word_pattern = re.compile(r'[^ \n\t.]+')
+delete_table = str.maketrans('', '', '\'"()[],!?')
+
+
+def iter_words(input_text):
+    # lazily yield the scrubbed, lowercased words of length > 2
+    for match in word_pattern.finditer(input_text):
+        word = match.group().translate(delete_table).lower().strip()
+        if len(word) > 2:
+            yield word
+
+def tokenize(input_text, max_count=max_words):
+    # return the first max_count words; used by the tests and benchmark
+    return list(islice(iter_words(input_text), max_count))
+
+def top_words(counts):
+    top_words_list = list()
+    for word, count in counts.most_common(top_n):
+        if len(word) > 1 and word not in stopwords:
+            top_words_list.append(word)
+    return top_words_list
+
+def getTopWords(input_text, scope=None):
+    if scope is None:
+        scope = top_words_scope
+    if scope == 'document':
+        counter = TopKCounter()
+        for word in iter_words(input_text):
+            if word not in stopwords:
+                counter.add(word)
+        return json.dumps(top_words(counter))
+    # count incrementally, scanning no further than the first max_words words
+    return json.dumps(top_words(Counter(islice(iter_words(input_text), max_words))))
+
+
+class TopKCounter(object):
+    """
+    Approximate word counts over an entire document in constant memory.  A
+    count-min sketch of depth x width counters estimates every word's count, and
+    at most capacity candidate words are retained; the lowest-count candidate is
+    evicted, via a min-heap, when a more frequent word is seen.
+    """
+
+    def __init__(self, capacity=1000, width=8192, depth=4):
+        self.capacity = capacity
+        self.width = width
+        self.depth = depth
+        self.sketch = [array.array('l', [0]) * width for i in range(depth)]
+        self.candidates = dict()
+        self.heap = list()
+
+    def add(self, word):
+        h = hash(word)
+        h1, h2 = h & 0xffffffff, ((h >> 32) & 0xffffffff) | 1
+        estimate = None
+        for i in range(self.depth):
+            row = self.sketch[i]
+            idx = (h1 + i * h2) % self.width
+            row[idx] = row[idx] + 1
+            if estimate is None or row[idx] < estimate:
+                estimate = row[idx]
+        if word in self.candidates or len(self.candidates) < self.capacity:
+            self.candidates[word] = estimate
+            heapq.heappush(self.heap, (estimate, word))
+        elif estimate > self.min_candidate_count():
+            del self.candidates[heapq.heappop(self.heap)[1]]
+            self.candidates[word] = estimate
+            heapq.heappush(self.heap, (estimate, word))
+        if len(self.heap) > self.capacity * 4:
+            # discard the stale heap entries of updated candidates
+            self.heap = [(c, w) for w, c in self.candidates.items()]
+            heapq.heapify(self.heap)
+
+    def min_candidate_count(self):
+        # pop stale entries until the heap top matches its candidate's current count
+        while True:
+            count, word = self.heap[0]
+            if self.candidates.get(word) == count:
+                return count
+            heapq.heappop(self.heap)
+
+    def most_common(self, n):
+        # ties retain first-seen order, as with collections.Counter
+        ordered = sorted(self.candidates.items(), key=lambda item: item[1], reverse=True)
+        return ordered[0:n]
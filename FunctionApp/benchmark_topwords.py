@@ -0,0 +1,94 @@
+"""
+Usage:
+    python FunctionApp/benchmark_topwords.py
+    python FunctionApp/benchmark_topwords.py 50
+"""
+
+# Benchmark the TopWordsSkill tokenizer engine against the original chained
+# str.replace implementation, using the sample texts in data/test_merged_text.json.
+# Both implementations must produce identical results.
+# Chris Joakim, Microsoft, 2020/10/19
+
+import json
+import os
+import sys
+import time
+
+from collections import Counter
+
+app_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(app_dir, 'TopWordsSkill'))
+
+import topwords
+
+samples_file = os.path.join(app_dir, '..', 'data', 'test_merged_text.json')
+
+stopwords_list = sorted(topwords.stopwords)
+
+
+def legacy_get_top_words(input_text):
+    # the original implementation, retained here as the benchmark baseline
+    max_words = 2000
+    words_list, top_words_list = list(), list()
+    scrubbed_text = input_text.replace("\n",' ')\
+        .replace("\t",' ').replace("\'",'').replace("\"",'')\
+        .replace('.', ' ').replace('(', '').replace(')', '')\
+        .replace('[', '').replace(']', '')
+
+    for input_word in scrubbed_text.split(' '):
+        tword = legacy_translate_word(input_word).strip()
+        if len(tword) > 2:
+            if len(words_list) < max_words:
+                words_list.append(tword)
+
+    c = Counter(words_list[0:max_words])
+    for tw_tup in c.most_common(20):
+        if len(tw_tup[0]) > 1:
+            word = tw_tup[0]
+            if word in stopwords_list:
+                pass
+            else:
+                top_words_list.append(word)
+    return json.dumps(top_words_list)
+
+def legacy_translate_word(w):
+    return w.replace('.','').replace(',','').replace('!','').replace('?','').lower().strip()
+
+def load_samples():
+    with open(samples_file, 'rt') as f:
+        return json.loads(f.read())
+
+def time_function(function, texts, iterations):
+    t1 = time.perf_counter()
+    for i in range(iterations):
+        for text in texts:
+            function(text)
+    return time.perf_counter() - t1
+
+def run(iterations):
+    samples = load_samples()
+    texts = [sample['mergedText'] for sample in samples]
+    for sample in samples:
+        expected = legacy_get_top_words(sample['mergedText'])
+        actual = topwords.getTopWords(sample['mergedText'])
+        if expected != actual:
+            print('MISMATCH: {}\n  legacy: {}\n  engine: {}'.format(sample['file_name'], expected, actual))
+            return 1
+    total_chars = sum([len(t) for t in texts])
+    legacy_secs = time_function(legacy_get_top_words, texts, iterations)
+    engine_secs = time_function(topwords.getTopWords, texts, iterations)
+    print('samples: {}  chars: {}  iterations: {}'.format(len(texts), total_chars, iterations))
+    print('legacy: {:.4f}s  {:.2f} ms/pass'.format(legacy_secs, legacy_secs * 1000.0 / iterations))
+    print('engine: {:.4f}s  {:.2f} ms/pass'.format(engine_secs, engine_secs * 1000.0 / iterations))
+    print('speedup: {:.2f}x'.format(legacy_secs / engine_secs))
+    document_secs = time_function(lambda t: topwords.getTopWords(t, 'document'), texts, iterations)
+    print('engine, whole document scope: {:.4f}s  {:.2f} ms/pass'.format(
+        document_secs, document_secs * 1000.0 / iterations))
+    return 0
+
+
+if __name__ == "__main__":
+    iterations = 20
+    if len(sys.argv) > 1:
+        iterations = int(sys.argv[1])
+    sys.exit(run(iterations))
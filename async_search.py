@@ -0,0 +1,135 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import asyncio
+import json
+import os
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from base import BaseClass
+from transport import Transport
+from urls import Urls
+
+
+class AsyncSearchClient(BaseClass):
+    """
+    This is the asyncio-based counterpart to class SearchClient.  It fans out many
+    (index, named search) pairs concurrently, bounded by a configurable concurrency
+    limit and a per-request timeout, and writes each result as soon as it completes.
+    The HTTP calls run on the pooled Transport in a thread pool, so no additional
+    async http library is required.
+    """
+
+    def __init__(self, concurrency=8, timeout=30.0, transport=None):
+        BaseClass.__init__(self)
+        self.concurrency = int(concurrency)
+        self.timeout = float(timeout)
+        self.urls = Urls()
+        self.transport = transport
+        if self.transport is None:
+            self.transport = Transport(pool_size=self.concurrency)
+        self.query_headers = dict()
+        self.query_headers['Content-Type'] = 'application/json'
+        self.query_headers['api-key'] = os.environ.get('AZURE_SEARCH_QUERY_KEY', '')
+        self.named_searches = self.load_json_file('searches.json')
+        # each search is measured, so throttled responses are reported rather than
+        # retried; retry sleeps would otherwise be included in the latencies
+        self.max_attempts = 1
+        self.summary_file = 'tmp/async_search_sweep.jsonl'
+
+    def search_names(self, names_arg):
+        if names_arg == 'all':
+            return sorted(self.named_searches.keys())
+        return names_arg.split(',')
+
+    def index_for_search(self, search_name):
+        # the named searches in searches.json target either the airports or documents index
+        if 'airports' in search_name:
+            return 'airports'
+        return 'documents'
+
+    def sweep_pairs(self, indexes_arg, names_arg):
+        pairs = list()
+        for search_name in self.search_names(names_arg):
+            if indexes_arg == 'auto':
+                pairs.append((self.index_for_search(search_name), search_name))
+            else:
+                for idx_name in indexes_arg.split(','):
+                    pairs.append((idx_name, search_name))
+        return pairs
+
+    def search_params(self, idx_name, search_name):
+        if search_name in self.named_searches.keys():
+            return self.named_searches[search_name]
+        if idx_name == 'airports':
+            return self.named_searches['all_airports']
+        return self.named_searches['all_documents']
+
+    def execute_search(self, idx_name, search_name):
+        # runs on a worker thread
+        url = self.urls.search_index(idx_name)
+        params = self.search_params(idx_name, search_name)
+        return self.transport.post(
+            url, self.query_headers, params, timeout=self.timeout, max_attempts=self.max_attempts)
+
+    async def search(self, semaphore, executor, idx_name, search_name):
+        result = {'index': idx_name, 'search': search_name}
+        async with semaphore:
+            t1 = time.time()
+            loop = asyncio.get_event_loop()
+            try:
+                future = loop.run_in_executor(executor, self.execute_search, idx_name, search_name)
+                r = await asyncio.wait_for(future, self.timeout)
+                result['status'] = r.status_code
+                if r.status_code == 200:
+                    resp_obj = json.loads(r.text)
+                    result['count'] = resp_obj.get('@odata.count')
+                    result['response'] = resp_obj
+                else:
+                    result['error'] = r.text
+            except asyncio.TimeoutError:
+                result['status'] = None
+                result['error'] = 'timeout after {} seconds'.format(self.timeout)
+            except Exception as e:
+                result['status'] = None
+                result['error'] = str(e)
+            result['elapsed'] = round(time.time() - t1, 4)
+        return result
+
+    async def sweep(self, pairs, callback=None):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = list()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            tasks = [self.search(semaphore, executor, i, s) for (i, s) in pairs]
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                if callback is not None:
+                    callback(result)
+                results.append(result)
+        return results
+
+    def run_sweep(self, indexes_arg, names_arg):
+        pairs = self.sweep_pairs(indexes_arg, names_arg)
+        print('async search sweep: {} searches, concurrency: {}, timeout: {}'.format(
+            len(pairs), self.concurrency, self.timeout))
+        t1 = time.time()
+        with open(self.summary_file, 'wt') as summary:
+            def write_result(result):
+                if 'response' in result:
+                    outfile = 'tmp/{}_{}.json'.format(result['index'], result['search'])
+                    self.write_json_file(result.pop('response'), outfile)
+                summary.write(json.dumps(result) + '\n')
+                summary.flush()
+                print('completed: {} {} status: {} count: {} elapsed: {}'.format(
+                    result['index'], result['search'], result['status'],
+                    result.get('count'), result['elapsed']))
+            results = asyncio.run(self.sweep(pairs, write_result))
+        errors = [r for r in results if r['status'] != 200]
+        print('file written: {}'.format(self.summary_file))
+        print('sweep complete; searches: {}  errors: {}  elapsed: {}'.format(
+            len(results), len(errors), round(time.time() - t1, 4)))
+        return results
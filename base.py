@@ -8,6 +8,7 @@ __email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
 __license__ = "MIT"
 __version__ = "2020.10.19"
 
+import gzip
 import json
 import os
 import sys
@@ -57,3 +58,57 @@ class BaseClass:
         with open(outfile, 'wt') as f:
             f.write(json.dumps(obj, sort_keys=False, indent=2))
             print('file written: {}'.format(outfile))
+
+    def iter_json_documents(self, infile):
+        # Yield the objects in a JSON array file, or in a JSON Lines file (*.jsonl),
+        # one at a time without loading the whole file.  Gzipped files (*.gz) are
+        # also supported.
+        opener = open
+        if infile.endswith('.gz'):
+            opener = gzip.open
+        with opener(infile, 'rt', encoding='utf-8') as f:
+            first = ''
+            while True:
+                c = f.read(1)
+                if c == '' or not c.isspace():
+                    first = c
+                    break
+            if first == '[':
+                for obj in self.iter_json_array(f):
+                    yield obj
+            elif first != '':
+                line = first + f.readline()
+                if len(line.strip()) > 0:
+                    yield json.loads(line)
+                for line in f:
+                    if len(line.strip()) > 0:
+                        yield json.loads(line)
+
+    def iter_json_array(self, f, chunk_size=65536):
+        # Incrementally decode the elements of a JSON array; the opening '['
+        # has already been read from file object f.
+        decoder = json.JSONDecoder()
+        buf, pos, eof = '', 0, False
+        while True:
+            while pos < len(buf) and (buf[pos].isspace() or buf[pos] == ','):
+                pos = pos + 1
+            if pos < len(buf) and buf[pos] == ']':
+                return
+            if pos < len(buf):
+                try:
+                    obj, end = decoder.raw_decode(buf, pos)
+                    # a value at the very end of the buffer may be truncated, i.e. a number
+                    if end < len(buf) or eof:
+                        yield obj
+                        pos = end
+                        continue
+                except ValueError:
+                    if eof:
+                        raise
+            if eof:
+                return
+            chunk = f.read(chunk_size)
+            if chunk == '':
+                eof = True
+            buf = buf[pos:] + chunk
+            pos = 0
@@ -0,0 +1,132 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import os
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from async_search import AsyncSearchClient
+
+
+def percentile(sorted_values, pct):
+    # linear interpolation between the closest ranks of a sorted list
+    if len(sorted_values) == 0:
+        return None
+    rank = (len(sorted_values) - 1) * (pct / 100.0)
+    lo = int(rank)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (rank - lo)
+
+
+class SearchBenchmark(AsyncSearchClient):
+    """
+    Replays the named searches in searches.json a number of times each, at a given
+    concurrency, and reports the latency percentiles, throughput, and error rate per
+    search.  Three latencies are captured per request; the client-side wall time,
+    the requests library elapsed time (until the response headers), and the service
+    processing time from the elapsed-time response header.  The results are written
+    to tmp/bench_<label>_<epoch>.json so that runs, for example against the
+    documents_index_v1 and documents_index_v2 schemas, can be compared.
+    """
+
+    def __init__(self, iterations=10, concurrency=4, timeout=30.0, warmup=1, transport=None):
+        AsyncSearchClient.__init__(self, concurrency, timeout, transport)
+        self.iterations = int(iterations)
+        self.warmup = int(warmup)
+        self.results_dir = 'tmp'
+
+    def timed_search(self, idx_name, search_name):
+        sample = {'status': None, 'client_ms': None, 'elapsed_ms': None, 'service_ms': None}
+        t1 = time.perf_counter()
+        try:
+            r = self.execute_search(idx_name, search_name)
+            sample['client_ms'] = (time.perf_counter() - t1) * 1000.0
+            sample['status'] = r.status_code
+            if getattr(r, 'elapsed', None) is not None:
+                sample['elapsed_ms'] = r.elapsed.total_seconds() * 1000.0
+            service_ms = r.headers.get('elapsed-time')
+            if service_ms is not None:
+                sample['service_ms'] = float(service_ms)
+        except Exception as e:
+            sample['client_ms'] = (time.perf_counter() - t1) * 1000.0
+            sample['error'] = str(e)
+        return sample
+
+    def bench_search(self, executor, idx_name, search_name):
+        for i in range(self.warmup):
+            self.timed_search(idx_name, search_name)
+        t1 = time.perf_counter()
+        futures = [executor.submit(self.timed_search, idx_name, search_name) for i in range(self.iterations)]
+        samples = [f.result() for f in futures]
+        wall = max(time.perf_counter() - t1, 0.000001)
+        return self.summarize(idx_name, search_name, samples, wall)
+
+    def summarize(self, idx_name, search_name, samples, wall):
+        ok = [s for s in samples if s['status'] == 200]
+        result = {'index': idx_name, 'search': search_name, 'requests': len(samples)}
+        result['errors'] = len(samples) - len(ok)
+        result['error_rate'] = round(result['errors'] / float(max(len(samples), 1)), 4)
+        result['throughput'] = round(len(samples) / wall, 2)
+        result['statuses'] = dict()
+        for s in samples:
+            key = str(s['status'])
+            result['statuses'][key] = result['statuses'].get(key, 0) + 1
+        for name in ['client_ms', 'elapsed_ms', 'service_ms']:
+            values = sorted([s[name] for s in ok if s[name] is not None])
+            if len(values) > 0:
+                result[name] = {
+                    'p50': round(percentile(values, 50), 2),
+                    'p90': round(percentile(values, 90), 2),
+                    'p99': round(percentile(values, 99), 2),
+                    'mean': round(sum(values) / len(values), 2),
+                    'max': round(values[-1], 2)
+                }
+        return result
+
+    def run(self, indexes_arg, names_arg, label='bench'):
+        pairs = self.sweep_pairs(indexes_arg, names_arg)
+        print('bench_searches: {} searches  iterations: {}  concurrency: {}  warmup: {}'.format(
+            len(pairs), self.iterations, self.concurrency, self.warmup))
+        report = {'label': label, 'epoch': int(time.time()), 'search_url': self.urls.search_url}
+        report['iterations'] = self.iterations
+        report['concurrency'] = self.concurrency
+        report['results'] = list()
+        # each search is measured separately, so that its throughput is not diluted by the others
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for (idx_name, search_name) in pairs:
+                result = self.bench_search(executor, idx_name, search_name)
+                report['results'].append(result)
+                self.display_result(result)
+        outfile = os.path.join(self.results_dir, 'bench_{}_{}.json'.format(label, report['epoch']))
+        self.write_json_file(report, outfile)
+        report['outfile'] = outfile
+        return report
+
+    def display_result(self, result):
+        client = result.get('client_ms', {})
+        print('{} {}: p50: {} p90: {} p99: {} ms  throughput: {}/s  error_rate: {}'.format(
+            result['index'], result['search'], client.get('p50'), client.get('p90'),
+            client.get('p99'), result['throughput'], result['error_rate']))
+
+    def compare(self, file1, file2):
+        # print the change in the p50 and p99 latencies of the searches common to two runs
+        report1, report2 = self.load_json_file(file1), self.load_json_file(file2)
+        results1 = dict([((r['index'], r['search']), r) for r in report1['results']])
+        rows = list()
+        print('bench compare: {} ({}) -> {} ({})'.format(file1, report1['label'], file2, report2['label']))
+        for r2 in report2['results']:
+            r1 = results1.get((r2['index'], r2['search']))
+            if r1 is None or 'client_ms' not in r1 or 'client_ms' not in r2:
+                continue
+            row = {'index': r2['index'], 'search': r2['search']}
+            for p in ['p50', 'p99']:
+                row[p] = [r1['client_ms'][p], r2['client_ms'][p]]
+                row[p + '_change'] = round((r2['client_ms'][p] - r1['client_ms'][p]) / max(r1['client_ms'][p], 0.001), 3)
+            rows.append(row)
+            print('{} {}: p50: {} -> {} ({:+.1%})  p99: {} -> {} ({:+.1%})'.format(
+                row['index'], row['search'], row['p50'][0], row['p50'][1], row['p50_change'],
+                row['p99'][0], row['p99'][1], row['p99_change']))
+        return rows
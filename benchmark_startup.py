@@ -0,0 +1,90 @@
+"""
+Usage:
+    python benchmark_startup.py
+    python benchmark_startup.py 20
+    python benchmark_startup.py 20 tmp/search-client-baseline.py
+"""
+
+# Benchmark the cold-start time of search-client.py, i.e. the process wall time
+# of the commands which make no http requests, as invoked from cron and CI.
+# Optionally compare it to a baseline version of the script, for example the
+# version at the commit before the lazy-import change, where <ref> names it:
+#   git show <ref>:search-client.py > tmp/search-client-baseline.py
+# Chris Joakim, Microsoft, 2020/10/19
+
+import os
+import subprocess
+import sys
+import time
+
+repo_dir = os.path.dirname(os.path.abspath(__file__))
+
+commands = [
+    ['display_env'],
+    ['index_schema_diff', 'schemas/documents_index_v1.json', 'schemas/airports_index_v1.json'],
+    ['indexer_schema_diff', 'schemas/documents_indexer_v1.json', 'schemas/documents_indexer_v1.json']
+]
+
+# the environment variables read at startup; placeholder values unless already set
+env_defaults = {
+    'AZURE_SEARCH_STORAGE_ACCOUNT': 'x',
+    'AZURE_SEARCH_STORAGE_KEY': 'x',
+    'AZURE_SEARCH_STORAGE_CONNECTION_STRING': 'x',
+    'AZURE_SEARCH_URL': 'https://example.search.windows.net',
+    'AZURE_SEARCH_NAME': 'example',
+    'AZURE_SEARCH_ADMIN_KEY': 'x',
+    'AZURE_SEARCH_QUERY_KEY': 'x'
+}
+
+
+def run_env():
+    env = dict(os.environ)
+    for name, value in env_defaults.items():
+        env.setdefault(name, value)
+    # a baseline script in another directory imports the modules of this directory
+    env['PYTHONPATH'] = repo_dir
+    return env
+
+def time_command(script, args, env):
+    t1 = time.perf_counter()
+    subprocess.run([sys.executable, script] + args, cwd=repo_dir, env=env,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return (time.perf_counter() - t1) * 1000.0
+
+def median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    if len(values) % 2 == 1:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2.0
+
+def benchmark(script, iterations, env):
+    results = dict()
+    for args in commands:
+        time_command(script, args, env)  # warm the filesystem cache and the .pyc files
+        times = [time_command(script, args, env) for i in range(iterations)]
+        results[args[0]] = {'median_ms': round(median(times), 1), 'min_ms': round(min(times), 1)}
+    return results
+
+
+if __name__ == "__main__":
+    iterations = 10
+    if len(sys.argv) > 1:
+        iterations = int(sys.argv[1])
+    env = run_env()
+    scripts = [os.path.join(repo_dir, 'search-client.py')]
+    if len(sys.argv) > 2:
+        scripts.insert(0, sys.argv[2])
+
+    reports = [(script, benchmark(script, iterations, env)) for script in scripts]
+    print('startup time, median of {} runs:'.format(iterations))
+    for args in commands:
+        name = args[0]
+        medians = ['{:>10} ms'.format(report[name]['median_ms']) for (script, report) in reports]
+        line = '{:<22} {}'.format(name, '  '.join(medians))
+        if len(reports) == 2:
+            before, after = reports[0][1][name]['median_ms'], reports[1][1][name]['median_ms']
+            line = '{}  ({:+.1%})'.format(line, (after - before) / max(before, 0.001))
+        print(line)
+    for script, report in reports:
+        print('  {}'.format(script))
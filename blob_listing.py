@@ -0,0 +1,167 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import csv
+import json
+import os
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+listing_fields = ['name', 'size', 'etag', 'last_modified']
+
+
+def blob_record(blob):
+    # the listed properties of a BlobProperties object
+    last_modified = blob.last_modified
+    if hasattr(last_modified, 'isoformat'):
+        last_modified = last_modified.isoformat()
+    return {'name': blob.name, 'size': blob.size, 'etag': blob.etag, 'last_modified': last_modified}
+
+def is_blob_prefix(item):
+    # walk_blobs yields BlobPrefix objects, the virtual directories, along with the blobs
+    return not hasattr(item, 'size')
+
+
+class ListingWriter(object):
+    """
+    Writes the listed blob records to a JSON Lines file, or a CSV file if the
+    filename ends with .csv, as pages of blobs arrive from concurrent listers.
+    """
+
+    def __init__(self, outfile):
+        self.outfile = outfile
+        self.count = 0
+        self.lock = threading.Lock()
+        outdir = os.path.dirname(outfile)
+        if len(outdir) > 0:
+            os.makedirs(outdir, exist_ok=True)
+        self.f = open(outfile, 'wt', newline='', encoding='utf-8')
+        self.csv_writer = None
+        if outfile.lower().endswith('.csv'):
+            self.csv_writer = csv.DictWriter(self.f, fieldnames=listing_fields)
+            self.csv_writer.writeheader()
+
+    def write(self, blobs):
+        records = [blob_record(blob) for blob in blobs]
+        with self.lock:
+            for record in records:
+                if self.csv_writer is None:
+                    self.f.write(json.dumps(record))
+                    self.f.write('\n')
+                else:
+                    self.csv_writer.writerow(record)
+            self.count = self.count + len(records)
+
+    def close(self):
+        self.f.close()
+        print('file written: {}  blobs: {}'.format(self.outfile, self.count))
+
+
+class BlobLister(object):
+    """
+    An instance of this class is created by StorageClient to list the blobs of a
+    large container.  Each listing is paged explicitly, results_per_page at a time,
+    and a failed page request is retried from the continuation token of the last
+    page rather than from the start.  The container is partitioned by name prefix
+    and the partitions are listed concurrently.  With prefixes 'auto' the top-level
+    virtual directories are the partitions; the blobs at the top level are listed
+    by that walk, so a flat container, with no '/' in its names, is listed serially.
+    Otherwise prefixes is a comma-separated list, such as 0,1,...,f for names that
+    begin with a hex digit; blobs matching none of them are not listed, so the
+    report of such a listing has complete False.  Each page of blobs is passed to
+    the callback as it arrives, so the listing is never held in memory.
+    """
+
+    def __init__(self, container_client, workers=8, page_size=5000, delimiter='/', max_attempts=3):
+        self.container_client = container_client
+        self.workers = int(workers)
+        self.page_size = int(page_size)
+        self.delimiter = delimiter
+        self.max_attempts = int(max_attempts)
+        self.blobs = 0
+        self.bytes = 0
+        self.pages = 0
+        self.retries = 0
+        self.lock = threading.Lock()
+
+    def run(self, callback, prefixes='auto'):
+        t1 = time.time()
+        complete = (prefixes == 'auto')
+        if complete:
+            partitions = self.list_prefix('', callback, True)
+            if len(partitions) == 0:
+                print('list_blobs, no virtual directories; the container was listed serially by the walk')
+        else:
+            partitions = self.parse_prefixes(prefixes)
+            print('list_blobs warning; the listing is partial, blobs matching none of the prefixes {} are not listed'.format(
+                ','.join(partitions)))
+        print('list_blobs, partitions: {}  workers: {}'.format(len(partitions), self.workers))
+        if len(partitions) > 0:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                list(executor.map(lambda prefix: self.list_prefix(prefix, callback), partitions))
+        elapsed = max(time.time() - t1, 0.001)
+        return {
+            'blobs': self.blobs,
+            'mb': round(self.bytes / 1048576.0, 3),
+            'pages': self.pages,
+            'partitions': len(partitions),
+            'complete': complete,
+            'retries': self.retries,
+            'elapsed': round(elapsed, 3),
+            'blobs_per_sec': round(self.blobs / elapsed, 3)
+        }
+
+    def parse_prefixes(self, prefixes):
+        # a comma-separated list; a prefix that starts with another one would list its blobs twice
+        tokens = sorted(set([p.strip() for p in prefixes.split(',') if len(p.strip()) > 0]))
+        return [p for p in tokens if not any([p != q and p.startswith(q) for q in tokens])]
+
+    def list_prefix(self, prefix, callback, walk=False):
+        # list the blobs, page by page, and return the virtual directory prefixes if walk is True
+        token, pages, attempts = None, None, 0
+        sub_prefixes = list()
+        while True:
+            try:
+                if pages is None:
+                    pages = self.paged(prefix, walk).by_page(continuation_token=token)
+                page = list(next(pages))
+            except StopIteration:
+                break
+            except Exception as e:
+                attempts = attempts + 1
+                if attempts >= self.max_attempts:
+                    raise
+                print('list_blobs retry, prefix: {}  attempt: {}  {}'.format(prefix, attempts, e))
+                with self.lock:
+                    self.retries = self.retries + 1
+                time.sleep(0.1 * (2 ** attempts))
+                pages = None
+                continue
+            attempts = 0
+            token = pages.continuation_token
+            blobs = list()
+            for item in page:
+                if walk and is_blob_prefix(item):
+                    sub_prefixes.append(item.name)
+                else:
+                    blobs.append(item)
+            callback(blobs)
+            with self.lock:
+                self.pages = self.pages + 1
+                self.blobs = self.blobs + len(blobs)
+                self.bytes = self.bytes + sum([blob.size or 0 for blob in blobs])
+                if self.pages % 100 == 0:
+                    print('list_blobs, pages: {}  blobs: {}'.format(self.pages, self.blobs))
+        return sub_prefixes
+
+    def paged(self, prefix, walk):
+        name_starts_with = prefix if len(prefix) > 0 else None
+        if walk:
+            return self.container_client.walk_blobs(
+                name_starts_with=name_starts_with, delimiter=self.delimiter, results_per_page=self.page_size)
+        return self.container_client.list_blobs(
+            name_starts_with=name_starts_with, results_per_page=self.page_size)
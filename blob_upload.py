@@ -0,0 +1,146 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import hashlib
+import os
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from azure.storage.blob import ContentSettings
+
+from azure.core.exceptions import ResourceExistsError
+from azure.core.exceptions import ResourceNotFoundError
+
+
+class Throughput(object):
+    """
+    Accumulates byte and file counts across threads and displays a running
+    MB/s and files/s summary.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.t1 = time.time()
+        self.files = 0
+        self.bytes = 0
+        self.counts = dict()
+        self.lock = threading.Lock()
+
+    def add(self, status, nbytes):
+        with self.lock:
+            self.counts[status] = self.counts.get(status, 0) + 1
+            if status in ['uploaded']:
+                self.files = self.files + 1
+                self.bytes = self.bytes + nbytes
+
+    def summary(self):
+        with self.lock:
+            elapsed = max(time.time() - self.t1, 0.001)
+            return {
+                'files': self.files,
+                'mb': round(self.bytes / 1048576.0, 3),
+                'elapsed': round(elapsed, 3),
+                'mb_per_sec': round((self.bytes / 1048576.0) / elapsed, 3),
+                'files_per_sec': round(self.files / elapsed, 3),
+                'counts': dict(self.counts)
+            }
+
+    def display(self):
+        s = self.summary()
+        print('{}: {} files  {} MB  {} MB/s  {} files/s  elapsed: {}  {}'.format(
+            self.label, s['files'], s['mb'], s['mb_per_sec'], s['files_per_sec'], s['elapsed'], s['counts']))
+
+
+class BlobUploader(object):
+    """
+    An instance of this class is created by StorageClient to upload many files to
+    a blob container in parallel.  Large files are sent as blocks, per the
+    max_block_size of the BlobServiceClient, with several blocks in flight per
+    file.  The mode determines what
+    happens when the blob already exists:
+      create         - fail, as in the original upload_blob behavior
+      overwrite      - always replace the blob
+      skip-identical - skip the upload if the blob has the same size and MD5
+    """
+
+    modes = ['create', 'overwrite', 'skip-identical']
+
+    def __init__(self, blob_svc_client, workers=4, mode='skip-identical', block_concurrency=4):
+        if mode not in self.modes:
+            raise ValueError('invalid upload mode: {}; use one of {}'.format(mode, self.modes))
+        self.blob_svc_client = blob_svc_client
+        self.workers = int(workers)
+        self.mode = mode
+        self.block_concurrency = int(block_concurrency)
+        self.throughput = Throughput('upload throughput')
+
+    def upload_files(self, pairs, md5s={}):
+        # pairs is a list of (local_file_path, container_name, blob_name) tuples;
+        # md5s is an optional dict of local_file_path -> already computed MD5 digest
+        print('upload_files: {} files  workers: {}  mode: {}'.format(len(pairs), self.workers, self.mode))
+        results = list()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.upload_file, p[0], p[1], p[2], md5s.get(p[0])) for p in pairs]
+            for f in as_completed(futures):
+                result = f.result()
+                results.append(result)
+                print('{}: {} -> {} {}'.format(result[0], result[1], result[2], result[3]))
+                self.throughput.display()
+        return results
+
+    def upload_file(self, local_file_path, cname, blob_name, md5=None):
+        size = os.path.getsize(local_file_path)
+        try:
+            blob_client = self.blob_svc_client.get_blob_client(container=cname, blob=blob_name)
+            if md5 is None and self.mode == 'skip-identical':
+                md5 = self.file_md5(local_file_path)
+            if self.mode == 'skip-identical' and self.is_identical(blob_client, size, md5):
+                status = 'skipped'
+            else:
+                self.send_file(blob_client, local_file_path, size, md5)
+                status = 'uploaded'
+        except ResourceExistsError:
+            status = 'exists'
+        except Exception as e:
+            print('Exception: {} {}'.format(local_file_path, e))
+            status = 'error'
+        self.throughput.add(status, size)
+        return (status, local_file_path, cname, blob_name)
+
+    def send_file(self, blob_client, local_file_path, size, md5):
+        # the service does not compute an MD5 for blobs uploaded in blocks, so set
+        # it explicitly when known, to enable the skip-identical comparison later;
+        # create and overwrite mode don't compare, so don't hash the file for them
+        settings = None
+        if md5 is not None:
+            settings = ContentSettings(content_md5=bytearray(md5))
+        with open(local_file_path, 'rb') as f:
+            blob_client.upload_blob(
+                f, length=size, overwrite=(self.mode != 'create'),
+                content_settings=settings, max_concurrency=self.block_concurrency)
+
+    def is_identical(self, blob_client, size, md5):
+        try:
+            props = blob_client.get_blob_properties()
+        except ResourceNotFoundError:
+            return False
+        if props.size != size:
+            return False
+        blob_md5 = props.content_settings.content_md5
+        if blob_md5 is None:
+            return False
+        return bytes(blob_md5) == md5
+
+    def file_md5(self, local_file_path, chunk_size=4 * 1024 * 1024):
+        h = hashlib.md5()
+        with open(local_file_path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                h.update(chunk)
+        return h.digest()
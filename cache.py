@@ -0,0 +1,172 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+from collections import OrderedDict
+
+
+class CachedResponse(object):
+    """
+    The subset of a requests response object that SearchClient uses; returned
+    by QueryCache for a cache hit.
+    """
+
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+        self.headers = {'X-Cache': 'hit'}
+
+    def __repr__(self):
+        return '<CachedResponse [{}]>'.format(self.status_code)
+
+
+class QueryCache(object):
+    """
+    An instance of this class is used by SearchClient to avoid repeating the same
+    search or document lookup within a few seconds.  Entries are keyed on the service
+    url, the index name, the kind of request, and the normalized search params or
+    document key.
+    The memory tier is an LRU bounded by max_entries, and the optional disk tier
+    (one directory per index) lets successive CLI invocations share results.  All
+    entries expire after ttl seconds; a ttl of 0 disables the cache.  The cache is
+    off unless enabled with a ttl, as it can't see changes made by indexers or by
+    other clients.
+    """
+
+    def __init__(self, ttl=0.0, max_entries=256, cache_dir=None, clock=time.time, service=''):
+        self.ttl = float(ttl)
+        self.max_entries = int(max_entries)
+        self.cache_dir = cache_dir
+        self.clock = clock
+        self.service = service
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counts = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0, 'invalidated': 0}
+
+    @classmethod
+    def from_env(cls, service=''):
+        # the disk tier is used only when AZURE_SEARCH_CACHE_DIR is set, and not 'none'
+        ttl = float(os.environ.get('AZURE_SEARCH_CACHE_TTL', '0'))
+        max_entries = int(os.environ.get('AZURE_SEARCH_CACHE_SIZE', '256'))
+        cache_dir = os.environ.get('AZURE_SEARCH_CACHE_DIR', 'none')
+        if cache_dir.strip() == '' or cache_dir.lower() == 'none':
+            cache_dir = None
+        return cls(ttl, max_entries, cache_dir, service=service)
+
+    def enabled(self):
+        return self.ttl > 0
+
+    def key(self, index_name, kind, payload):
+        # search params are case-insensitive in the service, and their order is not significant;
+        # the service url keeps the disk tier from returning the results of another service
+        if isinstance(payload, dict):
+            payload = dict([(str(k).lower(), v) for k, v in payload.items()])
+        normalized = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+        return '{}|{}|{}|{}'.format(self.service, index_name, kind, normalized)
+
+    def get(self, index_name, kind, payload):
+        if not self.enabled():
+            return None
+        key = self.key(index_name, kind, payload)
+        now = self.clock()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry['expires'] > now:
+                    self.entries.move_to_end(key)
+                    self.counts['hits'] = self.counts['hits'] + 1
+                    return CachedResponse(entry['status_code'], entry['text'])
+                del self.entries[key]
+                self.counts['expired'] = self.counts['expired'] + 1
+        entry = self.read_disk_entry(index_name, key, now)
+        with self.lock:
+            if entry is None:
+                self.counts['misses'] = self.counts['misses'] + 1
+                return None
+            self.counts['disk_hits'] = self.counts['disk_hits'] + 1
+            self.store(key, entry)
+        return CachedResponse(entry['status_code'], entry['text'])
+
+    def put(self, index_name, kind, payload, r):
+        # only successful responses are cached
+        if (not self.enabled()) or (r is None) or (r.status_code != 200):
+            return
+        key = self.key(index_name, kind, payload)
+        entry = {'key': key, 'index': index_name, 'expires': self.clock() + self.ttl,
+                 'status_code': r.status_code, 'text': r.text}
+        with self.lock:
+            self.store(key, entry)
+        self.write_disk_entry(index_name, key, entry)
+
+    def store(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counts['evicted'] = self.counts['evicted'] + 1
+
+    def invalidate(self, index_name=None):
+        # drop the entries of the given index, or of all indexes
+        with self.lock:
+            keys = [k for k, e in self.entries.items() if index_name is None or e['index'] == index_name]
+            for k in keys:
+                del self.entries[k]
+            self.counts['invalidated'] = self.counts['invalidated'] + len(keys)
+        if self.cache_dir is not None:
+            if index_name is None:
+                path = self.cache_dir
+            else:
+                path = os.path.join(self.cache_dir, index_name)
+            shutil.rmtree(path, ignore_errors=True)
+
+    def disk_path(self, index_name, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, index_name, '{}.json'.format(digest))
+
+    def read_disk_entry(self, index_name, key, now):
+        if self.cache_dir is None:
+            return None
+        path = self.disk_path(index_name, key)
+        try:
+            with open(path, 'rt') as f:
+                entry = json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        if entry.get('key') != key or entry.get('expires', 0) <= now:
+            return None
+        return entry
+
+    def write_disk_entry(self, index_name, key, entry):
+        if self.cache_dir is None:
+            return
+        path = self.disk_path(index_name, key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = '{}.{}.tmp'.format(path, threading.get_ident())
+            with open(tmp_path, 'wt') as f:
+                f.write(json.dumps(entry))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print('cache write failed: {} {}'.format(path, e))
+
+    def stats(self):
+        with self.lock:
+            s = dict(self.counts)
+            s['entries'] = len(self.entries)
+        lookups = s['hits'] + s['disk_hits'] + s['misses']
+        s['hit_ratio'] = 0.0
+        if lookups > 0:
+            s['hit_ratio'] = round((s['hits'] + s['disk_hits']) / float(lookups), 3)
+        return s
+
+    def display_stats(self):
+        if self.enabled():
+            print('cache stats: {}'.format(json.dumps(self.stats())))
@@ -2,6 +2,8 @@
 Usage:
     python cosmos.py load_airports dev airports duplicates
     python cosmos.py load_airports dev airports no-duplicates
+    python cosmos.py bulk_load_airports dev airports no-duplicates 16
+    python cosmos.py bulk_load_airports dev airports no-duplicates 16 data/us_airports.json
 """
 
 __author__  = 'Chris Joakim'
@@ -13,9 +15,12 @@ import json
 import os
 import pprint
 import sys
+import threading
 import time
 import uuid
 
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
 import azure.cosmos.cosmos_client as cosmos_client
 import azure.cosmos.errors as errors
 import azure.cosmos.http_constants as http_constants
@@ -24,6 +29,8 @@ import azure.cosmos.documents as documents
 import azure.cosmos.exceptions as exceptions
 import azure.cosmos.partition_key as partition_key
 
+from azure.cosmos._retry_options import RetryOptions
+
 from docopt import docopt
 
 from base import BaseClass
@@ -40,6 +47,9 @@ class CosmosClient(BaseClass):
         key = os.environ['AZURE_COSMOSDB_SQLDB_KEY']
         self.cosmos_client = cosmos_client.CosmosClient(url, {'masterKey': key})
         print('cosmos_client: {}'.format(self.cosmos_client))
+        self.lock = threading.Lock()
+        self.counts = dict()
+        self.sleep = time.sleep
 
     def load_airports(self, dbname, cname, duplicates_ind):
         print('load_airports: {} {}'.format(dbname, cname))
@@ -52,16 +62,8 @@ class CosmosClient(BaseClass):
 
             airports_array = self.load_json_file('data/us_airports.json')
             for idx, item in enumerate(airports_array):
-                item['epoch'] = self.epoch()
-                if duplicates_ind == 'no-duplicates':
-                    # retain the 'id' value already present in the item
-                    pass  
-                else:
-                    # Generate a random UUID so that a new document will be created
-                    item['id'] = uuid.uuid4()
                 try:
-                    pk = item['pk'].strip()
-                    if len(pk) == 3:
+                    if self.prepare_airport(item, duplicates_ind):
                         print("upserting item {}:\n{}".format(idx, item))
                         container_client.upsert_item(item)
                         upsert_count = upsert_count + 1
@@ -77,6 +79,98 @@ class CosmosClient(BaseClass):
         print('airports array count:   {}'.format(len(airports_array)))    
         print('document upsert count:  {}'.format(upsert_count))
 
+    def prepare_airport(self, item, duplicates_ind):
+        # returns True if the item should be upserted
+        item['epoch'] = self.epoch()
+        if duplicates_ind == 'no-duplicates':
+            # retain the 'id' value already present in the item
+            pass
+        else:
+            # Generate a random UUID so that a new document will be created
+            item['id'] = str(uuid.uuid4())
+        return len(str(item.get('pk', '')).strip()) == 3
+
+    def bulk_load_airports(self, dbname, cname, duplicates_ind, parallelism=16, infile='data/us_airports.json'):
+        # Concurrent upserts of a streamed JSON or JSON Lines input file, with
+        # 429 retry-after backoff; reports docs/s and RU/s rather than each document.
+        print('bulk_load_airports: {} {} {}  parallelism: {}'.format(dbname, cname, infile, parallelism))
+        self.counts = {'read': 0, 'upserted': 0, 'bypassed': 0, 'failed': 0, 'throttled': 0, 'ru': 0.0}
+        self.bulk_container = self.bulk_container_client(dbname, cname)
+        t1 = time.time()
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=parallelism) as executor:
+            for item in self.iter_json_documents(infile):
+                self.counts['read'] = self.counts['read'] + 1
+                if not self.prepare_airport(item, duplicates_ind):
+                    self.counts['bypassed'] = self.counts['bypassed'] + 1
+                    continue
+                # bound the number of queued upserts so the input is streamed
+                if len(in_flight) >= parallelism * 4:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                in_flight.add(executor.submit(self.upsert_with_backoff, item))
+                if self.counts['read'] % 1000 == 0:
+                    self.display_bulk_progress(t1)
+            wait(in_flight)
+        self.display_bulk_progress(t1)
+        return self.counts
+
+    def upsert_with_backoff(self, item, max_attempts=10):
+        container_client = self.bulk_container
+        charges = list()
+
+        def capture_charge(headers, result):
+            charges.append(float(headers.get('x-ms-request-charge', 0)))
+
+        for attempt in range(1, max_attempts + 1):
+            try:
+                container_client.upsert_item(item, response_hook=capture_charge)
+                self.increment('upserted', 1)
+                self.increment('ru', sum(charges))
+                return True
+            except exceptions.CosmosHttpResponseError as e:
+                if e.status_code == 429 and attempt < max_attempts:
+                    self.increment('throttled', 1)
+                    self.sleep(self.retry_after_seconds(e, attempt))
+                else:
+                    print('exception on doc: {} {}'.format(item.get('pk'), e))
+                    break
+            except Exception as e:
+                print('exception on doc: {} {}'.format(item.get('pk'), e))
+                break
+        self.increment('failed', 1)
+        return False
+
+    def retry_after_seconds(self, e, attempt):
+        headers = getattr(e, 'headers', None) or dict()
+        retry_after_ms = headers.get('x-ms-retry-after-ms')
+        if retry_after_ms is not None:
+            return float(retry_after_ms) / 1000.0
+        return min(10.0, 0.1 * (2 ** attempt))
+
+    def bulk_container_client(self, dbname, cname):
+        # One client is shared by the upsert threads, since the request charge is
+        # captured per call by the response_hook.  The SDK would otherwise retry
+        # 429s internally, so disable that and let upsert_with_backoff count and
+        # honor each retry-after.
+        url = os.environ['AZURE_COSMOSDB_SQLDB_URI']
+        key = os.environ['AZURE_COSMOSDB_SQLDB_KEY']
+        policy = documents.ConnectionPolicy()
+        policy.RetryOptions = RetryOptions(max_retry_attempt_count=0)
+        client = cosmos_client.CosmosClient(url, {'masterKey': key}, connection_policy=policy)
+        return client.get_database_client(dbname).get_container_client(cname)
+
+    def increment(self, name, n):
+        with self.lock:
+            self.counts[name] = self.counts[name] + n
+
+    def display_bulk_progress(self, t1):
+        elapsed = max(time.time() - t1, 0.001)
+        with self.lock:
+            c = dict(self.counts)
+        print('read: {}  upserted: {}  bypassed: {}  failed: {}  throttled: {}  docs/s: {}  RU/s: {}  elapsed: {}'.format(
+            c['read'], c['upserted'], c['bypassed'], c['failed'], c['throttled'],
+            round(c['upserted'] / elapsed, 1), round(c['ru'] / elapsed, 1), round(elapsed, 1)))
+
 
 def print_options(msg):
     print(msg)
@@ -96,6 +190,16 @@ if __name__ == "__main__":
             container = sys.argv[3]
             duplicates_ind = sys.argv[4]
             client.load_airports(dbname, container, duplicates_ind)
+        elif func == 'bulk_load_airports':
+            dbname = sys.argv[2]
+            container = sys.argv[3]
+            duplicates_ind = sys.argv[4]
+            parallelism, infile = 16, 'data/us_airports.json'
+            if len(sys.argv) > 5:
+                parallelism = int(sys.argv[5])
+            if len(sys.argv) > 6:
+                infile = sys.argv[6]
+            client.bulk_load_airports(dbname, container, duplicates_ind, parallelism, infile)
         else:
             print_options('Error: invalid function: {}'.format(func))
     else:
@@ -0,0 +1,189 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import gzip
+import json
+import os
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+class IndexDumper(object):
+    """
+    An instance of this class is created by SearchClient to export every document
+    of an index, for backup or reindexing.  Rather than deep skip paging, each page
+    is requested with a keyset filter (key gt 'last key') ordered by the key field.
+    The key range is split into partitions of similar document counts, which are
+    dumped concurrently to gzipped JSON Lines shards in tmp/dump/<index>/.  The
+    shards can be reloaded with the load_dump command.  Only retrievable fields
+    are exported.
+    """
+
+    # the characters allowed in a document key, in ordinal order
+    key_alphabet = sorted('-0123456789=ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz')
+
+    def __init__(self, transport, urls, headers, partitions=4, page_size=1000, max_depth=2):
+        self.transport = transport
+        self.urls = urls
+        self.headers = headers
+        self.partitions = max(1, int(partitions))
+        self.page_size = int(page_size)
+        self.max_depth = int(max_depth)
+        self.key_name = None
+
+    def dump(self, idx_name, outdir=None):
+        t1 = time.time()
+        if outdir is None:
+            outdir = 'tmp/dump/{}'.format(idx_name)
+        os.makedirs(outdir, exist_ok=True)
+        index_def = self.get_json(self.urls.get_index(idx_name))
+        self.key_name = self.index_key_name(index_def)
+        index_def.pop('@odata.context', None)
+        index_def.pop('@odata.etag', None)
+        self.write_json(index_def, os.path.join(outdir, 'index.json'))
+
+        ranges = self.partition_ranges(idx_name)
+        print('dump_index: {}  key: {}  partitions: {}'.format(idx_name, self.key_name, len(ranges)))
+        tasks = list()
+        for idx, r in enumerate(ranges):
+            shard = os.path.join(outdir, 'part-{:04d}.jsonl.gz'.format(idx))
+            tasks.append((idx_name, r[0], r[1], r[2], shard))
+        with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+            shards = list(executor.map(lambda t: self.dump_range(*t), tasks))
+
+        manifest = {'index': idx_name, 'key': self.key_name, 'shards': shards}
+        manifest['documents'] = sum([s['documents'] for s in shards])
+        manifest['expected'] = sum([s['expected'] for s in shards])
+        manifest['elapsed'] = round(time.time() - t1, 3)
+        self.write_json(manifest, os.path.join(outdir, 'manifest.json'))
+        if manifest['documents'] != manifest['expected']:
+            print('warning: dumped {} documents, expected {}; the index may have changed during the dump'.format(
+                manifest['documents'], manifest['expected']))
+        print('dump_index complete: {} documents  elapsed: {}'.format(manifest['documents'], manifest['elapsed']))
+        return manifest
+
+    def dump_range(self, idx_name, lo, hi, expected, shard):
+        t1 = time.time()
+        count = 0
+        with gzip.open(shard, 'wt', encoding='utf-8') as out:
+            for doc in self.iter_range(idx_name, lo, hi):
+                out.write(json.dumps(doc))
+                out.write('\n')
+                count = count + 1
+        print('file written: {}  documents: {}'.format(shard, count))
+        return {'file': shard, 'lo': lo, 'hi': hi, 'documents': count,
+                'expected': expected, 'elapsed': round(time.time() - t1, 3)}
+
+    def iter_range(self, idx_name, lo, hi, select=None):
+        # yield the documents of a key range, in key order, one keyset page at a time
+        last = None
+        while True:
+            params = dict()
+            params['search'] = '*'
+            params['filter'] = self.range_filter(lo, hi, last)
+            params['orderby'] = '{} asc'.format(self.key_name)
+            params['top'] = self.page_size
+            if select is not None:
+                params['select'] = select
+            values = self.search(idx_name, params).get('value', [])
+            for doc in values:
+                for name in [n for n in doc.keys() if n.startswith('@search.')]:
+                    del doc[name]
+                last = doc[self.key_name]
+                yield doc
+            if len(values) < self.page_size:
+                return
+
+    def partition_ranges(self, idx_name):
+        # returns a list of (lo, hi, count) key ranges of similar document counts
+        total = self.count(idx_name, None, None)
+        if self.partitions < 2 or total <= self.page_size:
+            return [(None, None, total)]
+        # all keys share the common prefix of the lowest and highest keys
+        prefix = os.path.commonprefix([self.edge_key(idx_name, 'asc'), self.edge_key(idx_name, 'desc')])
+        target = (total + self.partitions - 1) // self.partitions
+        ranges = self.counted_ranges(idx_name, self.split_range(None, None, prefix))
+        for depth in range(self.max_depth - 1):
+            refined = list()
+            for r in ranges:
+                if r[2] > target and r[0] is not None:
+                    refined.extend(self.counted_ranges(idx_name, self.split_range(r[0], r[1], r[0])))
+                else:
+                    refined.append(r)
+            ranges = refined
+
+        # merge the adjacent ranges into the partitions
+        partitions, lo, n = list(), None, 0
+        for r in ranges:
+            n = n + r[2]
+            if n >= target and len(partitions) < self.partitions - 1:
+                partitions.append((lo, r[1], n))
+                lo, n = r[1], 0
+        partitions.append((lo, None, n))
+        return partitions
+
+    def split_range(self, lo, hi, prefix):
+        bounds = [prefix + c for c in self.key_alphabet]
+        bounds = [b for b in bounds if (lo is None or b > lo) and (hi is None or b < hi)]
+        return list(zip([lo] + bounds, bounds + [hi]))
+
+    def counted_ranges(self, idx_name, ranges):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            counts = list(executor.map(lambda r: self.count(idx_name, r[0], r[1]), ranges))
+        return [(r[0], r[1], c) for r, c in zip(ranges, counts)]
+
+    def count(self, idx_name, lo, hi):
+        params = {'search': '*', 'count': True, 'top': 0}
+        range_filter = self.range_filter(lo, hi, None)
+        if range_filter is not None:
+            params['filter'] = range_filter
+        return self.search(idx_name, params)['@odata.count']
+
+    def edge_key(self, idx_name, direction):
+        params = {'search': '*', 'select': self.key_name, 'top': 1}
+        params['orderby'] = '{} {}'.format(self.key_name, direction)
+        return self.search(idx_name, params)['value'][0][self.key_name]
+
+    def range_filter(self, lo, hi, last):
+        clauses = list()
+        if lo is not None:
+            clauses.append("{} ge '{}'".format(self.key_name, self.quote(lo)))
+        if hi is not None:
+            clauses.append("{} lt '{}'".format(self.key_name, self.quote(hi)))
+        if last is not None:
+            clauses.append("{} gt '{}'".format(self.key_name, self.quote(last)))
+        if len(clauses) == 0:
+            return None
+        return ' and '.join(clauses)
+
+    def quote(self, value):
+        return str(value).replace("'", "''")
+
+    def index_key_name(self, index_def):
+        for field in index_def.get('fields', []):
+            if str(field.get('key')).lower() == 'true':
+                return field['name']
+        raise ValueError('index {} has no key field'.format(index_def.get('name')))
+
+    def search(self, idx_name, params):
+        return self.post_json(self.urls.search_index(idx_name), params)
+
+    def get_json(self, url):
+        r = self.transport.get(url, self.headers)
+        if r.status_code != 200:
+            raise RuntimeError('request failed: {} {}'.format(r.status_code, r.text[0:500]))
+        return json.loads(r.text)
+
+    def post_json(self, url, params):
+        r = self.transport.post(url, self.headers, params)
+        if r.status_code != 200:
+            raise RuntimeError('search failed: {} {}'.format(r.status_code, r.text[0:500]))
+        return json.loads(r.text)
+
+    def write_json(self, obj, outfile):
+        with open(outfile, 'wt') as f:
+            f.write(json.dumps(obj, sort_keys=False, indent=2))
+            print('file written: {}'.format(outfile))
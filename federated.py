@@ -0,0 +1,95 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import asyncio
+import heapq
+import itertools
+import time
+
+from async_search import AsyncSearchClient
+
+
+def normalize_scores(values):
+    # min-max normalize the @search.score values of one index to 0..1, as the
+    # scores of different indexes aren't comparable; equal scores are all 1.0
+    scores = [v.get('@search.score', 0.0) for v in values]
+    if len(scores) == 0:
+        return []
+    lo, hi = min(scores), max(scores)
+    if hi == lo:
+        return [1.0 for s in scores]
+    return [(s - lo) / (hi - lo) for s in scores]
+
+
+class FederatedSearch(AsyncSearchClient):
+    """
+    Runs one query across several indexes concurrently, and merges the results
+    into a single top-k list.  Each index returns its own top k documents; their
+    @search.score values are normalized per index, then the documents are added
+    to a bounded heap of the k best as each index responds.  The elapsed time is
+    therefore that of the slowest index, rather than the sum of them.
+    """
+
+    def __init__(self, top=10, timeout=30.0, transport=None, concurrency=8):
+        AsyncSearchClient.__init__(self, concurrency, timeout, transport)
+        self.top = int(top)
+        self.query_params = dict()
+        self.outfile = 'tmp/federated_search.json'
+
+    def search_params(self, idx_name, search_name):
+        return self.query_params
+
+    def merge(self, heap, sequence, result):
+        # add the normalized results of one index to the heap of the top k
+        values = result['response'].get('value', [])
+        for value, normalized in zip(values, normalize_scores(values)):
+            doc = dict(value)
+            doc['@search.index'] = result['index']
+            doc['@search.normalizedScore'] = round(normalized, 6)
+            # the sequence number breaks ties, so that the documents are never compared
+            entry = (normalized, doc.get('@search.score', 0.0), -next(sequence), doc)
+            if len(heap) < self.top:
+                heapq.heappush(heap, entry)
+            elif entry[0:3] > heap[0][0:3]:
+                heapq.heapreplace(heap, entry)
+
+    def run(self, indexes_arg, query):
+        indexes = indexes_arg.split(',')
+        self.query_params = {'search': query, 'count': True, 'top': self.top}
+        print('federated search: {}  indexes: {}  top: {}'.format(query, indexes, self.top))
+        heap, sequence, index_results = list(), itertools.count(), list()
+
+        def merge_result(result):
+            if 'response' in result:
+                result['count'] = result['response'].get('@odata.count')
+                self.merge(heap, sequence, result)
+                del result['response']
+            index_results.append(result)
+            print('completed: {} status: {} count: {} elapsed: {}'.format(
+                result['index'], result['status'], result.get('count'), result['elapsed']))
+
+        t1 = time.time()
+        self.concurrency = max(self.concurrency, len(indexes))
+        asyncio.run(self.sweep([(idx_name, 'federated') for idx_name in indexes], merge_result))
+        values = [entry[3] for entry in sorted(heap, key=lambda e: e[0:3], reverse=True)]
+        report = {'query': query, 'indexes': indexes, 'top': self.top}
+        report['elapsed'] = round(time.time() - t1, 4)
+        report['max_index_elapsed'] = max([r['elapsed'] for r in index_results])
+        report['sum_index_elapsed'] = round(sum([r['elapsed'] for r in index_results]), 4)
+        report['errors'] = len([r for r in index_results if r['status'] != 200])
+        report['index_results'] = sorted(index_results, key=lambda r: r['index'])
+        report['value'] = values
+        self.write_json_file(report, self.outfile)
+        self.display_report(report)
+        return report
+
+    def display_report(self, report):
+        for doc in report['value']:
+            print('{:>8} {:>10} {:<12} {}'.format(
+                doc['@search.normalizedScore'], round(doc.get('@search.score', 0.0), 4), doc['@search.index'],
+                doc.get('name', doc.get('url', doc.get('id', doc.get('pk'))))))
+        print('federated search complete; documents: {}  errors: {}  elapsed: {}  (slowest index: {}, sum: {})'.format(
+            len(report['value']), report['errors'], report['elapsed'],
+            report['max_index_elapsed'], report['sum_index_elapsed']))
@@ -0,0 +1,105 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import json
+import time
+
+from datetime import datetime
+
+
+class IndexerMonitor(object):
+    """
+    An instance of this class is created by SearchClient to wait for an indexer run
+    to complete, rather than sleeping for a fixed time.  The indexer status is
+    polled at an adaptive interval; short at first, growing while no progress is
+    seen, up to max_interval.  A run is complete when its lastResult status is
+    success, transientFailure, or persistentFailure, or the indexer status is error.
+    The lastResult of a previous run is ignored per its startTime.
+    """
+
+    terminal_statuses = ['success', 'transientFailure', 'persistentFailure']
+
+    def __init__(self, transport, urls, headers, min_interval=1.0, max_interval=30.0,
+                 timeout=3600.0, clock=time.time, sleep=time.sleep):
+        self.transport = transport
+        self.urls = urls
+        self.headers = headers
+        self.min_interval = float(min_interval)
+        self.max_interval = float(max_interval)
+        self.timeout = float(timeout)
+        self.clock = clock
+        self.sleep = sleep
+
+    def status(self, name):
+        r = self.transport.get(self.urls.get_indexer_status(name), self.headers)
+        if r.status_code != 200:
+            raise RuntimeError('get_indexer_status failed: {} {}'.format(r.status_code, r.text[0:500]))
+        return json.loads(r.text)
+
+    def last_start_time(self, name):
+        # the startTime of the latest run, to distinguish it from the next run
+        last_result = self.status(name).get('lastResult')
+        if last_result is None:
+            return None
+        return last_result.get('startTime')
+
+    def wait(self, name, previous_start=None):
+        t1 = self.clock()
+        interval = self.min_interval
+        processed = None
+        while True:
+            status = self.status(name)
+            last_result = status.get('lastResult')
+            current = (last_result is not None) and (last_result.get('startTime') != previous_start)
+            if status.get('status') == 'error':
+                return self.report(name, status, last_result if current else None, t1)
+            if current:
+                print('indexer {}: {}  processed: {}  failed: {}'.format(
+                    name, last_result.get('status'), last_result.get('itemsProcessed'),
+                    last_result.get('itemsFailed')))
+                if last_result.get('status') in self.terminal_statuses:
+                    return self.report(name, status, last_result, t1)
+            else:
+                print('indexer {}: waiting for the run to start'.format(name))
+            if self.clock() - t1 > self.timeout:
+                raise TimeoutError('indexer {} did not complete within {} seconds'.format(name, self.timeout))
+
+            # poll more often while documents are being processed
+            if current and last_result.get('itemsProcessed') != processed:
+                processed = last_result.get('itemsProcessed')
+            else:
+                interval = min(self.max_interval, interval * 1.5)
+            self.sleep(interval)
+
+    def report(self, name, status, last_result, t1):
+        result = {'indexer': name, 'status': status.get('status'), 'itemsProcessed': 0, 'itemsFailed': 0}
+        result['waited'] = round(self.clock() - t1, 3)
+        if last_result is not None:
+            result['status'] = last_result.get('status')
+            result['itemsProcessed'] = last_result.get('itemsProcessed') or 0
+            result['itemsFailed'] = last_result.get('itemsFailed') or 0
+            result['errors'] = [e.get('errorMessage') for e in last_result.get('errors') or []][0:10]
+            result['elapsed'] = self.run_seconds(last_result)
+        elapsed = result.get('elapsed') or result['waited']
+        result['docs_per_sec'] = round(result['itemsProcessed'] / max(elapsed, 0.001), 1)
+        print('indexer {} complete: {}'.format(name, json.dumps(result)))
+        return result
+
+    def run_seconds(self, last_result):
+        try:
+            start = self.parse_time(last_result['startTime'])
+            end = self.parse_time(last_result['endTime'])
+            return round((end - start).total_seconds(), 3)
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return None
+
+    def parse_time(self, value):
+        # i.e. 2020-10-19T14:01:02.123Z, with or without the fractional seconds
+        value = value.replace('+00:00', '').rstrip('Z')
+        if '.' in value:
+            head, frac = value.split('.', 1)
+            value = '{}.{}'.format(head, (frac + '000000')[0:6])
+            return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%f')
+        return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S')
@@ -0,0 +1,232 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import json
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from base import BaseClass
+
+
+class BatchSizer(object):
+    """
+    Tracks the current target batch size for the docs/index API.  The size grows
+    while batches succeed, and is halved when the service throttles (HTTP 503,
+    or HTTP 207 with per-document 503 statuses).  The Azure Search limits are
+    1000 documents and 16 MB per batch.
+    """
+
+    def __init__(self, initial_docs=500, max_docs=1000, min_docs=1, max_bytes=4 * 1024 * 1024):
+        self.max_docs = max_docs
+        self.min_docs = min_docs
+        self.max_bytes = max_bytes
+        self.docs = max(min(initial_docs, max_docs), min_docs)
+        self.lock = threading.Lock()
+
+    def target_docs(self):
+        with self.lock:
+            return self.docs
+
+    def on_success(self):
+        with self.lock:
+            self.docs = min(self.max_docs, int(self.docs * 1.25) + 1)
+
+    def on_throttle(self):
+        with self.lock:
+            self.docs = max(self.min_docs, int(self.docs / 2))
+
+
+class DocumentUploader(BaseClass):
+    """
+    An instance of this class is created by SearchClient to "push" documents from
+    a JSON or JSON Lines file directly into an index with the docs/index batch API,
+    as an alternative to the pull model of datasources and indexers.  The input is
+    streamed, batches are sized adaptively by document count and payload bytes, and
+    several batches are posted in parallel on the pooled Transport.
+    """
+
+    retryable_statuses = [409, 422, 429, 503]
+
+    def __init__(self, transport, urls, headers, workers=4, action='mergeOrUpload', max_attempts=5):
+        BaseClass.__init__(self)
+        self.transport = transport
+        self.urls = urls
+        self.headers = headers
+        self.workers = int(workers)
+        self.action = action
+        self.max_attempts = max_attempts
+        self.sizer = BatchSizer()
+        self.fields = None  # optional dict of field name -> Edm type, from an index schema
+        self.key_name = None
+        self.lock = threading.Lock()
+        self.counts = {'read': 0, 'succeeded': 0, 'failed': 0, 'batches': 0, 'throttled': 0, 'bytes': 0}
+
+    def use_index_schema(self, schema):
+        self.fields = dict()
+        for field in schema['fields']:
+            self.fields[field['name']] = field['type']
+            if str(field.get('key')).lower() == 'true':
+                self.key_name = field['name']
+
+    def prepare(self, doc):
+        # project the document onto the index fields, coercing numeric strings
+        if self.fields is not None:
+            projected = dict()
+            for name, edm_type in self.fields.items():
+                if name in doc:
+                    projected[name] = self.coerce(doc[name], edm_type)
+            doc = projected
+        doc['@search.action'] = self.action
+        return doc
+
+    def coerce(self, value, edm_type):
+        if value is None or not isinstance(value, str):
+            return value
+        try:
+            if edm_type == 'Edm.Double':
+                return float(value)
+            if edm_type in ['Edm.Int32', 'Edm.Int64']:
+                return int(value)
+        except ValueError:
+            pass
+        return value
+
+    def batches(self, docs):
+        # group the documents per the current target count and the byte limit
+        batch, batch_bytes = list(), 0
+        for doc in docs:
+            doc = self.prepare(doc)
+            doc_bytes = len(json.dumps(doc, separators=(',', ':')).encode('utf-8')) + 1
+            if len(batch) > 0 and ((len(batch) >= self.sizer.target_docs()) or
+                                   (batch_bytes + doc_bytes > self.sizer.max_bytes)):
+                self.increment('bytes', batch_bytes)
+                yield batch
+                batch, batch_bytes = list(), 0
+            batch.append(doc)
+            batch_bytes = batch_bytes + doc_bytes
+        if len(batch) > 0:
+            self.increment('bytes', batch_bytes)
+            yield batch
+
+    def upload_file(self, index_name, infile):
+        return self.upload_files(index_name, [infile])
+
+    def upload_files(self, index_name, infiles):
+        print('upload_documents: {} -> {}  workers: {}  action: {}'.format(
+            ','.join(infiles), index_name, self.workers, self.action))
+        t1 = time.time()
+        self.upload(index_name, self.counted(self.iter_files(infiles)))
+        elapsed = time.time() - t1
+        self.counts['elapsed'] = round(elapsed, 3)
+        self.counts['docs_per_sec'] = round(self.counts['succeeded'] / max(elapsed, 0.001), 1)
+        print('upload_documents complete: {}'.format(json.dumps(self.counts)))
+        return self.counts
+
+    def iter_files(self, infiles):
+        for infile in infiles:
+            for doc in self.iter_json_documents(infile):
+                yield doc
+
+    def counted(self, docs):
+        for doc in docs:
+            self.counts['read'] = self.counts['read'] + 1
+            yield doc
+
+    def upload(self, index_name, docs):
+        url = self.urls.index_docs(index_name)
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for batch in self.batches(docs):
+                # bound the number of queued batches so the input is streamed
+                if len(in_flight) >= self.workers * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    self.check(done)
+                in_flight.add(executor.submit(self.post_batch, url, batch))
+            done, in_flight = wait(in_flight)
+            self.check(done)
+
+    def check(self, futures):
+        for f in futures:
+            f.result()  # re-raise any unexpected worker exception
+
+    def post_batch(self, url, batch):
+        attempt = 0
+        while len(batch) > 0:
+            attempt = attempt + 1
+            body = {'value': batch}
+            # the batch is split and retried here, rather than by the Transport
+            r = self.transport.post(url, self.headers, body, max_attempts=1)
+            self.increment('batches', 1)
+            if r.status_code == 200:
+                self.sizer.on_success()
+                self.increment('succeeded', len(batch))
+                return
+            if r.status_code == 207:
+                batch = self.retryable_items(batch, json.loads(r.text))
+                if len(batch) > 0:
+                    self.sizer.on_throttle()
+            elif r.status_code in [429, 503]:
+                self.increment('throttled', 1)
+                self.sizer.on_throttle()
+                if len(batch) > self.sizer.target_docs():
+                    # split the batch per the reduced size and post the parts
+                    time.sleep(self.backoff_seconds(attempt, r))
+                    size = self.sizer.target_docs()
+                    self.post_batch(url, batch[:size])
+                    batch = batch[size:]
+                    attempt = 0
+                    continue
+            else:
+                print('upload batch error: {} {}'.format(r.status_code, r.text[0:500]))
+                self.increment('failed', len(batch))
+                return
+            if attempt >= self.max_attempts:
+                print('upload batch abandoned after {} attempts; {} documents'.format(attempt, len(batch)))
+                self.increment('failed', len(batch))
+                return
+            time.sleep(self.backoff_seconds(attempt, r))
+
+    def retryable_items(self, batch, resp_obj):
+        # a 207 response lists a status per document key; keep only the retryable failures
+        key_field = self.key_field(batch)
+        by_key = dict()
+        for doc in batch:
+            by_key[str(doc.get(key_field))] = doc
+        retry = list()
+        for item in resp_obj.get('value', []):
+            if item.get('status'):
+                self.increment('succeeded', 1)
+            elif item.get('statusCode') in self.retryable_statuses and item.get('key') in by_key:
+                retry.append(by_key[item['key']])
+            else:
+                print('upload document error: {} {} {}'.format(
+                    item.get('key'), item.get('statusCode'), item.get('errorMessage')))
+                self.increment('failed', 1)
+        if len(retry) > 0:
+            self.increment('throttled', 1)
+        return retry
+
+    def key_field(self, batch):
+        # the response items are keyed by the index key field; pk or id in this project
+        if self.key_name is not None:
+            return self.key_name
+        if 'pk' in batch[0]:
+            return 'pk'
+        return 'id'
+
+    def backoff_seconds(self, attempt, r):
+        retry_after = r.headers.get('Retry-After')
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return min(30.0, 0.5 * (2 ** (attempt - 1)))
+
+    def increment(self, name, n):
+        with self.lock:
+            self.counts[name] = self.counts[name] + n
@@ -0,0 +1,162 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import json
+import os
+import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from bench import percentile
+
+lookup_modes = ['auto', 'get', 'filter']
+
+
+def read_keys(infile):
+    # the unique, non-blank keys of a file, one per line, or of stdin if infile is '-'
+    f = sys.stdin if infile == '-' else open(infile, 'rt')
+    try:
+        keys, seen = list(), set()
+        for line in f:
+            key = line.strip()
+            if len(key) > 0 and key not in seen:
+                keys.append(key)
+                seen.add(key)
+        return keys
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+class BatchLookup(object):
+    """
+    An instance of this class is created by SearchClient to look up many document
+    keys in one process, over the pooled Transport.  In 'get' mode each key is a
+    concurrent lookup (GET docs/<key>) request.  In 'filter' mode the keys are
+    collapsed into search.in(<key field>, ...) filter queries of chunk_size keys
+    each, which is far fewer requests; the latency of each key is then that of
+    its query.  In 'auto' mode the filter queries are used unless there are no
+    more keys than workers, as one round of concurrent gets is then as fast.
+    A failed request, i.e. a connection error or an open circuit, is an error of
+    its keys rather than of the batch.  The found and missing keys are written
+    to tmp/lookup_<index>.jsonl.  The documents are read with the query headers,
+    but the index definition, for its key field, requires the admin headers.
+    """
+
+    delimiter = '|'
+
+    def __init__(self, transport, urls, headers, workers=8, chunk_size=200, admin_headers=None):
+        self.transport = transport
+        self.urls = urls
+        self.headers = headers
+        self.admin_headers = admin_headers if admin_headers is not None else headers
+        self.workers = int(workers)
+        self.chunk_size = int(chunk_size)
+        self.outdir = 'tmp'
+
+    def choose_mode(self, mode, keys):
+        if mode not in lookup_modes:
+            raise ValueError('invalid lookup mode: {}; use one of {}'.format(mode, lookup_modes))
+        if mode == 'auto':
+            if len(keys) <= self.workers:
+                return 'get'
+            return 'filter'
+        return mode
+
+    def lookup(self, idx_name, keys, mode='auto'):
+        mode = self.choose_mode(mode, keys)
+        t1 = time.perf_counter()
+        results = list()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            if mode == 'get':
+                results = list(executor.map(lambda key: self.get_key(idx_name, key), keys))
+            else:
+                key_name = self.index_key_name(idx_name)
+                # keys containing the delimiter can't be in a search.in list, so are looked up individually
+                listable = [k for k in keys if self.delimiter not in k]
+                chunks = [listable[i:i + self.chunk_size] for i in range(0, len(listable), self.chunk_size)]
+                for chunk_results in executor.map(lambda chunk: self.filter_keys(idx_name, key_name, chunk), chunks):
+                    results.extend(chunk_results)
+                others = [k for k in keys if self.delimiter in k]
+                results.extend(executor.map(lambda key: self.get_key(idx_name, key), others))
+        elapsed = time.perf_counter() - t1
+        report = self.report(idx_name, mode, results, elapsed)
+        self.write_results(idx_name, results)
+        return report
+
+    def get_key(self, idx_name, key):
+        url = self.urls.lookup_doc(idx_name, quote(key, safe=''))
+        t1 = time.perf_counter()
+        try:
+            r = self.transport.get(url, self.headers)
+        except Exception as e:
+            # i.e. a connection error or an open circuit; recorded, rather than ending the batch
+            ms = round((time.perf_counter() - t1) * 1000.0, 3)
+            return {'key': key, 'status': None, 'ms': ms, 'found': False, 'error': str(e)}
+        result = {'key': key, 'status': r.status_code, 'ms': round((time.perf_counter() - t1) * 1000.0, 3)}
+        result['found'] = r.status_code == 200
+        if r.status_code not in [200, 404]:
+            result['error'] = r.text[0:500]
+        return result
+
+    def filter_keys(self, idx_name, key_name, keys):
+        values = self.delimiter.join(keys).replace("'", "''")
+        params = {
+            'search': '*',
+            'filter': "search.in({}, '{}', '{}')".format(key_name, values, self.delimiter),
+            'select': key_name,
+            'top': len(keys)
+        }
+        t1 = time.perf_counter()
+        try:
+            r = self.transport.post(self.urls.search_index(idx_name), self.headers, params)
+        except Exception as e:
+            ms = round((time.perf_counter() - t1) * 1000.0, 3)
+            return [{'key': key, 'status': None, 'ms': ms, 'found': False, 'error': str(e)} for key in keys]
+        ms = round((time.perf_counter() - t1) * 1000.0, 3)
+        if r.status_code != 200:
+            return [{'key': key, 'status': r.status_code, 'ms': ms, 'found': False,
+                     'error': r.text[0:500]} for key in keys]
+        found = set([doc.get(key_name) for doc in json.loads(r.text).get('value', [])])
+        return [{'key': key, 'status': 200 if key in found else 404, 'ms': ms, 'found': key in found}
+                for key in keys]
+
+    def index_key_name(self, idx_name):
+        r = self.transport.get(self.urls.get_index(idx_name), self.admin_headers)
+        if r.status_code != 200:
+            raise RuntimeError('get_index {} failed: {} {}'.format(idx_name, r.status_code, r.text[0:500]))
+        for field in json.loads(r.text).get('fields', []):
+            if str(field.get('key')).lower() == 'true':
+                return field['name']
+        raise ValueError('index {} has no key field'.format(idx_name))
+
+    def report(self, idx_name, mode, results, elapsed):
+        latencies = sorted([r['ms'] for r in results])
+        report = {'index': idx_name, 'mode': mode, 'keys': len(results)}
+        report['found'] = len([r for r in results if r['found']])
+        report['missing'] = len([r for r in results if r['status'] == 404])
+        report['errors'] = len([r for r in results if 'error' in r])
+        report['elapsed'] = round(elapsed, 3)
+        if len(latencies) > 0:
+            report['latency_ms'] = {
+                'p50': round(percentile(latencies, 50), 2),
+                'p90': round(percentile(latencies, 90), 2),
+                'p99': round(percentile(latencies, 99), 2),
+                'max': round(latencies[-1], 2)
+            }
+        report['missing_keys'] = [r['key'] for r in results if r['status'] == 404][0:100]
+        return report
+
+    def write_results(self, idx_name, results):
+        os.makedirs(self.outdir, exist_ok=True)
+        outfile = os.path.join(self.outdir, 'lookup_{}.jsonl'.format(idx_name))
+        with open(outfile, 'wt') as f:
+            for result in results:
+                f.write(json.dumps(result))
+                f.write('\n')
+        print('file written: {}'.format(outfile))
+        return outfile
@@ -0,0 +1,92 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import base64
+import hashlib
+import json
+import os
+
+
+class UploadManifest(object):
+    """
+    An instance of this class is used by StorageClient to upload only the new or
+    changed documents.  The manifest file records the size, mtime, and base64 MD5
+    of each local file; the MD5 is recomputed only when the size or mtime changes.
+    The local state is compared to the size and content_md5 of the existing blobs.
+    Only blobs recorded in the previous manifest whose local file is now gone are
+    orphans; blobs this tool never uploaded are left alone.
+    """
+
+    def __init__(self, manifest_filename='data/uploads_manifest.json'):
+        self.manifest_filename = manifest_filename
+        self.entries = dict()
+        self.orphans = dict()
+        self.hashed = 0
+        if os.path.exists(manifest_filename):
+            with open(manifest_filename, 'rt') as f:
+                self.entries = json.loads(f.read())
+        self.previous = dict(self.entries)
+
+    def refresh(self, filenames):
+        # returns the current entries for the given local files
+        current = dict()
+        for fq_name in filenames:
+            stat = os.stat(fq_name)
+            entry = self.entries.get(fq_name)
+            if (entry is None) or (entry['size'] != stat.st_size) or (entry['mtime'] != stat.st_mtime):
+                entry = {'size': stat.st_size, 'mtime': stat.st_mtime, 'md5': self.file_md5(fq_name)}
+                self.hashed = self.hashed + 1
+            current[fq_name] = entry
+        self.entries = current
+        return current
+
+    def delta(self, blob_props):
+        # blob_props is a dict of blob name -> (size, base64 md5 or None)
+        new, changed, unchanged = list(), list(), list()
+        local_names = dict()
+        for fq_name in sorted(self.entries.keys()):
+            entry = self.entries[fq_name]
+            blob_name = os.path.basename(fq_name)
+            local_names[blob_name] = fq_name
+            if blob_name not in blob_props:
+                new.append(fq_name)
+            elif blob_props[blob_name] != (entry['size'], entry['md5']):
+                changed.append(fq_name)
+            else:
+                unchanged.append(fq_name)
+        # orphans are the previously uploaded files which are gone locally, and are
+        # kept in the manifest until their blobs are deleted
+        self.orphans = dict()
+        for fq_name, entry in self.previous.items():
+            blob_name = os.path.basename(fq_name)
+            if (fq_name not in self.entries) and (blob_name not in local_names) and (blob_name in blob_props):
+                self.orphans[blob_name] = (fq_name, entry)
+        orphans = sorted(self.orphans.keys())
+        return {'new': new, 'changed': changed, 'unchanged': unchanged, 'orphans': orphans}
+
+    def forget_orphan(self, blob_name):
+        # call after the orphan blob has been deleted
+        self.orphans.pop(blob_name, None)
+
+    def md5_bytes(self, fq_name):
+        return base64.b64decode(self.entries[fq_name]['md5'])
+
+    def save(self):
+        entries = dict(self.entries)
+        for fq_name, entry in self.orphans.values():
+            entries[fq_name] = entry
+        with open(self.manifest_filename, 'wt') as f:
+            f.write(json.dumps(entries, sort_keys=True, indent=2))
+            print('file written: {}'.format(self.manifest_filename))
+
+    def file_md5(self, fq_name, chunk_size=4 * 1024 * 1024):
+        h = hashlib.md5()
+        with open(fq_name, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                h.update(chunk)
+        return base64.b64encode(h.digest()).decode('utf-8')
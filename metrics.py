@@ -0,0 +1,233 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import json
+import os
+import socket
+import threading
+import time
+
+from urllib.parse import urlparse
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# the phase timings of the request in progress on each thread
+_phases = threading.local()
+
+collections = ['indexes', 'indexers', 'datasources', 'skillsets', 'synonymmaps']
+docs_actions = ['search', 'index', 'suggest', 'autocomplete', '$count']
+
+
+def reset_phases():
+    _phases.timings = dict()
+
+def current_phases():
+    return getattr(_phases, 'timings', dict())
+
+def add_phase(name, seconds):
+    timings = current_phases()
+    timings[name] = timings.get(name, 0.0) + (seconds * 1000.0)
+    _phases.timings = timings
+
+
+class TimedConnectionMixin(object):
+    """
+    Times the phases of an http request on a urllib3 connection; name resolution,
+    the tcp connect, the tls handshake, sending the request, and waiting for the
+    response headers (ttfb).  The dns time is measured with a separate lookup just
+    before the connect, so the connect time may include a (usually cached) second
+    resolution.
+    """
+
+    def _new_conn(self):
+        t1 = time.perf_counter()
+        try:
+            socket.getaddrinfo(self._dns_host, self.port, 0, socket.SOCK_STREAM)
+        except socket.gaierror:
+            pass  # let urllib3 raise its usual NameResolutionError
+        t2 = time.perf_counter()
+        add_phase('dns_ms', t2 - t1)
+        sock = super()._new_conn()
+        add_phase('connect_ms', time.perf_counter() - t2)
+        return sock
+
+    def connect(self):
+        t1 = time.perf_counter()
+        before = dict(current_phases())
+        super().connect()
+        total = (time.perf_counter() - t1) * 1000.0
+        timings = current_phases()
+        new_conn_ms = (timings.get('dns_ms', 0.0) - before.get('dns_ms', 0.0)) + \
+                      (timings.get('connect_ms', 0.0) - before.get('connect_ms', 0.0))
+        if isinstance(self, HTTPSConnection):
+            add_phase('tls_ms', max(total - new_conn_ms, 0.0) / 1000.0)
+        add_phase('connect_total_ms', total / 1000.0)
+
+    def request(self, *args, **kwargs):
+        t1 = time.perf_counter()
+        connect_before = current_phases().get('connect_total_ms', 0.0)
+        result = super().request(*args, **kwargs)
+        elapsed = (time.perf_counter() - t1) * 1000.0
+        connect_ms = current_phases().get('connect_total_ms', 0.0) - connect_before
+        add_phase('send_ms', max(elapsed - connect_ms, 0.0) / 1000.0)
+        return result
+
+    def getresponse(self, *args, **kwargs):
+        t1 = time.perf_counter()
+        result = super().getresponse(*args, **kwargs)
+        add_phase('ttfb_ms', time.perf_counter() - t1)
+        return result
+
+
+class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """ A requests HTTPAdapter whose connection pools use the timed connections. """
+
+    def init_poolmanager(self, *args, **kwargs):
+        HTTPAdapter.init_poolmanager(self, *args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+
+class JsonLinesSink(object):
+    """ A metrics sink which appends each request record to a JSON Lines file. """
+
+    def __init__(self, outfile):
+        self.outfile = outfile
+        self.lock = threading.Lock()
+        outdir = os.path.dirname(outfile)
+        if len(outdir) > 0:
+            os.makedirs(outdir, exist_ok=True)
+        self.f = open(outfile, 'at')
+
+    def emit(self, record):
+        line = json.dumps(record)
+        with self.lock:
+            self.f.write(line)
+            self.f.write('\n')
+            self.f.flush()
+
+    def close(self):
+        with self.lock:
+            self.f.close()
+
+
+class MetricsRecorder(object):
+    """
+    An instance of this class is held by the Transport, which passes it a record
+    of every http request; the operation label, status code, wall time, phase
+    timings, byte counts, and retry count.  Each record is passed to the sinks,
+    i.e. any objects with emit(record) and close() methods, and is aggregated by
+    label for the summary table displayed at process exit.
+    """
+
+    def __init__(self, sinks=None):
+        self.sinks = list()
+        if sinks is not None:
+            self.sinks = list(sinks)
+        self.totals = dict()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        sinks = list()
+        outfile = os.environ.get('AZURE_SEARCH_METRICS_FILE')
+        if outfile:
+            sinks.append(JsonLinesSink(outfile))
+        return cls(sinks)
+
+    @classmethod
+    def load(cls, infile):
+        # aggregate the records of a JSON Lines sink file, i.e. across several processes
+        recorder = cls()
+        with open(infile, 'rt') as f:
+            for line in f:
+                if len(line.strip()) > 0:
+                    recorder.record(json.loads(line))
+        return recorder
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def record(self, record):
+        for sink in self.sinks:
+            sink.emit(record)
+        with self.lock:
+            label = record['label']
+            if label not in self.totals:
+                self.totals[label] = {'requests': 0, 'errors': 0, 'retries': 0, 'wall_ms': 0.0,
+                                      'max_ms': 0.0, 'request_bytes': 0, 'response_bytes': 0}
+            t = self.totals[label]
+            t['requests'] = t['requests'] + 1
+            if record.get('error') or (record.get('status') or 0) >= 400:
+                t['errors'] = t['errors'] + 1
+            t['retries'] = t['retries'] + record.get('retries', 0)
+            t['wall_ms'] = t['wall_ms'] + record['wall_ms']
+            t['max_ms'] = max(t['max_ms'], record['wall_ms'])
+            t['request_bytes'] = t['request_bytes'] + (record.get('request_bytes') or 0)
+            t['response_bytes'] = t['response_bytes'] + (record.get('response_bytes') or 0)
+
+    def summary(self):
+        # the per-label totals, ordered by descending total time
+        with self.lock:
+            rows = [dict(t, label=label) for label, t in self.totals.items()]
+        overall = sum([r['wall_ms'] for r in rows])
+        for r in rows:
+            r['mean_ms'] = round(r['wall_ms'] / r['requests'], 2)
+            r['share'] = round(r['wall_ms'] / overall, 4) if overall > 0 else 0.0
+            r['wall_ms'] = round(r['wall_ms'], 2)
+            r['max_ms'] = round(r['max_ms'], 2)
+        return sorted(rows, key=lambda r: r['wall_ms'], reverse=True)
+
+    def display_summary(self):
+        rows = self.summary()
+        if len(rows) == 0:
+            return
+        print('request metrics summary:')
+        print('{:<44} {:>6} {:>6} {:>7} {:>10} {:>9} {:>9} {:>6} {:>10} {:>10}'.format(
+            'label', 'count', 'errors', 'retries', 'total_ms', 'mean_ms', 'max_ms', 'share', 'sent', 'received'))
+        for r in rows:
+            print('{:<44} {:>6} {:>6} {:>7} {:>10} {:>9} {:>9} {:>6.1%} {:>10} {:>10}'.format(
+                r['label'][0:44], r['requests'], r['errors'], r['retries'], r['wall_ms'], r['mean_ms'],
+                r['max_ms'], r['share'], r['request_bytes'], r['response_bytes']))
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+def operation_label(method, url):
+    # a label for the requests not given one, with the object names and document keys elided
+    parts = [p for p in urlparse(url).path.split('/') if len(p) > 0]
+    for idx in range(len(parts)):
+        if idx > 0 and parts[idx - 1] in collections:
+            parts[idx] = '*'
+        elif idx > 0 and parts[idx - 1] == 'docs' and parts[idx] not in docs_actions:
+            parts[idx] = '*'
+    return '{} /{}'.format(method.upper(), '/'.join(parts))
+
+def redact_headers(headers):
+    redacted = dict(headers)
+    for name in redacted.keys():
+        if name.lower() in ['api-key', 'authorization']:
+            redacted[name] = '<redacted>'
+    return redacted
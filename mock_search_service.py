@@ -0,0 +1,584 @@
+"""
+Usage:
+    python mock_search_service.py 8080
+    python mock_search_service.py 8080 <latency_ms> <throttle_rate> <error_rate>
+    python mock_search_service.py 8080 25 0.05 0.01
+    -
+    Then, in another shell, point the clients at it:
+    export AZURE_SEARCH_URL=http://localhost:8080
+"""
+
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+# A local, in-memory stand-in for the Azure Cognitive Search REST API, implementing
+# the routes generated by class Urls.  It is intended for offline load, latency, and
+# regression testing of the clients in this project; latency, throttling (HTTP 503)
+# and server errors (HTTP 500) can be injected at configurable, seeded-random rates.
+
+import json
+import random
+import re
+import sys
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, unquote
+
+
+class ODataFilter(object):
+    """
+    Parses and evaluates the subset of the OData $filter syntax used in this
+    project: comparisons (eq ne gt ge lt le), and/or/not, parentheses, and the
+    search.in(field, 'a,b,c', ',') function.
+    """
+
+    token_pattern = re.compile(
+        r"\s*(?:(?P<str>'(?:[^']|'')*')|(?P<date>\d{4}-\d{2}-\d{2}T[0-9:.]+(?:Z|[+-]\d{2}:\d{2})?)|"
+        r"(?P<num>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)|(?P<name>[A-Za-z_][A-Za-z0-9_./]*)|(?P<punct>[(),]))")
+
+    comparisons = ['eq', 'ne', 'gt', 'ge', 'lt', 'le']
+
+    def __init__(self, text):
+        self.tokens = self.tokenize(text)
+        self.pos = 0
+        self.tree = self.parse_or()
+        if self.pos != len(self.tokens):
+            raise ValueError('unexpected token in filter: {}'.format(self.tokens[self.pos]))
+
+    def tokenize(self, text):
+        tokens, pos = list(), 0
+        text = text.strip()
+        while pos < len(text):
+            m = self.token_pattern.match(text, pos)
+            if m is None or m.end() == pos:
+                raise ValueError('invalid filter syntax at: {}'.format(text[pos:]))
+            pos = m.end()
+            if m.group('str') is not None:
+                tokens.append(('lit', m.group('str')[1:-1].replace("''", "'")))
+            elif m.group('date') is not None:
+                tokens.append(('lit', m.group('date')))
+            elif m.group('num') is not None:
+                tokens.append(('lit', float(m.group('num'))))
+            elif m.group('name') is not None:
+                name = m.group('name')
+                if name in ['true', 'false']:
+                    tokens.append(('lit', name == 'true'))
+                elif name == 'null':
+                    tokens.append(('lit', None))
+                else:
+                    tokens.append(('name', name))
+            else:
+                tokens.append(('punct', m.group('punct')))
+        return tokens
+
+    def peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return (None, None)
+
+    def take(self, kind=None, value=None):
+        token = self.peek()
+        if (kind is not None and token[0] != kind) or (value is not None and token[1] != value):
+            raise ValueError('expected {} in filter, found {}'.format(value or kind, token[1]))
+        self.pos = self.pos + 1
+        return token
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.peek() == ('name', 'or'):
+            self.take()
+            node = ('or', node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.peek() == ('name', 'and'):
+            self.take()
+            node = ('and', node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.peek() == ('name', 'not'):
+            self.take()
+            return ('not', self.parse_not())
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        token = self.peek()
+        if token == ('punct', '('):
+            self.take()
+            node = self.parse_or()
+            self.take('punct', ')')
+            return node
+        if token == ('name', 'search.in'):
+            self.take()
+            self.take('punct', '(')
+            field = self.take('name')[1]
+            self.take('punct', ',')
+            values = self.take('lit')[1]
+            delimiters = ' ,'
+            if self.peek() == ('punct', ','):
+                self.take()
+                delimiters = self.take('lit')[1]
+            self.take('punct', ')')
+            members = [v for v in re.split('[{}]'.format(re.escape(delimiters)), values) if v != '']
+            return ('in', field, frozenset(members))
+        left = self.parse_operand()
+        op = self.take('name')[1]
+        if op not in self.comparisons:
+            raise ValueError('unsupported filter operator: {}'.format(op))
+        right = self.parse_operand()
+        return (op, left, right)
+
+    def parse_operand(self):
+        token = self.take()
+        if token[0] == 'name':
+            return ('field', token[1])
+        if token[0] == 'lit':
+            return ('lit', token[1])
+        raise ValueError('unexpected token in filter: {}'.format(token[1]))
+
+    def matches(self, doc):
+        return self.evaluate(self.tree, doc)
+
+    def evaluate(self, node, doc):
+        kind = node[0]
+        if kind == 'or':
+            return self.evaluate(node[1], doc) or self.evaluate(node[2], doc)
+        if kind == 'and':
+            return self.evaluate(node[1], doc) and self.evaluate(node[2], doc)
+        if kind == 'not':
+            return not self.evaluate(node[1], doc)
+        if kind == 'in':
+            return self.value(('field', node[1]), doc) in node[2]
+        left, right = self.value(node[1], doc), self.value(node[2], doc)
+        if kind == 'eq':
+            return left == right
+        if kind == 'ne':
+            return left != right
+        if left is None or right is None:
+            return False
+        try:
+            if kind == 'gt':
+                return left > right
+            if kind == 'ge':
+                return left >= right
+            if kind == 'lt':
+                return left < right
+            return left <= right
+        except TypeError:
+            return False
+
+    def value(self, operand, doc):
+        if operand[0] == 'lit':
+            return operand[1]
+        value = doc
+        for part in operand[1].split('/'):
+            if not isinstance(value, dict):
+                return None
+            value = value.get(part)
+        if isinstance(value, int) and not isinstance(value, bool):
+            return float(value)
+        return value
+
+
+class MockSearchService(object):
+    """
+    The in-memory state of the mock service; the collections of object definitions
+    by name, and the documents of each index by key.  If admin_key is set, only
+    the document reads are allowed without it; i.e. with a query key.
+    """
+
+    collections = ['indexes', 'indexers', 'datasources', 'skillsets', 'synonymmaps']
+
+    def __init__(self, latency_ms=0, throttle_rate=0.0, error_rate=0.0, seed=42, indexer_seconds=1.0):
+        self.latency_ms = float(latency_ms)
+        self.throttle_rate = float(throttle_rate)
+        self.error_rate = float(error_rate)
+        self.indexer_seconds = float(indexer_seconds)
+        self.random = random.Random(seed)
+        self.objects = dict()
+        for collection in self.collections:
+            self.objects[collection] = dict()
+        self.documents = dict()
+        self.indexer_runs = dict()
+        self.request_count = 0
+        self.admin_key = None
+        self.lock = threading.RLock()
+
+    def inject(self):
+        # returns an injected (status, body) failure, or None
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000.0)
+        with self.lock:
+            self.request_count = self.request_count + 1
+            r = self.random.random()
+        if r < self.throttle_rate:
+            return (503, error_body('ServiceUnavailable', 'injected throttling'))
+        if r < self.throttle_rate + self.error_rate:
+            return (500, error_body('InternalServerError', 'injected error'))
+        return None
+
+    def authorized(self, method, path, api_key):
+        if self.admin_key is None or api_key == self.admin_key:
+            return True
+        segments = [s for s in path.strip('/').split('/') if s != '']
+        if len(segments) >= 3 and segments[0] == 'indexes' and segments[2] == 'docs':
+            return method == 'GET' or segments[-1] in ['search', 'suggest', 'autocomplete']
+        return False
+
+    def handle(self, method, path, body):
+        segments = [unquote(s) for s in path.strip('/').split('/') if s != '']
+        if len(segments) == 0 or segments[0] not in self.collections:
+            return (404, error_body('NotFound', 'unknown resource: {}'.format(path)))
+        collection = segments[0]
+        with self.lock:
+            if len(segments) == 1:
+                if method == 'GET':
+                    return (200, {'value': list(self.objects[collection].values())})
+                if method == 'POST':
+                    return self.create(collection, body)
+            elif len(segments) == 2:
+                name = segments[1]
+                if method == 'GET':
+                    return self.get(collection, name)
+                if method == 'PUT':
+                    return self.create_or_update(collection, name, body)
+                if method == 'DELETE':
+                    return self.delete(collection, name)
+            elif collection == 'indexers' and len(segments) == 3:
+                return self.indexer_action(segments[1], segments[2], method)
+            elif collection == 'indexes' and len(segments) >= 3 and segments[2] == 'docs':
+                return self.docs_action(segments[1], segments[3:], method, body)
+        return (405, error_body('MethodNotAllowed', '{} {}'.format(method, path)))
+
+    def create(self, collection, body):
+        name = body.get('name')
+        if name in self.objects[collection]:
+            return (409, error_body('Conflict', '{} {} already exists'.format(collection, name)))
+        return self.create_or_update(collection, name, body)
+
+    def create_or_update(self, collection, name, body):
+        if not name:
+            return (400, error_body('BadRequest', 'a name is required'))
+        definition = dict(body)
+        definition['name'] = name
+        existed = name in self.objects[collection]
+        self.objects[collection][name] = definition
+        if collection == 'indexes' and name not in self.documents:
+            self.documents[name] = dict()
+        if collection == 'indexers' and not existed and not body.get('disabled'):
+            self.indexer_runs[name] = time.time()  # as in the service, a new indexer runs immediately
+        if existed:
+            return (200, definition)
+        return (201, definition)
+
+    def get(self, collection, name):
+        if name not in self.objects[collection]:
+            return (404, error_body('NotFound', '{} {} not found'.format(collection, name)))
+        return (200, self.objects[collection][name])
+
+    def delete(self, collection, name):
+        if name not in self.objects[collection]:
+            return (404, error_body('NotFound', '{} {} not found'.format(collection, name)))
+        del self.objects[collection][name]
+        if collection == 'indexes':
+            self.documents.pop(name, None)
+        if collection == 'indexers':
+            self.indexer_runs.pop(name, None)
+        return (204, None)
+
+    def indexer_action(self, name, action, method):
+        if name not in self.objects['indexers']:
+            return (404, error_body('NotFound', 'indexer {} not found'.format(name)))
+        if action == 'status' and method == 'GET':
+            return (200, self.indexer_status(name))
+        if action == 'reset' and method == 'POST':
+            self.indexer_runs.pop(name, None)
+            return (204, None)
+        if action == 'run' and method == 'POST':
+            self.indexer_runs[name] = time.time()
+            return (202, None)
+        return (405, error_body('MethodNotAllowed', '{} indexer {}'.format(method, action)))
+
+    def indexer_status(self, name):
+        # a run is 'inProgress' for indexer_seconds, then 'success'
+        status = {'status': 'running', 'lastResult': None, 'executionHistory': []}
+        started = self.indexer_runs.get(name)
+        if started is None:
+            return status
+        index_name = self.objects['indexers'][name].get('targetIndexName')
+        item_count = len(self.documents.get(index_name, {}))
+        elapsed = time.time() - started
+        result = {'status': 'inProgress', 'itemsProcessed': 0, 'itemsFailed': 0,
+                  'startTime': iso_time(started), 'endTime': None, 'errors': [], 'warnings': []}
+        if elapsed >= self.indexer_seconds:
+            result['status'] = 'success'
+            result['itemsProcessed'] = item_count
+            result['endTime'] = iso_time(started + self.indexer_seconds)
+        else:
+            result['itemsProcessed'] = int(item_count * elapsed / self.indexer_seconds)
+        status['lastResult'] = result
+        status['executionHistory'] = [result]
+        return status
+
+    def docs_action(self, index_name, rest, method, body):
+        if index_name not in self.objects['indexes']:
+            return (404, error_body('NotFound', 'index {} not found'.format(index_name)))
+        if rest == ['search'] and method == 'POST':
+            return self.search(index_name, body)
+        if rest == ['index'] and method == 'POST':
+            return self.index_documents(index_name, body)
+        if len(rest) == 1 and method == 'GET':
+            doc = self.documents[index_name].get(rest[0])
+            if doc is None:
+                return (404, None)
+            return (200, doc)
+        return (405, error_body('MethodNotAllowed', '{} docs/{}'.format(method, '/'.join(rest))))
+
+    def key_field(self, index_name):
+        for field in self.objects['indexes'][index_name].get('fields', []):
+            if str(field.get('key')).lower() == 'true':
+                return field['name']
+        return 'id'
+
+    def searchable_fields(self, index_name):
+        names = list()
+        for field in self.objects['indexes'][index_name].get('fields', []):
+            if str(field.get('searchable', 'true')).lower() == 'true' and 'String' in field.get('type', ''):
+                names.append(field['name'])
+        return names
+
+    def index_documents(self, index_name, body):
+        key_name = self.key_field(index_name)
+        docs = self.documents[index_name]
+        results, all_ok = list(), True
+        for doc in body.get('value', []):
+            doc = dict(doc)
+            action = doc.pop('@search.action', 'upload')
+            key = doc.get(key_name)
+            status = 200
+            if key is None:
+                status = 400
+            elif action == 'upload':
+                docs[key] = doc
+            elif action == 'mergeOrUpload':
+                merged = dict(docs.get(key, {}))
+                merged.update(doc)
+                docs[key] = merged
+            elif action == 'merge':
+                if key in docs:
+                    docs[key].update(doc)
+                else:
+                    status = 404
+            elif action == 'delete':
+                docs.pop(key, None)
+            else:
+                status = 400
+            ok = status == 200
+            all_ok = all_ok and ok
+            item = {'key': key, 'status': ok, 'statusCode': status, 'errorMessage': None}
+            if not ok:
+                item['errorMessage'] = 'document action {} failed'.format(action)
+            results.append(item)
+        if all_ok:
+            return (200, {'value': results})
+        return (207, {'value': results})
+
+    def search(self, index_name, params):
+        hits = list()
+        terms = search_terms(params.get('search', '*'))
+        fields = self.searchable_fields(index_name)
+        odata_filter = None
+        if params.get('filter'):
+            try:
+                odata_filter = ODataFilter(params['filter'])
+            except ValueError as e:
+                return (400, error_body('BadRequest', str(e)))
+        for doc in self.documents[index_name].values():
+            if odata_filter is not None and not odata_filter.matches(doc):
+                continue
+            score = score_document(doc, fields, terms)
+            if score > 0:
+                hits.append((score, doc))
+
+        for field, descending in reversed(orderby_clauses(params.get('orderby'))):
+            if field == 'search.score()':
+                hits.sort(key=lambda hit: hit[0], reverse=descending)
+            else:
+                hits.sort(key=lambda hit: sort_key(hit[1].get(field)), reverse=descending)
+
+        skip = int(params.get('skip', 0))
+        top = int(params.get('top', 50))
+        page_top = min(top, 1000)
+        page = hits[skip:skip + page_top]
+        select = params.get('select')
+        values = list()
+        for score, doc in page:
+            value = {'@search.score': float(score)}
+            if select and select != '*':
+                for name in [s.strip() for s in select.split(',')]:
+                    value[name] = doc.get(name)
+            else:
+                value.update(doc)
+            values.append(value)
+
+        resp_obj = {'@odata.context': 'mock/indexes(\'{}\')/$metadata#docs(*)'.format(index_name)}
+        if params.get('count') in [True, 'true']:
+            resp_obj['@odata.count'] = len(hits)
+        resp_obj['value'] = values
+        if top > page_top and skip + page_top < len(hits):
+            next_params = dict(params)
+            next_params['skip'] = skip + page_top
+            next_params['top'] = top - page_top
+            resp_obj['@search.nextPageParameters'] = next_params
+        return (200, resp_obj)
+
+
+def error_body(code, message):
+    return {'error': {'code': code, 'message': message}}
+
+def iso_time(epoch):
+    millis = int((epoch - int(epoch)) * 1000)
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(epoch)) + '.{:03d}Z'.format(millis)
+
+def search_terms(search):
+    # the simple query syntax subset; '*' matches all documents, 'term*' is a prefix
+    # match, and options such as 'searchFields=' embedded in the text are ignored
+    terms = list()
+    for term in re.split(r'[\s,]+', str(search or '*').lower()):
+        if '=' in term or ':' in term or term in ['', 'and', 'or', 'not']:
+            continue
+        terms.append(term.strip('"()+-~'))
+    if len(terms) == 0 or terms == ['*']:
+        return None
+    return terms
+
+def score_document(doc, fields, terms):
+    if terms is None:
+        return 1.0
+    text = ' '.join([str(doc.get(f, '')) for f in fields]).lower()
+    words = set(re.findall(r'\w+', text))
+    score = 0.0
+    for term in terms:
+        if term.endswith('*'):
+            prefix = term[:-1]
+            if any(w.startswith(prefix) for w in words):
+                score = score + 1.0
+        elif term in words:
+            score = score + 1.0
+    return score
+
+def orderby_clauses(orderby):
+    clauses = list()
+    if orderby:
+        for clause in orderby.split(','):
+            parts = clause.strip().split()
+            descending = len(parts) > 1 and parts[1].lower() == 'desc'
+            clauses.append((parts[0], descending))
+    return clauses
+
+def sort_key(value):
+    # None sorts first, as in Azure Search ascending order
+    if value is None:
+        return (0, 0, '')
+    if isinstance(value, (int, float)):
+        return (1, value, '')
+    return (2, 0, str(value))
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    service = None  # the MockSearchService, set by create_server
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_PUT(self):
+        self.dispatch('PUT')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+    def dispatch(self, method):
+        body = None
+        length = int(self.headers.get('Content-Length', 0))
+        if length > 0:
+            raw = self.rfile.read(length)
+            try:
+                body = json.loads(raw)
+            except ValueError:
+                self.reply(400, error_body('BadRequest', 'invalid json body'))
+                return
+        injected = self.service.inject()
+        if injected is not None:
+            self.reply(injected[0], injected[1], {'Retry-After': '1'} if injected[0] == 503 else {})
+            return
+        if not self.service.authorized(method, urlparse(self.path).path, self.headers.get('api-key')):
+            self.reply(403, error_body('Forbidden', 'an admin api-key is required'))
+            return
+        try:
+            status, resp_obj = self.service.handle(method, urlparse(self.path).path, body or {})
+        except Exception as e:
+            status, resp_obj = 500, error_body('InternalServerError', str(e))
+        self.reply(status, resp_obj)
+
+    def reply(self, status, resp_obj, headers={}):
+        data = b''
+        if resp_obj is not None:
+            data = json.dumps(resp_obj).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; odata.metadata=minimal')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_server(port=0, service=None):
+    # returns a ThreadingHTTPServer; use port 0 for an ephemeral port
+    if service is None:
+        service = MockSearchService()
+    handler = type('BoundMockRequestHandler', (MockRequestHandler,), {'service': service})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+def print_options(msg):
+    print(msg)
+    print(__doc__)
+
+
+if __name__ == "__main__":
+
+    if len(sys.argv) > 1:
+        port = int(sys.argv[1])
+        latency_ms, throttle_rate, error_rate = 0, 0.0, 0.0
+        if len(sys.argv) > 2:
+            latency_ms = float(sys.argv[2])
+        if len(sys.argv) > 3:
+            throttle_rate = float(sys.argv[3])
+        if len(sys.argv) > 4:
+            error_rate = float(sys.argv[4])
+        service = MockSearchService(latency_ms, throttle_rate, error_rate)
+        server = create_server(port, service)
+        print('mock search service listening on http://localhost:{}  latency_ms: {}  throttle_rate: {}  error_rate: {}'.format(
+            server.server_address[1], latency_ms, throttle_rate, error_rate))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        print_options('Error: no port argument provided.')
@@ -0,0 +1,147 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import json
+import os
+
+# pretty - parse the response and write it indented, as before (the default)
+# compact - write the response body as received, without parsing it
+# stream - also request the response body as a stream, and write it in chunks
+output_modes = ['pretty', 'compact', 'stream']
+
+
+def output_mode_from_env():
+    mode = os.environ.get('AZURE_SEARCH_OUTPUT_MODE', 'pretty').lower()
+    if mode not in output_modes:
+        raise ValueError('invalid AZURE_SEARCH_OUTPUT_MODE: {}; use one of {}'.format(mode, output_modes))
+    return mode
+
+
+class ResponseWriter(object):
+    """
+    An instance of this class is used by SearchClient to write the http response
+    bodies to the tmp/ directory in the compact and stream output modes.  The body
+    is written as received, in chunks if the response was streamed, rather than
+    being parsed into objects and pretty-printed; the memory used is therefore
+    independent of the response size.  A summary of a written response, i.e. the
+    document count, is parsed incrementally from the file only when needed.
+    """
+
+    def __init__(self, mode='compact', chunk_size=1048576):
+        self.mode = mode
+        self.chunk_size = int(chunk_size)
+
+    def save(self, r, outfile, streamed=False):
+        # returns the number of bytes written
+        outdir = os.path.dirname(outfile)
+        if len(outdir) > 0:
+            os.makedirs(outdir, exist_ok=True)
+        written = 0
+        with open(outfile, 'wb') as f:
+            if streamed:
+                for chunk in r.iter_content(chunk_size=self.chunk_size):
+                    f.write(chunk)
+                    written = written + len(chunk)
+            else:
+                content = getattr(r, 'content', None)
+                if content is None:
+                    content = r.text.encode('utf-8')  # i.e. a CachedResponse
+                f.write(content)
+                written = len(content)
+        print('file written: {} ({} bytes)'.format(outfile, written))
+        return written
+
+    def summary(self, infile, key_name=None):
+        # the top-level properties and the number of documents in the value array of a
+        # response file, and their key values if key_name is given
+        result = {'bytes': os.path.getsize(infile), 'properties': [], 'documents': 0}
+        keys = list()
+        with open(infile, 'rt', encoding='utf-8') as f:
+            for name, value in scan_json_object(f, 'value', self.chunk_size):
+                if name not in result['properties']:
+                    result['properties'].append(name)
+                if name == 'value':
+                    result['documents'] = result['documents'] + 1
+                    if key_name is not None:
+                        keys.append(value.get(key_name))
+                elif name in ['@odata.count', '@odata.nextLink', '@search.coverage']:
+                    result[name] = value
+        if key_name is not None:
+            result['keys'] = keys
+        return result
+
+
+def scan_json_object(f, array_name='value', chunk_size=65536):
+    """
+    Yield the (name, value) members of the JSON object in file f, reading it in
+    chunks.  The elements of the array_name array are yielded one at a time as
+    (array_name, element), so that only one document is in memory at a time.
+    """
+    decoder = json.JSONDecoder()
+    state = {'buf': '', 'pos': 0, 'eof': False}
+
+    def fill():
+        if state['pos'] > chunk_size:
+            state['buf'] = state['buf'][state['pos']:]
+            state['pos'] = 0
+        data = f.read(chunk_size)
+        if len(data) == 0:
+            state['eof'] = True
+        state['buf'] = state['buf'] + data
+
+    def peek():
+        # the next non-whitespace character, or None at the end of the file
+        while True:
+            buf, pos = state['buf'], state['pos']
+            while pos < len(buf) and buf[pos] in ' \t\r\n':
+                pos = pos + 1
+            state['pos'] = pos
+            if pos < len(buf):
+                return buf[pos]
+            if state['eof']:
+                return None
+            fill()
+
+    def expect(chars):
+        c = peek()
+        if c is None or c not in chars:
+            raise ValueError('invalid JSON; expected {} at {!r}'.format(chars, c))
+        state['pos'] = state['pos'] + 1
+        return c
+
+    def decode():
+        # decode the next value; a value ending at the end of the buffer may be
+        # truncated, i.e. a number, so read more until a delimiter follows it
+        peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(state['buf'], state['pos'])
+                if end < len(state['buf']) or state['eof']:
+                    state['pos'] = end
+                    return value
+            except json.JSONDecodeError:
+                if state['eof']:
+                    raise
+            fill()
+
+    expect('{')
+    if peek() == '}':
+        return
+    while True:
+        name = decode()
+        expect(':')
+        if name == array_name and peek() == '[':
+            expect('[')
+            if peek() == ']':
+                expect(']')
+            else:
+                while True:
+                    yield name, decode()
+                    if expect(',]') == ']':
+                        break
+        else:
+            yield name, decode()
+        if expect(',}') == '}':
+            return
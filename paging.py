@@ -0,0 +1,126 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import json
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SearchPager(object):
+    """
+    An instance of this class is created by SearchClient to fetch the complete
+    result set of a search, rather than only the first page.  Pages are requested
+    with skip/top, or per the @search.nextPageParameters returned by the service,
+    and each document is streamed to a JSON Lines file as its page arrives.  When
+    the total count is known the remaining pages can be fetched in parallel.
+    Note that the service limits skip to 100,000; use dump_index beyond that.
+    """
+
+    max_skip = 100000
+
+    def __init__(self, transport, urls, headers, page_size=1000):
+        self.transport = transport
+        self.urls = urls
+        self.headers = headers
+        self.page_size = int(page_size)
+
+    def fetch_page(self, idx_name, params):
+        url = self.urls.search_index(idx_name)
+        r = self.transport.post(url, self.headers, params)
+        if r.status_code != 200:
+            raise RuntimeError('search page failed: {} {}'.format(r.status_code, r.text[0:500]))
+        return json.loads(r.text)
+
+    def first_params(self, params):
+        # returns the params of the first page, and the overall limit if a top is specified
+        page_params = dict(params)
+        page_params['count'] = True
+        limit = params.get('top')
+        page_params['skip'] = int(params.get('skip', 0))
+        page_params['top'] = self.page_top(limit, 0)
+        if 'orderby' not in params:
+            print('warning: paging without an orderby may return inconsistent pages')
+        return page_params, limit
+
+    def page_top(self, limit, fetched):
+        if limit is None:
+            return self.page_size
+        return max(0, min(self.page_size, int(limit) - fetched))
+
+    def pages(self, idx_name, params):
+        # generator of the successive page response objects
+        page_params, limit = self.first_params(params)
+        fetched, total = 0, None
+        while page_params['top'] > 0:
+            resp_obj = self.fetch_page(idx_name, page_params)
+            values = resp_obj.get('value', [])
+            total = resp_obj.get('@odata.count', total)
+            fetched = fetched + len(values)
+            yield resp_obj
+            next_params = resp_obj.get('@search.nextPageParameters')
+            if next_params is not None:
+                page_params = dict(next_params)
+                continue
+            if len(values) < page_params['top']:
+                return
+            if total is not None and page_params['skip'] + len(values) >= total:
+                return
+            page_params = dict(page_params)
+            page_params['skip'] = page_params['skip'] + len(values)
+            page_params['top'] = self.page_top(limit, fetched)
+            if page_params['skip'] > self.max_skip:
+                print('warning: skip exceeds {}; use dump_index for the remaining documents'.format(self.max_skip))
+                return
+
+    def export(self, idx_name, params, outfile, workers=1):
+        t1 = time.time()
+        summary = {'index': idx_name, 'outfile': outfile, 'documents': 0, 'pages': 0, 'count': None}
+        with open(outfile, 'wt') as out:
+            if int(workers) > 1:
+                page_iter = self.parallel_pages(idx_name, params, int(workers))
+            else:
+                page_iter = self.pages(idx_name, params)
+            for resp_obj in page_iter:
+                if summary['count'] is None:
+                    summary['count'] = resp_obj.get('@odata.count')
+                summary['pages'] = summary['pages'] + 1
+                for doc in resp_obj.get('value', []):
+                    out.write(json.dumps(doc))
+                    out.write('\n')
+                    summary['documents'] = summary['documents'] + 1
+        summary['elapsed'] = round(time.time() - t1, 3)
+        print('file written: {}'.format(outfile))
+        return summary
+
+    def parallel_pages(self, idx_name, params, workers):
+        # the first page provides the total count, then the remaining pages are
+        # requested concurrently and yielded in order, with a bounded look-ahead
+        page_params, limit = self.first_params(params)
+        first = self.fetch_page(idx_name, page_params)
+        yield first
+        total = first.get('@odata.count')
+        if total is None or len(first.get('value', [])) < page_params['top']:
+            return
+        end = total
+        if limit is not None:
+            end = min(end, page_params['skip'] + int(limit))
+        end = min(end, self.max_skip + self.page_size)
+        page_list = list()
+        skip = page_params['skip'] + len(first['value'])
+        while skip < end:
+            p = dict(page_params)
+            p['skip'] = skip
+            p['top'] = min(self.page_size, end - skip)
+            page_list.append(p)
+            skip = skip + p['top']
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = list()
+            for p in page_list:
+                futures.append(executor.submit(self.fetch_page, idx_name, p))
+                if len(futures) >= workers * 2:
+                    yield futures.pop(0).result()
+            for f in futures:
+                yield f.result()
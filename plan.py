@@ -0,0 +1,164 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import json
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+# the SearchClient methods which may be used as plan steps
+plan_operations = [
+    'create_blob_datasource', 'create_cosmos_datasource', 'delete_datasource',
+    'create_index', 'update_index', 'delete_index',
+    'create_indexer', 'update_indexer', 'delete_indexer',
+    'reset_indexer', 'run_indexer', 'wait_for_indexer', 'reindex',
+    'create_synmap', 'update_synmap', 'delete_synmap',
+    'create_skillset', 'update_skillset', 'delete_skillset',
+    'list_indexes', 'list_indexers', 'list_datasources', 'list_skillsets',
+    'get_index', 'get_indexer', 'get_indexer_status', 'get_datasource', 'get_skillset',
+    'wait_for_object', 'search_index', 'search_index_all', 'lookup_doc',
+    'upload_documents', 'dump_index', 'load_dump', 'sync'
+]
+
+
+# the operations which return the response of one http request, or None if it wasn't sent
+response_operations = [
+    'create_blob_datasource', 'create_cosmos_datasource', 'delete_datasource',
+    'create_index', 'update_index', 'delete_index',
+    'create_indexer', 'update_indexer', 'delete_indexer',
+    'reset_indexer', 'run_indexer',
+    'create_synmap', 'update_synmap', 'delete_synmap',
+    'create_skillset', 'update_skillset', 'delete_skillset',
+    'list_indexes', 'list_indexers', 'list_datasources', 'list_skillsets',
+    'get_index', 'get_indexer', 'get_indexer_status', 'get_datasource', 'get_skillset',
+    'search_index', 'lookup_doc'
+]
+
+
+def load_plan(infile):
+    # YAML plans require the optional pyyaml package
+    if infile.endswith('.yml') or infile.endswith('.yaml'):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError('pyyaml is required for YAML plans; pip install pyyaml, or use a JSON plan')
+        with open(infile, 'rt') as f:
+            return yaml.safe_load(f)
+    with open(infile, 'rt') as f:
+        return json.loads(f.read())
+
+
+class PlanRunner(object):
+    """
+    An instance of this class executes a plan of SearchClient operations in a
+    single process, over the one pooled Transport, rather than as a shell script
+    of separate search-client.py invocations.  Each step has an id, an op, args
+    (a list) or kwargs (a dict), and optionally the ids of the steps it runs
+    after.  Steps whose dependencies are complete run in parallel on a thread pool.
+    A step fails if it raises an exception or returns an http response with a
+    status code of 300 or more that is not in its ok_statuses, or no response at
+    all, i.e. while the circuit is open; the steps which depend on a failed step
+    are skipped.
+    """
+
+    def __init__(self, client, workers=4):
+        self.client = client
+        self.workers = int(workers)
+        self.lock = threading.Lock()
+
+    def validate(self, plan):
+        steps = plan.get('steps', [])
+        ids = [s.get('id') for s in steps]
+        if None in ids or len(set(ids)) != len(ids):
+            raise ValueError('each plan step requires a unique id')
+        for step in steps:
+            if step.get('op') not in plan_operations:
+                raise ValueError('step {}: unsupported op: {}'.format(step['id'], step.get('op')))
+            for dep in step.get('after', []):
+                if dep not in ids:
+                    raise ValueError('step {}: unknown dependency: {}'.format(step['id'], dep))
+        self.topological_order(steps)
+        return steps
+
+    def topological_order(self, steps):
+        remaining = dict([(s['id'], set(s.get('after', []))) for s in steps])
+        order = list()
+        while len(remaining) > 0:
+            ready = sorted([sid for sid, deps in remaining.items() if len(deps) == 0])
+            if len(ready) == 0:
+                raise ValueError('plan has a dependency cycle among steps: {}'.format(sorted(remaining.keys())))
+            for sid in ready:
+                order.append(sid)
+                del remaining[sid]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return order
+
+    def run(self, plan):
+        steps = self.validate(plan)
+        by_id = dict([(s['id'], s) for s in steps])
+        results = dict()
+        t0 = time.time()
+        print('run_plan: {}  steps: {}  workers: {}'.format(plan.get('name', ''), len(steps), self.workers))
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            in_flight = dict()
+            while len(results) + len(in_flight) < len(steps) or len(in_flight) > 0:
+                for step in steps:
+                    sid = step['id']
+                    if sid in results or sid in in_flight.values():
+                        continue
+                    deps = step.get('after', [])
+                    if any([results.get(d, {}).get('status') in ['failed', 'skipped'] for d in deps]):
+                        results[sid] = {'id': sid, 'op': step['op'], 'status': 'skipped'}
+                        print('plan step skipped: {} (a dependency failed)'.format(sid))
+                    elif all([results.get(d, {}).get('status') == 'ok' for d in deps]):
+                        in_flight[executor.submit(self.run_step, step, t0)] = sid
+                if len(in_flight) == 0:
+                    continue
+                done, pending = wait(list(in_flight.keys()), return_when=FIRST_COMPLETED)
+                for f in done:
+                    sid = in_flight.pop(f)
+                    results[sid] = f.result()
+        summary = {'name': plan.get('name', ''), 'elapsed': round(time.time() - t0, 3)}
+        summary['steps'] = [results[sid] for sid in self.topological_order(steps)]
+        summary['failed'] = len([r for r in summary['steps'] if r['status'] != 'ok'])
+        self.display_summary(summary)
+        return summary
+
+    def run_step(self, step, t0):
+        result = {'id': step['id'], 'op': step['op'], 'start': round(time.time() - t0, 3)}
+        print('plan step start: {} {}'.format(step['id'], step['op']))
+        try:
+            method = getattr(self.client, step['op'])
+            value = method(*step.get('args', []), **step.get('kwargs', {}))
+            result['status'] = 'ok'
+            status_code = getattr(value, 'status_code', None)
+            if value is None and step['op'] in response_operations:
+                result['status'] = 'failed'
+                result['error'] = 'no response'
+            elif status_code is not None:
+                result['status_code'] = status_code
+                if status_code >= 300 and status_code not in step.get('ok_statuses', []):
+                    result['status'] = 'failed'
+            elif isinstance(value, dict) and value.get('status') not in [None, 'success']:
+                result['status'] = 'failed'  # i.e. a wait_for_indexer result
+                result['error'] = value.get('status')
+            elif value is False:
+                result['status'] = 'failed'  # i.e. wait_for_object timed out
+        except Exception as e:
+            result['status'] = 'failed'
+            result['error'] = str(e)
+        result['elapsed'] = round(time.time() - t0 - result['start'], 3)
+        print('plan step {}: {} {} elapsed: {}'.format(result['status'], step['id'], step['op'], result['elapsed']))
+        return result
+
+    def display_summary(self, summary):
+        print('plan summary: {}  elapsed: {}  failed: {}'.format(summary['name'], summary['elapsed'], summary['failed']))
+        for r in summary['steps']:
+            print('  {:<24} {:<24} {:<8} start: {:>8} elapsed: {:>8}  {}'.format(
+                r['id'], r['op'], r['status'], r.get('start', ''), r.get('elapsed', ''),
+                r.get('status_code', r.get('error', ''))))
@@ -0,0 +1,192 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import base64
+import json
+import os
+import threading
+import time
+import zlib
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+
+def encode_key(value):
+    # the indexer base64Encode mapping function; url-safe base64 with the
+    # '=' padding replaced by a trailing digit, the number of padding characters
+    encoded = base64.urlsafe_b64encode(value.encode('utf-8')).decode('ascii')
+    stripped = encoded.rstrip('=')
+    return '{}{}'.format(stripped, len(encoded) - len(stripped))
+
+def decode_key(key):
+    try:
+        padding = int(key[-1])
+        return base64.urlsafe_b64decode(key[:-1] + ('=' * padding)).decode('utf-8')
+    except (ValueError, IndexError, UnicodeDecodeError):
+        return None
+
+def blob_path(container_url, blob_name):
+    # the metadata_storage_path of a blob; its url, with the name url-encoded as by the storage sdk
+    return '{}/{}'.format(container_url.rstrip('/'), quote(blob_name, safe='/~'))
+
+def epoch_seconds(value):
+    # a datetime, or an Edm.DateTimeOffset string such as 2020-09-18T21:19:46.9950000Z
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    text = str(value).replace('Z', '+00:00')
+    offset = ''
+    if len(text) > 6 and text[-6] in '+-':
+        text, offset = text[0:-6], text[-6:]
+    if '.' in text:
+        head, frac = text.split('.', 1)
+        text = '{}.{}'.format(head, (frac + '000000')[0:6])
+    return datetime.fromisoformat(text + (offset or '+00:00')).timestamp()
+
+
+class SpillPartitions(object):
+    """
+    A set of JSON Lines spill files, one per hash partition of the keys, so that
+    a set of keys much larger than memory can be processed a partition at a time.
+    """
+
+    def __init__(self, outdir, prefix, partitions):
+        self.outdir = outdir
+        self.prefix = prefix
+        self.partitions = int(partitions)
+        self.count = 0
+        self.lock = threading.Lock()
+        os.makedirs(outdir, exist_ok=True)
+        self.files = [open(self.filename(p), 'wt', encoding='utf-8') for p in range(self.partitions)]
+
+    def filename(self, p):
+        return os.path.join(self.outdir, '{}-{:04d}.jsonl'.format(self.prefix, p))
+
+    def partition(self, key):
+        return zlib.crc32(key.encode('utf-8')) % self.partitions
+
+    def add(self, record):
+        # record[0] is the key
+        line = json.dumps(record)
+        with self.lock:
+            f = self.files[self.partition(record[0])]
+            f.write(line)
+            f.write('\n')
+            self.count = self.count + 1
+
+    def close(self):
+        for f in self.files:
+            f.close()
+
+    def read(self, p):
+        with open(self.filename(p), 'rt', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+    def remove(self):
+        for p in range(self.partitions):
+            try:
+                os.remove(self.filename(p))
+            except FileNotFoundError:
+                pass
+
+
+class Reconciler(object):
+    """
+    An instance of this class is created by StorageClient to compare the blobs of a
+    container to the documents of the index populated from it.  The blob names are
+    encoded as the indexer does, base64 of the metadata_storage_path, and the blob
+    and index keys are streamed into hash-partitioned spill files as they're listed;
+    neither list is held in memory.  Each partition is then reconciled in turn, with
+    only the index keys of that partition in a dict, to find the missing blobs (not
+    in the index), the orphaned documents (no blob), and the stale documents (the
+    blob was modified after the document's last_modified).  The sets are written to
+    JSON Lines files in tmp/reconcile/<index>/.
+    """
+
+    def __init__(self, container_url, workdir, partitions=64, tolerance=1.0):
+        self.container_url = container_url
+        self.workdir = workdir
+        self.partitions = int(partitions)
+        self.tolerance = float(tolerance)
+        self.blobs = SpillPartitions(os.path.join(workdir, 'spill'), 'blobs', self.partitions)
+        self.docs = SpillPartitions(os.path.join(workdir, 'spill'), 'docs', self.partitions)
+
+    def add_blobs(self, blobs):
+        # blobs is an iterable of objects with name and last_modified, i.e. a paged BlobProperties listing
+        for blob in blobs:
+            key = encode_key(blob_path(self.container_url, blob.name))
+            self.blobs.add([key, epoch_seconds(blob.last_modified), blob.name])
+            if self.blobs.count % 100000 == 0:
+                print('reconcile, blobs listed: {}'.format(self.blobs.count))
+        return self.blobs.count
+
+    def add_index(self, dumper, idx_name, modified_name='last_modified'):
+        # export the keys and last_modified values of the index, by key range concurrently
+        index_def = dumper.get_json(dumper.urls.get_index(idx_name))
+        dumper.key_name = dumper.index_key_name(index_def)
+        select = '{},{}'.format(dumper.key_name, modified_name)
+        ranges = dumper.partition_ranges(idx_name)
+
+        def export_range(r):
+            for doc in dumper.iter_range(idx_name, r[0], r[1], select):
+                self.docs.add([doc[dumper.key_name], epoch_seconds(doc.get(modified_name))])
+
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            list(executor.map(export_range, ranges))
+        return self.docs.count
+
+    def reconcile(self):
+        t1 = time.time()
+        self.blobs.close()
+        self.docs.close()
+        counts = {'blobs': self.blobs.count, 'documents': self.docs.count,
+                  'matched': 0, 'missing': 0, 'orphaned': 0, 'stale': 0}
+        outfiles = dict()
+        for name in ['missing', 'orphaned', 'stale']:
+            outfiles[name] = open(os.path.join(self.workdir, '{}.jsonl'.format(name)), 'wt', encoding='utf-8')
+        try:
+            for p in range(self.partitions):
+                docs = dict()
+                for key, modified in self.docs.read(p):
+                    docs[key] = modified
+                for key, blob_modified, name in self.blobs.read(p):
+                    if key not in docs:
+                        self.write(outfiles['missing'], {'key': key, 'name': name, 'last_modified': blob_modified})
+                        counts['missing'] = counts['missing'] + 1
+                        continue
+                    doc_modified = docs.pop(key)
+                    counts['matched'] = counts['matched'] + 1
+                    if doc_modified is None or (blob_modified is not None and
+                                                blob_modified - doc_modified > self.tolerance):
+                        self.write(outfiles['stale'], {'key': key, 'name': name,
+                            'blob_last_modified': blob_modified, 'index_last_modified': doc_modified})
+                        counts['stale'] = counts['stale'] + 1
+                # the index keys left have no blob
+                for key, modified in docs.items():
+                    self.write(outfiles['orphaned'], {'key': key, 'path': decode_key(key), 'last_modified': modified})
+                    counts['orphaned'] = counts['orphaned'] + 1
+        finally:
+            for f in outfiles.values():
+                f.close()
+            self.discard()
+        counts['elapsed'] = round(time.time() - t1, 3)
+        counts['files'] = dict([(name, f.name) for name, f in outfiles.items()])
+        return counts
+
+    def discard(self):
+        # close and remove the spill files, i.e. after a failed listing
+        for spill in [self.blobs, self.docs]:
+            spill.close()
+            spill.remove()
+
+    def write(self, f, obj):
+        f.write(json.dumps(obj))
+        f.write('\n')
@@ -1,20 +1,11 @@
 #!/bin/bash
 
-# Reset and Run the Indexers.
+# Reset and Run the Indexers, and wait for them to complete.
 # Chris Joakim, Microsoft, 2020/09/26
 
 source bin/activate
 
-echo '========== reset_indexer airports'
-python search-client.py reset_indexer airports
-
-echo '========== run_indexer airports'
-python search-client.py run_indexer airports
-
-echo '========== reset_indexer documents'
-python search-client.py reset_indexer documents
-
-echo '========== run_indexer documents'
-python search-client.py run_indexer documents
+echo '========== reindex airports,documents'
+python search-client.py reindex airports,documents
 
 echo 'done'
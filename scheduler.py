@@ -0,0 +1,197 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import os
+import random
+import threading
+import time
+
+from urllib.parse import urlparse
+
+import requests
+
+query_actions = ['search', 'suggest', 'autocomplete', '$count']
+
+
+class CircuitOpenError(Exception):
+    """ Raised instead of sending a request while the circuit breaker of its host is open. """
+    pass
+
+
+class TokenBucket(object):
+    """
+    A client-side rate limiter; acquire() blocks until a token is available.  The
+    bucket refills at rate tokens per second up to burst tokens.  A rate of 0 means
+    unlimited.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.burst = float(burst) if burst is not None else max(self.rate, 1.0)
+        self.tokens = self.burst
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # returns the number of seconds waited
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens = self.tokens - 1.0
+                    return waited
+                wait = (1.0 - self.tokens) / self.rate
+            self.sleep(wait)
+            waited = waited + wait
+
+
+class CircuitBreaker(object):
+    """
+    Stops sending requests to a degraded service.  After failure_threshold
+    consecutive failures (5xx responses or connection errors) the circuit opens
+    and requests fail fast for reset_seconds; then a single trial request is
+    allowed (half-open), which closes the circuit if it succeeds.
+    """
+
+    def __init__(self, failure_threshold=5, reset_seconds=30.0, clock=time.monotonic):
+        self.failure_threshold = int(failure_threshold)
+        self.reset_seconds = float(reset_seconds)
+        self.clock = clock
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == 'open':
+                if self.clock() - self.opened_at < self.reset_seconds:
+                    return False
+                self.state = 'half-open'
+                return True
+            if self.state == 'half-open':
+                return False  # a trial request is already in flight
+            return True
+
+    def on_success(self):
+        with self.lock:
+            self.state = 'closed'
+            self.failures = 0
+
+    def on_failure(self):
+        with self.lock:
+            self.failures = self.failures + 1
+            if self.state == 'half-open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    print('circuit breaker open after {} failures; pausing for {} seconds'.format(
+                        self.failures, self.reset_seconds))
+                self.state = 'open'
+                self.opened_at = self.clock()
+
+
+class RequestScheduler(object):
+    """
+    An instance of this class is used by the Transport to send each request.
+    Requests are rate limited per endpoint class, 'query' for the document reads
+    and 'admin' for everything else, with a TokenBucket each.  Throttled (429) and
+    unavailable (502, 503, 504) responses, and connection errors, are retried with
+    exponential backoff and full jitter, honoring the Retry-After header.  A
+    CircuitBreaker per host fails fast while the service is degraded.
+    """
+
+    retry_statuses = [429, 502, 503, 504]
+    failure_statuses = [500, 502, 503, 504]
+
+    def __init__(self, max_attempts=5, base_delay=0.5, max_delay=30.0, admin_rate=0, query_rate=0,
+                 failure_threshold=5, reset_seconds=30.0, sleep=time.sleep):
+        self.max_attempts = int(max_attempts)
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+        self.buckets = {'admin': TokenBucket(admin_rate), 'query': TokenBucket(query_rate)}
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.sleep = sleep
+        self.breakers = dict()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_attempts=int(os.environ.get('AZURE_SEARCH_MAX_ATTEMPTS', '5')),
+            admin_rate=float(os.environ.get('AZURE_SEARCH_ADMIN_RATE', '0')),
+            query_rate=float(os.environ.get('AZURE_SEARCH_QUERY_RATE', '0')))
+
+    def endpoint_class(self, method, url):
+        parts = [p for p in urlparse(url).path.split('/') if len(p) > 0]
+        if 'docs' in parts:
+            if method.lower() == 'get' or parts[-1] in query_actions:
+                return 'query'
+        return 'admin'
+
+    def breaker(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_seconds)
+            return self.breakers[host]
+
+    def execute(self, method, url, send, max_attempts=None):
+        # send is a function of no arguments returning a response; returns (response, retries)
+        if max_attempts is None:
+            max_attempts = self.max_attempts
+        bucket = self.buckets[self.endpoint_class(method, url)]
+        breaker = self.breaker(url)
+        attempt = 0
+        while True:
+            attempt = attempt + 1
+            if not breaker.allow():
+                raise CircuitOpenError('circuit open for {}; the service is failing'.format(urlparse(url).netloc))
+            bucket.acquire()
+            try:
+                r = send()
+            except requests.exceptions.ConnectionError:
+                breaker.on_failure()
+                if attempt >= max_attempts:
+                    raise
+                self.sleep(self.backoff_seconds(attempt, None))
+                continue
+            except Exception:
+                breaker.on_failure()
+                raise
+            if r.status_code in self.failure_statuses:
+                breaker.on_failure()
+            else:
+                breaker.on_success()
+            if r.status_code not in self.retry_statuses or attempt >= max_attempts:
+                return r, attempt - 1
+            print('request throttled or unavailable: {} {}; attempt {} of {}'.format(
+                r.status_code, url, attempt, max_attempts))
+            # release the connection of a streamed response back to the pool
+            r.close()
+            self.sleep(self.backoff_seconds(attempt, r))
+
+    def backoff_seconds(self, attempt, r):
+        if r is not None:
+            retry_after = r.headers.get('Retry-After')
+            if retry_after is not None:
+                try:
+                    return min(float(retry_after), self.max_delay)
+                except ValueError:
+                    pass
+            retry_after_ms = r.headers.get('retry-after-ms')
+            if retry_after_ms is not None:
+                try:
+                    return min(float(retry_after_ms) / 1000.0, self.max_delay)
+                except ValueError:
+                    pass
+        # full jitter; a random delay up to the exponential cap
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
@@ -112,11 +112,12 @@ class Schemas(BaseClass):
         return schema
 
     def index_schema_diff(self, file1, file2):
-        f1_schema = self.load_json_file(file1)
-        f2_schema = self.load_json_file(file2)
-        all_names, f1_dict, f2_dict, diffs = dict(), dict(), dict(), list()
+        return self.index_object_diff(self.load_json_file(file1), self.load_json_file(file2))
 
-        # gather the fields from both files
+    def index_object_diff(self, f1_schema, f2_schema):
+        all_names, f1_dict, f2_dict = dict(), dict(), dict()
+
+        # gather the fields from both schemas
         for field in f1_schema['fields']:
             name = field['name']
             f1_dict[name] = field
@@ -125,50 +126,30 @@ class Schemas(BaseClass):
             name = field['name']
             f2_dict[name] = field
             all_names[name] = name
-
-        # compare the entries in file1 vs file2
-        for field_name in sorted(all_names.keys()):
-            if (field_name in f1_dict.keys()) and (field_name in f2_dict.keys()):
-                field1 = f1_dict[field_name]
-                field2 = f2_dict[field_name]
-                s1 = json.dumps(field1, sort_keys=True)
-                s2 = json.dumps(field2, sort_keys=True)
-                if s1 != s2:
-                    diffs.append(('field is different', field_name, field1, field2))
-            elif field_name in f1_dict.keys():
-                field = f1_dict[field_name]
-                diffs.append(('field not in file2', field_name, f1_dict[field_name]))
-            elif field_name in f2_dict.keys():
-                field = f2_dict[field_name]
-                diffs.append(('field not in file1', field_name, f2_dict[field_name]))
-        return diffs
+        return self.fields_diff(all_names, f1_dict, f2_dict)
 
     def indexer_schema_diff(self, file1, file2):
-        f1_schema = self.load_json_file(file1)
-        f2_schema = self.load_json_file(file2)
-        all_names, f1_dict, f2_dict, diffs = dict(), dict(), dict(), list()
-
-        # gather the fieldMappings fields from both files
-        for field in f1_schema['fieldMappings']:
-            name = field['sourceFieldName']
-            f1_dict[name] = field
-            all_names[name] = name
-        for field in f2_schema['fieldMappings']:
-            name = field['sourceFieldName']
-            f2_dict[name] = field
-            all_names[name] = name
-
-        # gather the outputFieldMappings fields from both files
-        for field in f1_schema['outputFieldMappings']:
-            name = field['sourceFieldName']
-            f1_dict[name] = field
-            all_names[name] = name
-        for field in f2_schema['outputFieldMappings']:
-            name = field['sourceFieldName']
-            f2_dict[name] = field
-            all_names[name] = name
-
+        return self.indexer_object_diff(self.load_json_file(file1), self.load_json_file(file2))
+
+    def indexer_object_diff(self, f1_schema, f2_schema):
+        all_names, f1_dict, f2_dict = dict(), dict(), dict()
+
+        # gather the fieldMappings and outputFieldMappings fields from both schemas;
+        # either may be absent, i.e. in the airports indexer
+        for mappings in ['fieldMappings', 'outputFieldMappings']:
+            for field in f1_schema.get(mappings) or []:
+                name = field['sourceFieldName']
+                f1_dict[name] = field
+                all_names[name] = name
+            for field in f2_schema.get(mappings) or []:
+                name = field['sourceFieldName']
+                f2_dict[name] = field
+                all_names[name] = name
+        return self.fields_diff(all_names, f1_dict, f2_dict)
+
+    def fields_diff(self, all_names, f1_dict, f2_dict):
         # compare the entries in file1 vs file2
+        diffs = list()
         for field_name in sorted(all_names.keys()):
             if (field_name in f1_dict.keys()) and (field_name in f2_dict.keys()):
                 field1 = f1_dict[field_name]
@@ -178,9 +159,7 @@ class Schemas(BaseClass):
                 if s1 != s2:
                     diffs.append(('field is different', field_name, field1, field2))
             elif field_name in f1_dict.keys():
-                field = f1_dict[field_name]
                 diffs.append(('field not in file2', field_name, f1_dict[field_name]))
             elif field_name in f2_dict.keys():
-                field = f2_dict[field_name]
                 diffs.append(('field not in file1', field_name, f2_dict[field_name]))
         return diffs
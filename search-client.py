@@ -27,6 +27,15 @@ Usage:
     python search-client.py delete_indexer documents
     python search-client.py create_indexer airports airports_indexer
     -
+    python search-client.py wait_for_indexer documents
+    python search-client.py reindex airports,documents
+    python search-client.py recreate_documents
+    python search-client.py recreate_airports
+    python search-client.py run_plan plans/recreate_documents.json
+    python search-client.py run_plan plans/reindex.json 4
+    python search-client.py sync schemas/desired_state.json
+    python search-client.py sync schemas/desired_state.json apply
+    -
     python search-client.py create_synmap synmap synonym_map_v1
     python search-client.py update_synmap synmap synonym_map_v1
     python search-client.py delete_synmap synmap 
@@ -35,6 +44,22 @@ Usage:
     python search-client.py delete_skillset skillset 
     -
     python search-client.py search_index documents all_documents
+    python search-client.py search_index_all documents all_documents
+    python search-client.py search_index_all airports all_airports 4
+    python search-client.py upload_documents airports data/us_airports.json airports_index_v1 4
+    python search-client.py dump_index documents 4
+    python search-client.py load_dump documents tmp/dump/documents 4
+    python search-client.py async_search_sweep auto all 8 30
+    python search-client.py async_search_sweep airports,documents all_airports,all_documents 4 10
+    python search-client.py federated_search documents,airports charlotte 10
+    python search-client.py bench_searches auto all 20 4 documents_index_v1
+    python search-client.py bench_searches airports all_airports,airports_charl 50 8
+    python search-client.py bench_compare tmp/bench_documents_index_v1_<epoch>.json tmp/bench_documents_index_v2_<epoch>.json
+    python search-client.py metrics_summary tmp/metrics.jsonl
+    python search-client.py clear_cache
+    python search-client.py clear_cache airports
+    python search-client.py lookup_docs documents tmp/document_keys.txt
+    python search-client.py lookup_docs airports - get 16
     python search-client.py lookup_doc documents aHR0cHM6Ly9jam9ha2ltc2VhcmNoLmJsb2IuY29yZS53aW5kb3dzLm5ldC9kb2N1bWVudHMvMjAyMS1zdXBlci1jdWItYzEyNS1nYWxsZXJ5LTA0LTI0MDB4YXV0by5qcGc1
     -
     python search-client.py index_schema_diff schemas/documents_index_v1.json schemas/documents_index_v2.json
@@ -59,35 +84,49 @@ __version__ = "2020.09.29"
 # https://docs.microsoft.com/en-us/azure/search/search-howto-index-cosmosdb
 # https://requests.readthedocs.io/en/master/user/quickstart/
 
+import atexit
+import glob
 import json
 import os
 import sys
+import threading
 import time
-import requests
-
-from docopt import docopt
 
 from base import BaseClass
-from schemas import Schemas
-from urls import Urls
+
+# The other modules of this project, and requests and docopt, are imported when
+# first used so that the commands which don't need them start quickly.
 
 
 class SearchClient(BaseClass):
+    """
+    The schemas, urls, transport, cache, and named_searches attributes are
+    created when first used; i.e. display_env makes no http requests, and so
+    never imports requests or reads searches.json.
+    """
 
     def __init__(self):
         BaseClass.__init__(self)
         self.u = None  # the current url
+        self.failures = 0  # the number of failed invoke requests; see count_failure
+        self.failures_lock = threading.Lock()
+        self.previous_starts = dict()  # indexer name -> startTime of the run before run_indexer
         self.r = None  # the current requests response object
         self.config = dict()
-        self.schemas = Schemas()
-        self.urls = Urls()
+        self.outdir = 'tmp'  # the directory of the saved response files
+        self._schemas = None
+        self._urls = None
+        self._transport = None
+        self._cache = None
+        self._named_searches = None
+        self._writer = None
+        self._lazy_lock = threading.RLock()  # the attributes may be first used on several threads
         self.user_agent = {'User-agent': 'Mozilla/5.0'}
         self.search_name = os.environ['AZURE_SEARCH_NAME']
         self.search_url  = os.environ['AZURE_SEARCH_URL']
         self.search_admin_key = os.environ['AZURE_SEARCH_ADMIN_KEY']
         self.search_query_key = os.environ['AZURE_SEARCH_QUERY_KEY']
         self.search_api_version = 'api-version=2020-06-30'
-        self.named_searches = self.named_searches_dict()
 
         self.admin_headers = dict()
         self.admin_headers['Content-Type'] = 'application/json'
@@ -97,6 +136,55 @@ class SearchClient(BaseClass):
         self.query_headers['Content-Type'] = 'application/json'
         self.query_headers['api-key'] = self.search_query_key
 
+    @property
+    def schemas(self):
+        with self._lazy_lock:
+            if self._schemas is None:
+                from schemas import Schemas
+                self._schemas = Schemas()
+        return self._schemas
+
+    @property
+    def urls(self):
+        with self._lazy_lock:
+            if self._urls is None:
+                from urls import Urls
+                self._urls = Urls()
+        return self._urls
+
+    @property
+    def transport(self):
+        with self._lazy_lock:
+            if self._transport is None:
+                from transport import Transport
+                self._transport = Transport()
+                atexit.register(self._transport.metrics.display_summary)
+        return self._transport
+
+    @property
+    def cache(self):
+        with self._lazy_lock:
+            if self._cache is None:
+                from cache import QueryCache
+                self._cache = QueryCache.from_env(self.urls.search_url)
+        return self._cache
+
+    @property
+    def writer(self):
+        # writes the response bodies in the compact and stream output modes
+        with self._lazy_lock:
+            if self._writer is None:
+                from output import ResponseWriter, output_mode_from_env
+                self._writer = ResponseWriter(output_mode_from_env())
+        return self._writer
+
+    @property
+    def named_searches(self):
+        with self._lazy_lock:
+            if self._named_searches is None:
+                self._named_searches = self.named_searches_dict()
+        return self._named_searches
+
     def display_env(self):
         print('search_name:      {}'.format(self.search_name))
         print('search_url:       {}'.format(self.search_url))
@@ -107,54 +195,54 @@ class SearchClient(BaseClass):
 
     def list_indexes(self):
         url = self.urls.list_indexes()
-        self.invoke('list_indexes', 'get', url, self.admin_headers)
+        return self.invoke('list_indexes', 'get', url, self.admin_headers)
 
     def list_indexers(self):
         url = self.urls.list_indexers()
-        self.invoke('list_indexers', 'get', url, self.admin_headers)
+        return self.invoke('list_indexers', 'get', url, self.admin_headers)
 
     def list_datasources(self):
         url = self.urls.list_datasources()
-        self.invoke('list_datasources', 'get', url, self.admin_headers)
+        return self.invoke('list_datasources', 'get', url, self.admin_headers)
 
     def list_skillsets(self):
         url = self.urls.list_skillsets()
-        self.invoke('list_skillsets', 'get', url, self.admin_headers)
+        return self.invoke('list_skillsets', 'get', url, self.admin_headers)
 
     def get_index(self, name):
         url = self.urls.get_index(name)
-        self.invoke('get_index', 'get', url, self.admin_headers)
+        return self.invoke('get_index', 'get', url, self.admin_headers)
 
     def get_indexer(self, name):
         url = self.urls.get_indexer(name)
-        self.invoke('get_indexer', 'get', url, self.admin_headers)
+        return self.invoke('get_indexer', 'get', url, self.admin_headers)
 
     def get_indexer_status(self, name):
         url = self.urls.get_indexer_status(name)
-        self.invoke('get_indexer_status', 'get', url, self.admin_headers)
+        return self.invoke('get_indexer_status', 'get', url, self.admin_headers)
 
     def get_datasource(self, name):
         url = self.urls.get_datasource(name)
-        self.invoke('get_datasource', 'get', url, self.admin_headers)
+        return self.invoke('get_datasource', 'get', url, self.admin_headers)
 
     def get_skillset(self, name):
         url = self.urls.get_skillset(name)
-        self.invoke('get_skillset', 'get', url, self.admin_headers)
+        return self.invoke('get_skillset', 'get', url, self.admin_headers)
 
     def create_index(self, name, schema_file):
-        self.modify_index('create', name, schema_file)
+        return self.modify_index('create', name, schema_file)
 
     def update_index(self, name, schema_file):
-        self.modify_index('update', name, schema_file)
+        return self.modify_index('update', name, schema_file)
 
     def delete_index(self, name):
-        self.modify_index('delete', name, None)
+        return self.modify_index('delete', name, None)
 
     def modify_index(self, action, name, schema_file):
         # read the schema json file if necessary
         schema = None
         if action in ['create', 'update']:
-            schema = self.schemas.read(schema_file, {'name': name})
+            schema = self.schema_body('indexes', name, schema_file)
 
         if action == 'create':
             http_method = 'post'
@@ -167,22 +255,24 @@ class SearchClient(BaseClass):
             url = self.urls.modify_index(name)
 
         function = '{}_index_{}'.format(action, name)
-        self.invoke(function, http_method, url, self.admin_headers, schema)
+        r = self.invoke(function, http_method, url, self.admin_headers, schema)
+        self.cache.invalidate(name)
+        return r
 
     def create_indexer(self, name, schema_file):
-        self.modify_indexer('create', name, schema_file)
+        return self.modify_indexer('create', name, schema_file)
 
     def update_indexer(self, name, schema_file):
-        self.modify_indexer('update', name, schema_file)
+        return self.modify_indexer('update', name, schema_file)
 
     def delete_indexer(self, name):
-        self.modify_indexer('delete', name, None)
+        return self.modify_indexer('delete', name, None)
 
     def modify_indexer(self, action, name, schema_file):
         # read the schema json file if necessary
         schema = None
         if action in ['create', 'update']:
-            schema = self.schemas.read(schema_file, {'name': name})
+            schema = self.schema_body('indexers', name, schema_file)
 
         if action == 'create':
             http_method = 'post'
@@ -195,15 +285,124 @@ class SearchClient(BaseClass):
             url = self.urls.modify_indexer(name)
 
         function = '{}_indexer_{}'.format(action, name)
-        self.invoke(function, http_method, url, self.admin_headers, schema)
+        return self.invoke(function, http_method, url, self.admin_headers, schema)
 
     def reset_indexer(self, name):
         url = self.urls.reset_indexer(name)
-        self.invoke('reset_indexer', 'post', url, self.admin_headers)
+        r = self.invoke('reset_indexer', 'post', url, self.admin_headers)
+        self.cache.invalidate()  # the indexer may target any index
+        return r
 
     def run_indexer(self, name):
+        # note the start of the previous run, so that wait_for_indexer ignores its result
+        from indexer_monitor import IndexerMonitor
+        monitor = IndexerMonitor(self.transport, self.urls, self.admin_headers)
+        try:
+            self.previous_starts[name] = monitor.last_start_time(name)
+        except RuntimeError as e:
+            print('error; {}'.format(e))
         url = self.urls.run_indexer(name)
-        self.invoke('run_indexer', 'post', url, self.admin_headers)
+        r = self.invoke('run_indexer', 'post', url, self.admin_headers)
+        self.cache.invalidate()
+        return r
+
+    def wait_for_indexer(self, name, previous_start=None):
+        from indexer_monitor import IndexerMonitor
+        monitor = IndexerMonitor(self.transport, self.urls, self.admin_headers)
+        if previous_start is None:
+            previous_start = self.previous_starts.get(name)
+        try:
+            result = monitor.wait(name, previous_start)
+        except TimeoutError as e:
+            print('error; {}'.format(e))
+            result = {'indexer': name, 'status': 'timeout', 'error': str(e)}
+        except RuntimeError as e:
+            print('error; {}'.format(e))
+            result = {'indexer': name, 'status': 'error', 'error': str(e)}
+        if result['status'] != 'success':
+            self.count_failure()
+        self.cache.invalidate()
+        return result
+
+    def reindex(self, names):
+        # reset and run the indexers, then wait for all of them to complete
+        for name in names:
+            self.reset_indexer(name)
+            self.run_indexer(name)
+        return [self.wait_for_indexer(name) for name in names]
+
+    def recreate_documents(self, index_schema='documents_index_v1', indexer_schema='documents_indexer_v1'):
+        # the recreate_documents.sh sequence, in-process and without fixed sleeps
+        datasource = self.blob_datasource_name('documents')
+        steps = [
+            lambda: self.teardown([('indexers', 'documents'), ('skillsets', 'skillset'),
+                                   ('indexes', 'documents'), ('datasources', datasource)]),
+            lambda: self.succeeded(self.create_blob_datasource('documents')),
+            lambda: self.wait_for_object('datasources', datasource),
+            lambda: self.succeeded(self.create_index('documents', index_schema)),
+            lambda: self.succeeded(self.create_skillset('skillset', 'skillset_v1')),
+            lambda: self.succeeded(self.create_indexer('documents', indexer_schema))]
+        return self.run_steps('recreate_documents', steps, 'documents')
+
+    def recreate_airports(self, index_schema='airports_index_v1', indexer_schema='airports_indexer_v1'):
+        # the recreate_airports.sh sequence, in-process and without fixed sleeps
+        datasource = self.cosmos_datasource_name('dev', 'airports')
+        steps = [
+            lambda: self.teardown([('indexers', 'airports'), ('indexes', 'airports'), ('datasources', datasource)]),
+            lambda: self.succeeded(self.create_cosmos_datasource('dev', 'airports')),
+            lambda: self.wait_for_object('datasources', datasource),
+            lambda: self.succeeded(self.create_index('airports', index_schema)),
+            lambda: self.succeeded(self.create_indexer('airports', indexer_schema))]
+        return self.run_steps('recreate_airports', steps, 'airports')
+
+    def run_steps(self, function_name, steps, indexer):
+        # stop at the first failed step, which has already been counted in self.failures;
+        # otherwise wait for the new indexer to complete its first run
+        for idx, step in enumerate(steps):
+            if not step():
+                print('error; {} stopped at step {} of {}'.format(function_name, idx + 1, len(steps)))
+                return {'indexer': indexer, 'status': 'error', 'error': 'step {} failed'.format(idx + 1)}
+        return self.wait_for_indexer(indexer)
+
+    def succeeded(self, r):
+        # invoke returns None for a request that wasn't sent
+        return (r is not None) and (r.status_code < 300)
+
+    def teardown(self, objects):
+        # delete the (collection, name) objects, ignoring those that don't exist,
+        # then wait until the deletes are visible
+        for collection, name in objects:
+            url = self.urls.object(collection, name)
+            self.invoke('delete_{}_{}'.format(collection, name), 'delete', url, self.admin_headers, None, [404])
+        deleted = [self.wait_for_object(collection, name, False) for collection, name in objects]
+        self.cache.invalidate()
+        return all(deleted)
+
+    def wait_for_object(self, collection, name, exists=True, timeout=120.0):
+        # an object exists when read with a 200, and is deleted when read with a 404;
+        # other statuses, i.e. throttling or service errors, are neither
+        import requests
+        from scheduler import CircuitOpenError
+        url = self.urls.object(collection, name)
+        t1, interval = time.time(), 0.25
+        while True:
+            try:
+                r = self.transport.get(url, self.admin_headers)
+            except (CircuitOpenError, requests.exceptions.ConnectionError) as e:
+                print('error; {} {} not read: {}'.format(collection, name, e))
+                self.count_failure()
+                return False
+            if r.status_code == (200 if exists else 404):
+                print('{} {} {}; waited {} seconds'.format(
+                    collection, name, 'exists' if exists else 'deleted', round(time.time() - t1, 3)))
+                return True
+            if time.time() - t1 > timeout:
+                print('error; {} {} not {} after {} seconds'.format(
+                    collection, name, 'created' if exists else 'deleted', timeout))
+                self.count_failure()
+                return False
+            time.sleep(interval)
+            interval = min(5.0, interval * 2)
 
     def create_blob_datasource(self, container):
         body = self.schemas.blob_datasource_post_body()
@@ -214,7 +413,7 @@ class SearchClient(BaseClass):
         if True:
             url = self.urls.create_datasource()
             function = 'create_blob_datasource_{}'.format(container)
-            self.invoke(function, 'post', url, self.admin_headers, body)
+            return self.invoke(function, 'post', url, self.admin_headers, body)
 
     def create_cosmos_datasource(self, dbname, container):
         conn_str = self.cosmos_datasource_name_conn_str(dbname)
@@ -226,29 +425,27 @@ class SearchClient(BaseClass):
         if True:
             url = self.urls.create_datasource()
             function = 'create_cosmos_datasource_{}_{}'.format(dbname, container)
-            self.invoke(function, 'post', url, self.admin_headers, body)
+            return self.invoke(function, 'post', url, self.admin_headers, body)
 
     def delete_datasource(self, name):
         url = self.urls.modify_datasource(name)
         function = 'delete_datasource{}'.format(name)
-        self.invoke(function, 'delete', url, self.admin_headers, None)
+        return self.invoke(function, 'delete', url, self.admin_headers, None)
 
     def create_synmap(self, name, schema_file):
-        self.modify_synmap('create', name, schema_file)
+        return self.modify_synmap('create', name, schema_file)
 
     def update_synmap(self, name, schema_file):
-        self.modify_synmap('update', name, schema_file)
+        return self.modify_synmap('update', name, schema_file)
 
     def delete_synmap(self, name):
-        self.modify_synmap('delete', name, None)
+        return self.modify_synmap('delete', name, None)
 
     def modify_synmap(self, action, name, schema_file):
         # read the schema json file if necessary
         schema = None
         if action in ['create', 'update']:
-            schema_file = 'schemas/{}.json'.format(schema_file)
-            schema = self.load_json_file(schema_file)
-            schema['name'] = name
+            schema = self.schema_body('synonymmaps', name, schema_file)
 
         if action == 'create':
             http_method = 'post'
@@ -261,30 +458,22 @@ class SearchClient(BaseClass):
             url = self.urls.modify_synmap(name)
 
         function = '{}_synmap_{}'.format(action, name)
-        self.invoke(function, http_method, url, self.admin_headers, schema)
+        return self.invoke(function, http_method, url, self.admin_headers, schema)
 
     def create_skillset(self, name, schema_file):
-        self.modify_skillset('create', name, schema_file)
+        return self.modify_skillset('create', name, schema_file)
 
     def update_skillset(self, name, schema_file):
-        self.modify_skillset('update', name, schema_file)
+        return self.modify_skillset('update', name, schema_file)
 
     def delete_skillset(self, name):
-        self.modify_skillset('delete', name, None)
+        return self.modify_skillset('delete', name, None)
 
     def modify_skillset(self, action, name, schema_file):
         # read the schema json file if necessary
         schema = None
         if action in ['create', 'update']:
-            schema_file = 'schemas/{}.json'.format(schema_file)
-            schema = self.load_json_file(schema_file)
-            schema['name'] = name
-            schema['cognitiveServices']['key'] = os.environ['AZURE_SEARCH_COGSVCS_ALLIN1_KEY']
-
-            for skill in schema['skills']:
-                t = skill['@odata.type']
-                if t == "#Microsoft.Skills.Custom.WebApiSkill":
-                    skill['uri'] = self.azure_function_url('azure')
+            schema = self.schema_body('skillsets', name, schema_file)
 
         if action == 'create':
             http_method = 'post'
@@ -297,13 +486,68 @@ class SearchClient(BaseClass):
             url = self.urls.modify_skillset(name)
 
         function = '{}_skillset_{}'.format(action, name)
-        self.invoke(function, http_method, url, self.admin_headers, schema)
+        return self.invoke(function, http_method, url, self.admin_headers, schema)
+
+    def schema_body(self, collection, name, schema_file):
+        # the create or update request body of the named object, per its schemas/<schema_file>.json
+        schema = self.schemas.read(schema_file, {'name': name})
+        if collection == 'skillsets':
+            schema['cognitiveServices']['key'] = os.environ['AZURE_SEARCH_COGSVCS_ALLIN1_KEY']
+
+            for skill in schema['skills']:
+                t = skill['@odata.type']
+                if t == "#Microsoft.Skills.Custom.WebApiSkill":
+                    skill['uri'] = self.azure_function_url('azure')
+        return schema
+
+    def sync(self, state_file, mode='plan'):
+        from sync import SchemaSync
+        result = SchemaSync(self).run(self.load_json_file(state_file), mode == 'apply')
+        return result
 
     def search_index(self, idx_name, search_name, additional):
         print('---')
         print('search_index: {} -> {} | {}'.format(idx_name, search_name, additional))
         url = self.urls.search_index(idx_name)
+        search_params = self.named_search_params(idx_name, search_name)
+
+        print('url:    {}'.format(url))
+        print('params: {}'.format(search_params))
+        # a streamed response is written to disk as it is received, and not cached
+        streamed = self.writer.mode == 'stream'
+        r = self.cache.get(idx_name, 'search', search_params)
+        if r is None:
+            r = self.transport.post(url, self.admin_headers, search_params, stream=streamed)
+            if not streamed:
+                self.cache.put(idx_name, 'search', search_params, r)
+        else:
+            streamed = False  # a cached response
+        print('response: {}'.format(r))
+        outfile = os.path.join(self.outdir, '{}.json'.format(search_name))
+        if r.status_code == 200 and self.writer.mode == 'pretty':
+            resp_obj = json.loads(r.text)
+            print(json.dumps(resp_obj, sort_keys=False, indent=2))
+            print('response document count: {}'.format(resp_obj['@odata.count']))
+            self.write_json_file(resp_obj, outfile)
+        elif r.status_code == 200:
+            self.writer.save(r, outfile, streamed)
+            summary = self.writer.summary(outfile)
+            print('response document count: {}'.format(summary.get('@odata.count')))
+            print('response summary: {}'.format(json.dumps(summary)))
+        return r
 
+    def search_index_all(self, idx_name, search_name, workers=1):
+        # fetch every page of the search results, streaming them to a JSON Lines file
+        print('search_index_all: {} -> {}  workers: {}'.format(idx_name, search_name, workers))
+        search_params = self.named_search_params(idx_name, search_name)
+        from paging import SearchPager
+        pager = SearchPager(self.transport, self.urls, self.query_headers)
+        outfile = os.path.join(self.outdir, '{}.jsonl'.format(search_name))
+        summary = pager.export(idx_name, search_params, outfile, workers)
+        print('search_index_all: {}'.format(json.dumps(summary)))
+        return summary
+
+    def named_search_params(self, idx_name, search_name):
         if search_name in self.named_searches.keys(): 
             search_params = self.named_searches[search_name]
             print('named_search found: {}  params: {}'.format(search_name, search_params))
@@ -313,17 +557,31 @@ class SearchClient(BaseClass):
             else:
                 search_params = self.named_searches['all_documents']
             print('named_search not found: {}  using default params: {}'.format(search_name, search_params)) 
-
-        print('url:    {}'.format(url))
-        print('params: {}'.format(search_params))
-        r = requests.post(url=url, headers=self.admin_headers, json=search_params)
-        print('response: {}'.format(r))
-        if r.status_code == 200:
-            resp_obj = json.loads(r.text)
-            print(json.dumps(resp_obj, sort_keys=False, indent=2))
-            print('response document count: {}'.format(resp_obj['@odata.count']))
-            outfile = 'tmp/{}.json'.format(search_name)
-            self.write_json_file(resp_obj, outfile)
+        return search_params
+
+    def upload_documents(self, idx_name, infile, schema_file=None, workers=4):
+        # push documents directly into the index with the docs/index batch API
+        from indexing import DocumentUploader
+        uploader = DocumentUploader(self.transport, self.urls, self.admin_headers, workers)
+        if schema_file is not None:
+            uploader.use_index_schema(self.schemas.read(schema_file, {'name': idx_name}))
+        self.cache.invalidate(idx_name)
+        return uploader.upload_file(idx_name, infile)
+
+    def dump_index(self, idx_name, partitions=4):
+        # export every document with keyset pagination to gzipped JSON Lines shards
+        from dump import IndexDumper
+        dumper = IndexDumper(self.transport, self.urls, self.admin_headers, partitions)
+        return dumper.dump(idx_name)
+
+    def load_dump(self, idx_name, dump_dir, workers=4):
+        # reload the shards written by dump_index, per the dumped index schema
+        from indexing import DocumentUploader
+        uploader = DocumentUploader(self.transport, self.urls, self.admin_headers, workers, 'upload')
+        uploader.use_index_schema(self.load_json_file(os.path.join(dump_dir, 'index.json')))
+        infiles = sorted(glob.glob(os.path.join(dump_dir, 'part-*.jsonl.gz')))
+        self.cache.invalidate(idx_name)
+        return uploader.upload_files(idx_name, infiles)
 
     def named_searches_dict(self):
         if False:
@@ -344,40 +602,125 @@ class SearchClient(BaseClass):
         # GET /indexes/hotels/docs/2?api-version=2020-06-30
         url = self.urls.lookup_doc(index_name, doc_key)
         headers = self.query_headers
+        from metrics import redact_headers
         print(url)
-        print(headers)
+        print(redact_headers(headers))
         function = 'lookup_doc_{}_{}'.format(index_name, doc_key)
-        r = self.invoke(function, 'get', url, self.query_headers)
+        r = self.cache.get(index_name, 'lookup', doc_key)
+        if r is None:
+            r = self.invoke(function, 'get', url, self.query_headers)
+            self.cache.put(index_name, 'lookup', doc_key, r)
+        else:
+            print('response: {}'.format(r))
+            self.write_json_file(json.loads(r.text), os.path.join(self.outdir, '{}.json'.format(function)))
+        return r
 
-    def invoke(self, function_name, method, url, headers={}, json_body={}):
+    def lookup_docs(self, index_name, keys_file, mode='auto', workers=8):
+        # look up the keys in a file, or stdin if '-', concurrently or as search.in filter queries
+        from lookup import BatchLookup, read_keys
+        keys = read_keys(keys_file)
+        print('lookup_docs: {} keys: {} mode: {} workers: {}'.format(index_name, len(keys), mode, workers))
+        batch = BatchLookup(self.transport, self.urls, self.query_headers, workers, admin_headers=self.admin_headers)
+        report = batch.lookup(index_name, keys, mode)
+        print(json.dumps(report, sort_keys=False, indent=2))
+        self.count_failure(report['errors'])
+        return report
+
+    def invoke(self, function_name, method, url, headers={}, json_body={}, ok_statuses=[], stream=False):
         # This is a generic method which invokes all HTTP Requests to the Azure Search Service
+        from metrics import redact_headers
+        from scheduler import CircuitOpenError
         print('===')
-        print("invoke: {} {} {}\nheaders: {}\nbody: {}".format(function_name, method.upper(), url, headers, json_body))
+        print("invoke: {} {} {}\nheaders: {}\nbody: {}".format(
+            function_name, method.upper(), url, redact_headers(headers), json_body))
         print('---')
-        if method == 'get':
-            r = requests.get(url=url, headers=headers)
-        elif method == 'post':
-            r = requests.post(url=url, headers=headers, json=json_body)
-        elif method == 'put':
-            r = requests.put(url=url, headers=headers, json=json_body)
-        elif method == 'delete':
-            r = requests.delete(url=url, headers=headers)
+        # all requests share the pooled, keep-alive session of self.transport
+        if method in ['get', 'post', 'put', 'delete']:
+            try:
+                # throttled or unavailable responses are retried by the transport scheduler
+                r = self.transport.request(method, url, headers, json_body, label=function_name, stream=stream)
+            except CircuitOpenError as e:
+                print('error; {}'.format(e))
+                self.count_failure()
+                return None
         else:
             print('error; unexpected method value passed to invoke: {}'.format(method))
+            return None
 
         print('response: {}'.format(r))
         if r.status_code < 300:
             try:
-                resp_obj = json.loads(r.text)
-                outfile = 'tmp/{}.json'.format(function_name)
-                self.write_json_file(resp_obj, outfile)
+                outfile = os.path.join(self.outdir, '{}.json'.format(function_name))
+                if self.writer.mode == 'pretty':
+                    resp_obj = json.loads(r.text)
+                    self.write_json_file(resp_obj, outfile)
+                elif r.status_code != 204:
+                    self.writer.save(r, outfile, stream)
             except Exception as e:
                 print("exception processing http response".format(e))
                 print(r.text)
         else:
             print(r.text)
+            if r.status_code not in ok_statuses:
+                self.count_failure()
         return r
 
+    def count_failure(self, n=1):
+        # the plan steps run on several threads
+        with self.failures_lock:
+            self.failures = self.failures + n
+
+    def transport_stats(self):
+        # only if used by the command
+        if self._transport is not None:
+            self._transport.display_stats()
+        if self._cache is not None:
+            self._cache.display_stats()
+
+    def run_plan(self, infile, workers=4):
+        from plan import PlanRunner, load_plan
+        with self.failures_lock:
+            failures = self.failures
+        summary = PlanRunner(self, workers).run(load_plan(infile))
+        # the plan's count of failed steps replaces the failures counted by the steps
+        # themselves, as a step may tolerate a status, i.e. deleting a missing object
+        with self.failures_lock:
+            self.failures = failures + summary['failed']
+        return summary
+
+    def async_search_sweep(self, indexes, names, concurrency=8, timeout=30.0):
+        from async_search import AsyncSearchClient
+        async_client = AsyncSearchClient(concurrency, timeout)
+        results = async_client.run_sweep(indexes, names)
+        async_client.transport.display_stats()
+        return results
+
+    def federated_search(self, indexes, query, top=10, timeout=30.0):
+        from federated import FederatedSearch
+        federated = FederatedSearch(top, timeout)
+        report = federated.run(indexes, query)
+        federated.transport.display_stats()
+        return report
+
+    def bench_searches(self, indexes, names, iterations=10, concurrency=4, label='bench'):
+        from bench import SearchBenchmark
+        bench = SearchBenchmark(iterations, concurrency)
+        report = bench.run(indexes, names, label)
+        bench.transport.display_stats()
+        return report
+
+    def bench_compare(self, file1, file2):
+        from bench import SearchBenchmark
+        return SearchBenchmark().compare(file1, file2)
+
+    def metrics_summary(self, infile):
+        from metrics import MetricsRecorder
+        MetricsRecorder.load(infile).display_summary()
+
+    def clear_cache(self, index_name=None):
+        self.cache.invalidate(index_name)
+        print('cache cleared: {}'.format(index_name or 'all indexes'))
+
     def epoch(self):
         return time.time()
     
@@ -452,173 +795,119 @@ class SearchClient(BaseClass):
 
 
 def print_options(msg):
+    from docopt import docopt
     print(msg)
     arguments = docopt(__doc__, version=__version__)
     print(arguments)
 
 
+def names_list(value):
+    return value.split(',')
+
+required = object()  # the marker of a required command-line argument
+
+# The command-line commands; each is the name of a SearchClient method and the
+# (type, default) of its positional arguments.
+commands = {
+    'display_env':                       ('display_env', []),
+    'generate_sample_index_schema_file': ('generate_sample_index_schema_file', []),
+    'generate_sample_blob_indexer':      ('generate_sample_blob_indexer', []),
+    'generate_airport_schema_files':     ('generate_airport_schema_files', []),
+    'list_indexes':                      ('list_indexes', []),
+    'list_indexers':                     ('list_indexers', []),
+    'list_datasources':                  ('list_datasources', []),
+    'list_skillsets':                    ('list_skillsets', []),
+    'get_index':                         ('get_index', [(str, required)]),
+    'get_indexer':                       ('get_indexer', [(str, required)]),
+    'get_indexer_status':                ('get_indexer_status', [(str, required)]),
+    'get_datasource':                    ('get_datasource', [(str, required)]),
+    'get_skillset':                      ('get_skillset', [(str, required)]),
+    'create_index':                      ('create_index', [(str, required), (str, required)]),
+    'update_index':                      ('update_index', [(str, required), (str, required)]),
+    'delete_index':                      ('delete_index', [(str, required)]),
+    'create_indexer':                    ('create_indexer', [(str, required), (str, required)]),
+    'update_indexer':                    ('update_indexer', [(str, required), (str, required)]),
+    'delete_indexer':                    ('delete_indexer', [(str, required)]),
+    'reset_indexer':                     ('reset_indexer', [(str, required)]),
+    'run_indexer':                       ('run_indexer', [(str, required)]),
+    'wait_for_indexer':                  ('wait_for_indexer', [(str, required)]),
+    'reindex':                           ('reindex', [(names_list, required)]),
+    'recreate_documents':                ('recreate_documents', []),
+    'recreate_airports':                 ('recreate_airports', []),
+    'run_plan':                          ('run_plan', [(str, required), (int, 4)]),
+    'create_blob_datasource':            ('create_blob_datasource', [(str, required)]),
+    'create_cosmos_datasource':          ('create_cosmos_datasource', [(str, required), (str, required)]),
+    'delete_datasource':                 ('delete_datasource', [(str, required)]),
+    'create_synmap':                     ('create_synmap', [(str, required), (str, required)]),
+    'update_synmap':                     ('update_synmap', [(str, required), (str, required)]),
+    'delete_synmap':                     ('delete_synmap', [(str, required)]),
+    'create_skillset':                   ('create_skillset', [(str, required), (str, required)]),
+    'update_skillset':                   ('update_skillset', [(str, required), (str, required)]),
+    'delete_skillset':                   ('delete_skillset', [(str, required)]),
+    'sync':                              ('sync', [(str, required), (str, 'plan')]),
+    'index_schema_diff':                 ('index_schema_diff', [(str, required), (str, required)]),
+    'indexer_schema_diff':               ('indexer_schema_diff', [(str, required), (str, required)]),
+    'invoke_local_function':             ('invoke_local_function', []),
+    'invoke_azure_function':             ('invoke_azure_function', []),
+    'search_index':                      ('search_index', [(str, required), (str, required), (str, None)]),
+    'search_index_all':                  ('search_index_all', [(str, required), (str, required), (int, 1)]),
+    'upload_documents':                  ('upload_documents', [(str, required), (str, required), (str, None), (int, 4)]),
+    'dump_index':                        ('dump_index', [(str, required), (int, 4)]),
+    'load_dump':                         ('load_dump', [(str, required), (str, required), (int, 4)]),
+    'async_search_sweep':                ('async_search_sweep', [(str, required), (str, required), (int, 8), (float, 30.0)]),
+    'federated_search':                  ('federated_search', [(str, required), (str, required), (int, 10), (float, 30.0)]),
+    'bench_searches':                    ('bench_searches', [(str, required), (str, required), (int, 10), (int, 4), (str, 'bench')]),
+    'bench_compare':                     ('bench_compare', [(str, required), (str, required)]),
+    'metrics_summary':                   ('metrics_summary', [(str, required)]),
+    'clear_cache':                       ('clear_cache', [(str, None)]),
+    'lookup_docs':                       ('lookup_docs', [(str, required), (str, required), (str, 'auto'), (int, 8)]),
+    'lookup_doc':                        ('lookup_doc', [(str, required), (str, required)])
+}
+
+def command_args(func, argv):
+    # convert the positional command-line arguments per the command table
+    method_name, arg_specs = commands[func]
+    args = list()
+    for idx, (arg_type, default) in enumerate(arg_specs):
+        if idx < len(argv):
+            args.append(arg_type(argv[idx]))
+        elif default is required:
+            raise ValueError('{} requires {} argument(s)'.format(func, len([a for a in arg_specs if a[1] is required])))
+        else:
+            args.append(default)
+    return method_name, args
+
+def run_command(client, method_name, args):
+    # an open circuit, raised outside of invoke by e.g. search_index or the batch
+    # classes, fails the command rather than ending it with a traceback; the
+    # scheduler module is loaded only once a request has been sent
+    try:
+        return getattr(client, method_name)(*args)
+    except Exception as e:
+        scheduler = sys.modules.get('scheduler')
+        if scheduler is None or not isinstance(e, scheduler.CircuitOpenError):
+            raise
+        print('error; {}'.format(e))
+        client.count_failure()
+
+
 if __name__ == "__main__":
 
     if len(sys.argv) > 1:
         func = sys.argv[1].lower()
         print('func: {}'.format(func))
-        client = SearchClient()
-
-        if func == 'display_env':
-            client.display_env()
-
-        elif func == 'generate_sample_index_schema_file':
-            client.generate_sample_index_schema_file()
-
-        elif func == 'generate_sample_blob_indexer':
-            client.generate_sample_blob_indexer()
-
-        elif func == 'generate_airport_schema_files':
-            client.generate_airport_schema_files()
-
-        elif func == 'list_indexes':
-            client.list_indexes()
-
-        elif func == 'list_indexers':
-            client.list_indexers()
-
-        elif func == 'list_datasources':
-            client.list_datasources()
-
-        elif func == 'list_skillsets':
-            client.list_skillsets()
-
-        elif func == 'get_index':
-            name = sys.argv[2]
-            client.get_index(name)
-
-        elif func == 'get_indexer':
-            name = sys.argv[2]
-            client.get_indexer(name)
-
-        elif func == 'get_indexer_status':
-            name = sys.argv[2]
-            client.get_indexer_status(name)
-
-        elif func == 'get_datasource':
-            name = sys.argv[2]
-            client.get_datasource(name)
-
-        elif func == 'get_skillset':
-            name = sys.argv[2]
-            client.get_skillset(name)
-
-        elif func == 'create_index':
-            index_name = sys.argv[2]
-            schema_file = sys.argv[3]
-            client.create_index(index_name, schema_file)
-
-        elif func == 'update_index':
-            index_name = sys.argv[2]
-            schema_file = sys.argv[3]
-            client.update_index(index_name, schema_file)
-
-        elif func == 'delete_index':
-            name = sys.argv[2]
-            client.delete_index(name)
-
-        elif func == 'create_indexer':
-            indexer_name = sys.argv[2]
-            schema_file = sys.argv[3]
-            client.create_indexer(indexer_name, schema_file)
-
-        elif func == 'update_indexer':
-            indexer_name = sys.argv[2]
-            schema_file = sys.argv[3]
-            client.update_indexer(indexer_name, schema_file)
-
-        elif func == 'delete_indexer':
-            name = sys.argv[2]
-            client.delete_indexer(name)
-
-        elif func == 'reset_indexer':
-            name = sys.argv[2]
-            client.reset_indexer(name)
-
-        elif func == 'run_indexer':
-            name = sys.argv[2]
-            client.run_indexer(name)
-
-        elif func == 'create_blob_datasource':
-            container = sys.argv[2]
-            client.create_blob_datasource(container)
-
-        elif func == 'create_cosmos_datasource':
-            dbname = sys.argv[2]
-            container = sys.argv[3]
-            client.create_cosmos_datasource(dbname, container)
-
-        elif func == 'delete_datasource':
-            name = sys.argv[2]
-            client.delete_datasource(name)
-
-        elif func == 'create_blob_indexer':
-            datasource_name = sys.argv[2]
-            target_index_name = sys.argv[3]
-            client.create_blob_indexer(datasource_name, target_index_name)
-
-        elif func == 'create_synmap':
-            synmap_name = sys.argv[2]
-            schema_file = sys.argv[3]
-            client.create_synmap(synmap_name, schema_file)
-
-        elif func == 'update_synmap':
-            synmap_name = sys.argv[2]
-            schema_file = sys.argv[3]
-            client.update_synmap(synmap_name, schema_file)
-
-        elif func == 'delete_synmap':
-            synmap_name = sys.argv[2]
-            client.delete_synmap(synmap_name)
-
-        elif func == 'create_skillset':
-            skillset_name = sys.argv[2]
-            schema_file = sys.argv[3]
-            client.create_skillset(skillset_name, schema_file)
-
-        elif func == 'update_skillset':
-            skillset_name = sys.argv[2]
-            schema_file = sys.argv[3]
-            client.update_skillset(skillset_name, schema_file)
-
-        elif func == 'delete_skillset':
-            skillset_name = sys.argv[2]
-            client.delete_skillset(skillset_name)
-
-        elif func == 'index_schema_diff':
-            file1 = sys.argv[2]
-            file2 = sys.argv[3]
-            client.index_schema_diff(file1, file2)
-
-        elif func == 'indexer_schema_diff':
-            file1 = sys.argv[2]
-            file2 = sys.argv[3]
-            client.indexer_schema_diff(file1, file2)
-
-        elif func == 'invoke_local_function':
-            client.invoke_local_function()
-
-        elif func == 'invoke_azure_function':
-            client.invoke_azure_function()
-
-        elif func == 'search_index':
-            index_name  = sys.argv[2]
-            search_name = sys.argv[3]
-            additional  = None
-            if len(sys.argv) > 4:
-                additional = sys.argv[4]
-            client.search_index(index_name, search_name, additional)
-
-        elif func == 'lookup_doc':
-            index_name  = sys.argv[2]
-            doc_key     = sys.argv[3]
-            client.lookup_doc(index_name, doc_key)
-
+        if func in commands:
+            try:
+                method_name, args = command_args(func, sys.argv[2:])
+            except ValueError as e:
+                print_options('Error: {}'.format(e))
+                sys.exit(2)
+            client = SearchClient()
+            run_command(client, method_name, args)
+            client.transport_stats()
+            if client.failures > 0:
+                print('{} request(s) failed'.format(client.failures))
+                sys.exit(1)
         else:
             print_options('Error: invalid function: {}'.format(func))
     else:
@@ -5,7 +5,15 @@ Usage:
     python storage-client.py create_container documents
     python storage-client.py upload_files 0
     python storage-client.py upload_files 10 
+    python storage-client.py upload_files 999 8 skip-identical
+    python storage-client.py upload_files 999 8 overwrite
+    python storage-client.py sync_files documents 8
+    python storage-client.py sync_files documents 8 delete-orphans
     python storage-client.py list_blobs books
+    python storage-client.py list_blobs documents auto 8 tmp/blobs_documents.csv
+    python storage-client.py list_blobs documents 0,1,2,3,4,5,6,7,8,9,a,b,c,d,e,f 16
+    python storage-client.py reconcile documents documents
+    python storage-client.py reconcile documents documents 256
     python storage-client.py delete_container books
     python storage-client.py download_blob UPSWEB-800x533.jpg
 """
@@ -16,9 +24,13 @@ __license__ = "MIT"
 __version__ = "2020.09.26"
 
 
+import base64
+import json
 import os
 import sys
 
+from concurrent.futures import ThreadPoolExecutor
+
 from azure.storage.blob import BlobServiceClient, BlobClient, ContainerClient
 
 from azure.core.exceptions import ResourceExistsError
@@ -27,6 +39,13 @@ from azure.core.exceptions import ResourceNotFoundError
 from docopt import docopt
 
 from base import BaseClass
+from blob_listing import BlobLister, ListingWriter
+from blob_upload import BlobUploader
+from dump import IndexDumper
+from manifest import UploadManifest
+from reconcile import Reconciler
+from transport import Transport
+from urls import Urls
 
 
 class StorageClient(BaseClass):
@@ -40,7 +59,10 @@ class StorageClient(BaseClass):
     def __init__(self):
         BaseClass.__init__(self)
         self.uploads_list_filename = 'data/uploads_list.json'
-        self.blob_svc_client = BlobServiceClient.from_connection_string(self.stor_acct_conn_str)
+        # files larger than max_single_put_size are uploaded as blocks of max_block_size
+        block_size = int(os.environ.get('AZURE_STORAGE_BLOCK_SIZE_MB', '4')) * 1024 * 1024
+        self.blob_svc_client = BlobServiceClient.from_connection_string(
+            self.stor_acct_conn_str, max_block_size=block_size, max_single_put_size=block_size * 2)
 
     def display_env(self):
         print('stor_acct_name:      {}'.format(self.stor_acct_name))
@@ -52,32 +74,70 @@ class StorageClient(BaseClass):
         filenames = self.gather_upload_filenames()
         self.write_json_file(filenames, self.uploads_list_filename)
 
-    def upload_files(self, max_count):
+    def upload_files(self, max_count, workers=1, mode='create'):
         print('upload_files, max_count: {}'.format(max_count))
         filenames = self.load_json_file(self.uploads_list_filename)
         print('upload_files list loaded, count: {}'.format(len(filenames)))
 
+        pairs = list()
         for idx, fq_name in enumerate(filenames):
             if idx < max_count:
                 basename = os.path.basename(fq_name)
-                print('uploading file {}: {} => {} {}'.format(
-                    idx + 1, fq_name, self.blob_container, basename))
-                self.upload_blob(fq_name, self.blob_container, basename)
-
-    def upload_blob(self, local_file_path, cname, blob_name):
+                pairs.append((fq_name, self.blob_container, basename))
+
+        uploader = BlobUploader(self.blob_svc_client, workers, mode)
+        uploader.upload_files(pairs)
+        uploader.throughput.display()
+
+    def sync_files(self, cname, workers=4, delete_orphans=False):
+        # upload only the new or changed local documents, per the manifest and blob properties
+        manifest = UploadManifest()
+        manifest.refresh(self.gather_upload_filenames())
+        print('sync_files, local files: {}  hashed: {}'.format(len(manifest.entries), manifest.hashed))
+
+        blob_props = dict()
+        for blob in self.list_container(cname):
+            md5 = blob.content_settings.content_md5
+            if md5 is not None:
+                md5 = base64.b64encode(bytes(md5)).decode('utf-8')
+            blob_props[blob.name] = (blob.size, md5)
+
+        delta = manifest.delta(blob_props)
+        for name in ['new', 'changed', 'unchanged', 'orphans']:
+            print('sync_files, {}: {}'.format(name, len(delta[name])))
+
+        pairs, md5s = list(), dict()
+        for fq_name in delta['new'] + delta['changed']:
+            pairs.append((fq_name, cname, os.path.basename(fq_name)))
+            md5s[fq_name] = manifest.md5_bytes(fq_name)
+        if len(pairs) > 0:
+            uploader = BlobUploader(self.blob_svc_client, workers, 'overwrite')
+            uploader.upload_files(pairs, md5s)
+            uploader.throughput.display()
+
+        if delete_orphans:
+            container_client = self.container_client(cname)
+            for blob_name in delta['orphans']:
+                container_client.delete_blob(blob_name)
+                manifest.forget_orphan(blob_name)
+                print('deleted orphan blob: {} {}'.format(cname, blob_name))
+        manifest.save()
+        return delta
+
+    def upload_blob(self, local_file_path, cname, blob_name, overwrite=False):
         try:
             blob_client = self.blob_svc_client.get_blob_client(container=cname, blob=blob_name)
             print('uploading blob: {} -> {} {}'.format(local_file_path, cname, blob_name))
             with open(local_file_path, "rb") as data:
-                blob_client.upload_blob(data)
+                blob_client.upload_blob(data, overwrite=overwrite)
             print('uploaded blob:  {} -> {} {}'.format(local_file_path, cname, blob_name))
-        except ResourceExistsError as err:
+        except ResourceExistsError as e:
             print("ResourceExistsError: {}".format(e))
         except Exception as e:
             print("Exception: {}".format(e))
 
     def download_blob(self, blob_name):
-        local_file_path = 'tmp/{}'.format(blobname)
+        local_file_path = 'tmp/{}'.format(blob_name)
         try:
             blob_client = self.blob_svc_client.get_blob_client(
                 container=self.blob_container, blob=blob_name)
@@ -86,18 +146,49 @@ class StorageClient(BaseClass):
                 blob_data = blob_client.download_blob()
                 blob_data.readinto(downloaded_blob)
             print('downloading blob: {}'.format(local_file_path))
-        except ResourceExistsError as err:
-            print("ResourceExistsError: {}".format(e))
+        except ResourceNotFoundError as e:
+            print("ResourceNotFoundError: {}".format(e))
         except Exception as e:
             print("Exception: {}".format(e))
 
-    def list_blobs(self, cname, print_each=True):
-        print('list_blobs in container: {}'.format(cname))
-        blobs = self.list_container(cname)
-        for blob in blobs:
-            if print_each:
-                print('blob: {}  {}  {}'.format(blob.name, blob.size, blob.last_modified))
-        return blobs
+    def list_blobs(self, cname, prefixes='auto', workers=8, outfile=None):
+        # stream the name, size, etag, and last_modified of each blob to a JSON Lines or CSV file
+        if outfile is None:
+            outfile = 'tmp/blobs_{}.jsonl'.format(cname)
+        print('list_blobs in container: {}  prefixes: {}'.format(cname, prefixes))
+        lister = BlobLister(self.container_client(cname), workers)
+        writer = ListingWriter(outfile)
+        try:
+            report = lister.run(writer.write, prefixes)
+        finally:
+            writer.close()
+        print('list_blobs: {}'.format(json.dumps(report)))
+        return report
+
+    def reconcile(self, cname, idx_name, partitions=64):
+        # compare the blobs of the container to the documents of the index populated from it;
+        # the blob listing and the index export run concurrently
+        container_client = self.container_client(cname)
+        lister = BlobLister(container_client, 4)
+        workdir = 'tmp/reconcile/{}'.format(idx_name)
+        reconciler = Reconciler(container_client.url, workdir, partitions)
+        headers = {'Content-Type': 'application/json', 'api-key': os.environ['AZURE_SEARCH_ADMIN_KEY']}
+        transport = Transport()
+        dumper = IndexDumper(transport, Urls(), headers, partitions=8)
+        try:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                blobs = executor.submit(lister.run, reconciler.add_blobs)
+                docs = executor.submit(reconciler.add_index, dumper, idx_name)
+                print('reconcile, blobs: {}  documents: {}'.format(blobs.result()['blobs'], docs.result()))
+            report = reconciler.reconcile()
+        finally:
+            # the spill files are otherwise left behind by a failed listing or export
+            reconciler.discard()
+            transport.close()
+        self.write_json_file(report, os.path.join(workdir, 'report.json'))
+        for name in ['blobs', 'documents', 'matched', 'missing', 'orphaned', 'stale']:
+            print('reconcile, {}: {}'.format(name, report[name]))
+        return report
 
     # private methods below
 
@@ -135,12 +226,9 @@ class StorageClient(BaseClass):
             print('container not found: {}'.format(cname))
 
     def list_container(self, cname):
-        # return a list of 'azure.storage.blob._models.BlobProperties' objects
-        try:
-            return self.container_client(cname).list_blobs()
-        except Exception as e:
-            print("Exception: {}".format(e))
-            return list()
+        # return a paged iterable of 'azure.storage.blob._models.BlobProperties' objects;
+        # listing errors are raised, rather than returned as an empty container
+        return self.container_client(cname).list_blobs()
 
     def container_client(self, cname):
         return self.blob_svc_client.get_container_client(cname)
@@ -167,11 +255,40 @@ if __name__ == "__main__":
 
         elif func == 'upload_files':
             max_count = int(sys.argv[2])
-            client.upload_files(max_count)
+            workers, mode = 1, 'create'
+            if len(sys.argv) > 3:
+                workers = int(sys.argv[3])
+            if len(sys.argv) > 4:
+                mode = sys.argv[4]
+            client.upload_files(max_count, workers, mode)
             
+        elif func == 'sync_files':
+            cname = sys.argv[2]
+            workers, delete_orphans = 4, False
+            if len(sys.argv) > 3:
+                workers = int(sys.argv[3])
+            if len(sys.argv) > 4:
+                delete_orphans = sys.argv[4] == 'delete-orphans'
+            client.sync_files(cname, workers, delete_orphans)
+
         elif func == 'list_blobs':
             cname = sys.argv[2]
-            client.list_blobs(cname)
+            prefixes, workers, outfile = 'auto', 8, None
+            if len(sys.argv) > 3:
+                prefixes = sys.argv[3]
+            if len(sys.argv) > 4:
+                workers = int(sys.argv[4])
+            if len(sys.argv) > 5:
+                outfile = sys.argv[5]
+            client.list_blobs(cname, prefixes, workers, outfile)
+
+        elif func == 'reconcile':
+            cname = sys.argv[2]
+            idx_name = sys.argv[3]
+            partitions = 64
+            if len(sys.argv) > 4:
+                partitions = int(sys.argv[4])
+            client.reconcile(cname, idx_name, partitions)
 
         elif func == 'create_container':
             cname = sys.argv[2]
@@ -0,0 +1,227 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import json
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+# the collections of a desired state file, in the order that they are applied;
+# i.e. an index may reference a synonym map, and an indexer an index and a skillset
+sync_collections = ['synonymmaps', 'indexes', 'skillsets', 'indexers']
+
+# the attributes of an existing index field which can be changed in place
+updatable_field_attributes = ['retrievable', 'searchAnalyzer', 'synonymMaps']
+
+# the index properties which can't be changed without rebuilding the index
+rebuild_index_properties = ['suggesters', 'analyzers', 'tokenizers', 'tokenFilters', 'charFilters', 'similarity']
+
+# the properties which the service sets, or doesn't return, and are not compared
+ignored_properties = ['@odata.context', '@odata.etag', 'credentials']
+
+
+class SchemaSync(object):
+    """
+    An instance of this class brings the indexes, indexers, skillsets, and synonym
+    maps of the search service to the desired state; a JSON file which names each
+    object and its schemas/<schema>.json file.  The live definitions are fetched
+    concurrently and compared to the schema files.  Only the objects which differ
+    are created or updated, with PUT, in parallel within each collection.  An index
+    is rebuilt, deleted and recreated, only if a change can't be made in place,
+    such as changing the type of a field or removing a field; the indexers which
+    target it are then reset and run.  Only the properties present in the schema
+    file are compared, as the service returns defaults for the others.  An object
+    which references one that failed to be applied is skipped.
+    """
+
+    def __init__(self, client, workers=4):
+        self.client = client
+        self.workers = int(workers)
+        self.lock = threading.Lock()
+
+    def desired_objects(self, state):
+        objects = list()
+        for collection in sync_collections:
+            for entry in state.get(collection, []):
+                body = self.client.schema_body(collection, entry['name'], entry['schema'])
+                for name in ['@odata.context', '@odata.etag']:
+                    body.pop(name, None)
+                objects.append({'collection': collection, 'name': entry['name'],
+                                'schema': entry['schema'], 'body': body})
+        return objects
+
+    def fetch(self, collection, name):
+        # the live definition of the object, or None if it doesn't exist
+        url = self.client.urls.object(collection, name)
+        r = self.client.transport.get(url, self.client.admin_headers)
+        if r.status_code == 404:
+            return None
+        if r.status_code != 200:
+            raise RuntimeError('get {} {} failed: {} {}'.format(collection, name, r.status_code, r.text[0:500]))
+        return json.loads(r.text)
+
+    def plan(self, state):
+        objects = self.desired_objects(state)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.fetch, obj['collection'], obj['name']) for obj in objects]
+            live_objects = [f.result() for f in futures]
+        for obj, live in zip(objects, live_objects):
+            obj['action'], obj['diffs'] = self.diff(obj['collection'], obj['body'], live)
+        return objects
+
+    def diff(self, collection, desired, live):
+        # returns the action, none, create, update, or rebuild, and the differences
+        if live is None:
+            return 'create', []
+        d, l = project(desired, desired), project(desired, live)
+        if d == l:
+            return 'none', []
+        diffs = list()
+        compared = ['name']
+        if collection == 'indexes':
+            diffs.extend(self.client.schemas.index_object_diff(l, d))
+            compared.append('fields')
+        elif collection == 'indexers':
+            diffs.extend(self.client.schemas.indexer_object_diff(l, d))
+            compared.extend(['fieldMappings', 'outputFieldMappings'])
+        for name in sorted(set(d.keys()).union(l.keys())):
+            if name not in compared and d.get(name) != l.get(name):
+                diffs.append(('property is different', name, l.get(name), d.get(name)))
+        if collection == 'indexes' and self.requires_rebuild(diffs):
+            return 'rebuild', diffs
+        return 'update', diffs
+
+    def requires_rebuild(self, diffs):
+        for diff in diffs:
+            if diff[0] == 'field not in file2':
+                return True  # fields can't be removed
+            if diff[0] == 'field is different':
+                live_field, desired_field = diff[2], diff[3]
+                for name in set(live_field.keys()).union(desired_field.keys()):
+                    if live_field.get(name) != desired_field.get(name) and name not in updatable_field_attributes:
+                        return True
+            if diff[0] == 'property is different' and diff[1] in rebuild_index_properties:
+                return True
+        return False
+
+    def apply(self, objects):
+        changes = [obj for obj in objects if obj['action'] != 'none']
+        failed = set()  # the (collection, name) of the changes which were not applied
+        for collection in sync_collections:
+            batch = list()
+            for obj in [obj for obj in changes if obj['collection'] == collection]:
+                missing = [d for d in self.dependencies(obj) if d in failed]
+                if len(missing) > 0:
+                    # i.e. an indexer whose target index failed to be created
+                    obj['status'] = 'skipped'
+                    print('sync skipped: {} {}; {} {} was not applied'.format(
+                        collection, obj['name'], missing[0][0], missing[0][1]))
+                    self.client.count_failure()
+                    failed.add((collection, obj['name']))
+                else:
+                    batch.append(obj)
+            if len(batch) > 0:
+                with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                    list(executor.map(self.apply_change, batch))
+                failed.update([(obj['collection'], obj['name']) for obj in batch if obj['status'] != 'ok'])
+
+        # new indexers run when created; the others which target a rebuilt index are rerun
+        rebuilt = [obj['name'] for obj in changes if obj['action'] == 'rebuild' and obj['status'] == 'ok']
+        created = [obj['name'] for obj in changes if obj['collection'] == 'indexers' and obj['action'] == 'create']
+        rerun = [obj['name'] for obj in objects if obj['collection'] == 'indexers' and
+                 obj['body'].get('targetIndexName') in rebuilt and obj['name'] not in created and
+                 ('indexers', obj['name']) not in failed]
+        if len(rerun) > 0:
+            self.client.reindex(rerun)
+        return changes
+
+    def dependencies(self, obj):
+        # the (collection, name) of the objects referenced by the desired object
+        body, deps = obj['body'], list()
+        if obj['collection'] == 'indexes':
+            for field in body.get('fields', []):
+                for synmap in field.get('synonymMaps') or []:
+                    deps.append(('synonymmaps', synmap))
+        elif obj['collection'] == 'indexers':
+            deps.append(('indexes', body.get('targetIndexName')))
+            if body.get('skillsetName'):
+                deps.append(('skillsets', body.get('skillsetName')))
+        return deps
+
+    def apply_change(self, obj):
+        collection, name = obj['collection'], obj['name']
+        url = self.client.urls.object(collection, name)
+        obj['status'], obj['status_code'] = 'failed', None
+        if obj['action'] == 'rebuild':
+            self.client.invoke('sync_delete_{}_{}'.format(collection, name), 'delete', url,
+                               self.client.admin_headers, None, [404])
+            if not self.client.wait_for_object(collection, name, False):
+                print('sync error; {} {} was not deleted, so it was not recreated'.format(collection, name))
+                return obj
+        r = self.client.invoke('sync_{}_{}_{}'.format(obj['action'], collection, name), 'put', url,
+                               self.client.admin_headers, obj['body'])
+        if r is not None:
+            obj['status_code'] = r.status_code
+            if r.status_code < 300:
+                obj['status'] = 'ok'
+        if collection == 'indexes':
+            self.client.cache.invalidate(name)
+        return obj
+
+    def run(self, state, apply=False):
+        objects = self.plan(state)
+        self.display_plan(objects)
+        if apply:
+            self.apply(objects)
+        return objects
+
+    def display_plan(self, objects):
+        print('sync plan:')
+        for obj in objects:
+            print('  {:<12} {:<24} {:<8} ({})'.format(obj['collection'], obj['name'], obj['action'], obj['schema']))
+            for diff in obj['diffs']:
+                print('      {}: {}'.format(diff[0], diff[1]))
+        counts = dict()
+        for obj in objects:
+            counts[obj['action']] = counts.get(obj['action'], 0) + 1
+        print('sync plan totals: {}'.format(json.dumps(counts, sort_keys=True)))
+
+
+def project(desired, live):
+    # the live value restricted to the properties of the desired value, with the
+    # "true" and "false" strings of the schema files as booleans
+    if isinstance(desired, dict) and isinstance(live, dict):
+        result = dict()
+        for name in desired.keys():
+            if not ignored(name, desired):
+                result[name] = project(desired[name], live.get(name))
+        return result
+    if isinstance(desired, list) and isinstance(live, list):
+        desired_keys = [element_key(e) for e in desired]
+        if len(desired) > 0 and None not in desired_keys:
+            # match the elements by name, so that an added or removed element doesn't shift the others
+            live_by_key = dict([(element_key(e), e) for e in live])
+            result = [project(e, live_by_key[element_key(e)]) for e in desired if element_key(e) in live_by_key]
+            result.extend([project(e, e) for e in live if element_key(e) not in desired_keys])
+            return result
+        if len(desired) == len(live):
+            return [project(d, l) for d, l in zip(desired, live)]
+        return [project(l, l) for l in live]
+    if live == 'true':
+        return True
+    if live == 'false':
+        return False
+    return live
+
+def ignored(name, desired):
+    # the cognitive services key is not returned by the service
+    if name == 'key' and 'CognitiveServices' in str(desired.get('@odata.type')):
+        return True
+    return name in ignored_properties
+
+def element_key(element):
+    if isinstance(element, dict):
+        return element.get('name', element.get('sourceFieldName'))
+    return None
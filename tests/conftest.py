@@ -0,0 +1,75 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import json
+import threading
+import time
+
+import pytest
+
+from mock_search_service import MockSearchService, create_server
+from urls import Urls
+
+
+class FakeResponse(object):
+    """ The subset of a requests response object used by the tested classes. """
+
+    def __init__(self, status_code, obj=None, headers=None):
+        self.status_code = status_code
+        self.text = '' if obj is None else json.dumps(obj)
+        self.headers = headers or dict()
+
+
+class TrackingTransport(object):
+    """
+    A fake transport which answers each post with respond(url, json_body) after
+    delay(url) seconds, and tracks the peak number of concurrent posts.
+    """
+
+    def __init__(self):
+        self.active, self.peak = 0, 0
+        self.lock = threading.Lock()
+
+    def delay(self, url):
+        return 0.0
+
+    def respond(self, url, json_body):
+        raise NotImplementedError()
+
+    def post(self, url, headers={}, json_body=None, **kwargs):
+        with self.lock:
+            self.active = self.active + 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay(url))
+            return self.respond(url, json_body)
+        finally:
+            with self.lock:
+                self.active = self.active - 1
+
+
+@pytest.fixture
+def mock_search():
+    """
+    Returns a function which serves the given MockSearchService, or a default
+    one, on an ephemeral port and returns the (service, urls) pair for it.
+    Every server started by the test is shut down and closed at teardown.
+    """
+    servers = list()
+
+    def start(service=None):
+        if service is None:
+            service = MockSearchService()
+        server = create_server(0, service)
+        servers.append(server)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        urls = Urls()
+        urls.search_url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+        return service, urls
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
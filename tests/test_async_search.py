@@ -0,0 +1,47 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import asyncio
+
+from async_search import AsyncSearchClient
+from conftest import FakeResponse, TrackingTransport
+
+
+class FakeTransport(TrackingTransport):
+    """ Sleeps per the index name. """
+
+    def delay(self, url):
+        return 0.5 if '/indexes/slow/' in url else 0.05
+
+    def respond(self, url, json_body):
+        if '/indexes/missing/' in url:
+            return FakeResponse(404, {'error': 'not found'})
+        return FakeResponse(200, {'@odata.count': 1, 'value': [{'url': url}]})
+
+def test_sweep_pairs():
+    client = AsyncSearchClient(2, 5, FakeTransport())
+    pairs = client.sweep_pairs('auto', 'all_airports,all_documents')
+    assert(pairs == [('airports', 'all_airports'), ('documents', 'all_documents')])
+    pairs = client.sweep_pairs('a,b', 'moscow')
+    assert(pairs == [('a', 'moscow'), ('b', 'moscow')])
+    assert(len(client.sweep_pairs('auto', 'all')) == len(client.named_searches))
+
+def test_sweep_bounded_concurrency_and_completion_order():
+    transport = FakeTransport()
+    client = AsyncSearchClient(3, 5, transport)
+    pairs = [('slow', 'all_documents')] + [('fast', 'all_documents')] * 8 + [('missing', 'moscow')]
+    completed = list()
+    results = asyncio.run(client.sweep(pairs, lambda r: completed.append(r['index'])))
+    assert(len(results) == 10)
+    assert(transport.peak <= 3)
+    assert(completed[-1] == 'slow')  # written when done, not in submission order
+    statuses = sorted([r['status'] for r in results])
+    assert(statuses == [200] * 9 + [404])
+
+def test_sweep_timeout():
+    client = AsyncSearchClient(2, 0.1, FakeTransport())
+    results = asyncio.run(client.sweep([('slow', 'all_documents')]))
+    assert(results[0]['status'] == None)
+    assert('timeout' in results[0]['error'])
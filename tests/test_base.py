@@ -0,0 +1,36 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import gzip
+import json
+
+from base import BaseClass
+
+
+def test_iter_json_documents_array():
+    b = BaseClass()
+    airports = b.load_json_file('data/us_airports.json')
+    streamed = list(b.iter_json_documents('data/us_airports.json'))
+    assert(len(streamed) == len(airports))
+    assert(streamed[0] == airports[0])
+    assert(streamed[-1] == airports[-1])
+
+def test_iter_json_array_small_chunks(tmp_path):
+    b = BaseClass()
+    infile = str(tmp_path / 'values.json')
+    with open(infile, 'wt') as f:
+        f.write(' [ 12345, {"a": "x,]y"}, [1, 2], "s" , 6789 ] ')
+    with open(infile, 'rt') as f:
+        f.read(3)  # skip through the opening bracket
+        values = list(b.iter_json_array(f, chunk_size=3))
+    assert(values == [12345, {'a': 'x,]y'}, [1, 2], 's', 6789])
+
+def test_iter_json_documents_jsonl_gz(tmp_path):
+    b = BaseClass()
+    infile = str(tmp_path / 'docs.jsonl.gz')
+    with gzip.open(infile, 'wt') as f:
+        f.write(json.dumps({'pk': 'CLT'}) + '\n\n')
+        f.write(json.dumps({'pk': 'DEN'}) + '\n')
+    assert(list(b.iter_json_documents(infile)) == [{'pk': 'CLT'}, {'pk': 'DEN'}])
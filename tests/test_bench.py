@@ -0,0 +1,64 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import json
+
+from bench import SearchBenchmark, percentile
+from mock_search_service import MockSearchService
+from transport import Transport
+
+
+def test_percentile():
+    values = [float(v) for v in range(1, 101)]
+    assert(percentile(values, 50) == 50.5)
+    assert(percentile(values, 0) == 1.0)
+    assert(percentile(values, 100) == 100.0)
+    assert(round(percentile(values, 99), 2) == 99.01)
+    assert(percentile([7.0], 90) == 7.0)
+    assert(percentile([], 50) is None)
+
+def test_bench_against_mock_service(tmp_path, mock_search):
+    service, urls = mock_search(MockSearchService(latency_ms=5, error_rate=0.2))
+    transport = Transport(pool_size=4)
+    try:
+        bench = SearchBenchmark(iterations=20, concurrency=4, warmup=0, transport=transport)
+        bench.urls = urls
+        bench.results_dir = str(tmp_path)
+        transport.post(bench.urls.create_index(), {}, {'name': 'airports', 'fields': [
+            {'name': 'pk', 'type': 'Edm.String', 'key': True}]})
+        report = bench.run('airports', 'all_airports,airports_charl', 'airports_v1')
+        assert(len(report['results']) == 2)
+        for result in report['results']:
+            assert(result['requests'] == 20)
+            assert(result['errors'] > 0)
+            assert(result['error_rate'] == result['errors'] / 20.0)
+            assert(result['client_ms']['p50'] >= 5.0)
+            assert(result['client_ms']['p50'] <= result['client_ms']['p90'] <= result['client_ms']['p99'])
+            assert(result['elapsed_ms']['p50'] > 0)
+        saved = json.load(open(report['outfile']))
+        assert(saved['label'] == 'airports_v1')
+
+        rows = bench.compare(report['outfile'], report['outfile'])
+        assert(len(rows) == 2)
+        assert(rows[0]['p50_change'] == 0.0)
+    finally:
+        transport.close()
+
+def test_bench_reports_throttling_without_retries(tmp_path, mock_search):
+    # the mock service sends Retry-After: 1 with its 503s, so a retried request would take over a second
+    service, urls = mock_search(MockSearchService(latency_ms=1, throttle_rate=0.3))
+    transport = Transport(pool_size=4)
+    try:
+        bench = SearchBenchmark(iterations=20, concurrency=4, warmup=0, transport=transport)
+        bench.urls = urls
+        bench.results_dir = str(tmp_path)
+        transport.post(bench.urls.create_index(), {}, {'name': 'airports', 'fields': [
+            {'name': 'pk', 'type': 'Edm.String', 'key': True}]})
+        result = bench.run('airports', 'all_airports', 'throttled')['results'][0]
+        assert(result['statuses'].get('503', 0) > 0)
+        assert(result['errors'] == result['statuses']['503'])
+        assert(result['client_ms']['p99'] < 1000.0)
+    finally:
+        transport.close()
@@ -0,0 +1,181 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import csv
+import json
+import threading
+import time
+
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from blob_listing import BlobLister, ListingWriter
+
+Blob = namedtuple('Blob', ['name', 'size', 'etag', 'last_modified'])
+BlobPrefix = namedtuple('BlobPrefix', ['name'])
+
+
+class FakePages(object):
+    """
+    The page iterator of an ItemPaged listing; the continuation token is the
+    index of the next item, and the request of a page can be made to fail.
+    """
+
+    def __init__(self, container, items, page_size, token):
+        self.container = container
+        self.items = items
+        self.page_size = page_size
+        self.continuation_token = token
+        self.done = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.done:
+            raise StopIteration
+        start = int(self.continuation_token or 0)
+        self.container.request(start)
+        page = self.items[start:start + self.page_size]
+        end = start + len(page)
+        self.continuation_token = str(end) if end < len(self.items) else None
+        self.done = self.continuation_token is None
+        return iter(page)
+
+
+class FakeItemPaged(object):
+
+    def __init__(self, container, items, page_size):
+        self.container = container
+        self.items = items
+        self.page_size = page_size
+
+    def by_page(self, continuation_token=None):
+        return FakePages(self.container, self.items, self.page_size, continuation_token)
+
+
+class FakeContainerClient(object):
+    """
+    A container of blobs in virtual directories, with a 20ms page request
+    latency, which fails the page requests at the given offsets once.
+    """
+
+    def __init__(self, names, fail_at=[]):
+        modified = datetime(2020, 10, 19, 12, 0, 0, tzinfo=timezone.utc)
+        self.blobs = [Blob(name, 100, '0x8D87', modified) for name in sorted(names)]
+        self.fail_at = list(fail_at)
+        self.requests = 0
+        self.active, self.peak = 0, 0
+        self.lock = threading.Lock()
+
+    def request(self, start):
+        with self.lock:
+            self.requests = self.requests + 1
+            self.active = self.active + 1
+            self.peak = max(self.peak, self.active)
+            fail = start in self.fail_at
+            if fail:
+                self.fail_at.remove(start)
+        time.sleep(0.02)
+        with self.lock:
+            self.active = self.active - 1
+        if fail:
+            raise IOError('connection reset')
+
+    def list_blobs(self, name_starts_with=None, results_per_page=None):
+        items = [b for b in self.blobs if b.name.startswith(name_starts_with or '')]
+        return FakeItemPaged(self, items, results_per_page)
+
+    def walk_blobs(self, name_starts_with=None, delimiter='/', results_per_page=None):
+        items, prefixes = list(), list()
+        for blob in self.blobs:
+            if delimiter in blob.name:
+                prefix = blob.name.split(delimiter)[0] + delimiter
+                if prefix not in prefixes:
+                    prefixes.append(prefix)
+                    items.append(BlobPrefix(prefix))
+            else:
+                items.append(blob)
+        return FakeItemPaged(self, items, results_per_page)
+
+
+def container_names():
+    names = ['dir{}/doc-{:04d}.pdf'.format(d, i) for d in range(8) for i in range(250)]
+    return names + ['root-{}.txt'.format(i) for i in range(15)]
+
+
+def test_parse_prefixes():
+    lister = BlobLister(None)
+    assert(lister.parse_prefixes('b, a,ab,,c') == ['a', 'b', 'c'])
+
+def test_auto_partitions():
+    container = FakeContainerClient(container_names())
+    lister = BlobLister(container, workers=8, page_size=50)
+    names, lock = list(), threading.Lock()
+
+    def callback(blobs):
+        with lock:
+            names.extend([b.name for b in blobs])
+
+    report = lister.run(callback)
+    assert(sorted(names) == sorted(container_names()))
+    assert(report['blobs'] == 2015)
+    assert(report['partitions'] == 8)
+    assert(report['complete'])
+    assert(report['retries'] == 0)
+    # the walk of 23 items is one page, and each of the 8 directories is 5 pages
+    assert(report['pages'] == 41)
+    assert(container.peak == 8)
+
+def test_explicit_prefixes_are_partial():
+    container = FakeContainerClient(container_names())
+    names = list()
+    report = BlobLister(container, page_size=100).run(lambda blobs: names.extend([b.name for b in blobs]), 'dir1/,root')
+    assert(report['blobs'] == 265)
+    assert(report['complete'] == False)
+
+def test_flat_container_is_listed_by_the_walk():
+    container = FakeContainerClient(['doc-{:04d}.pdf'.format(i) for i in range(120)])
+    report = BlobLister(container, page_size=50).run(lambda blobs: None)
+    assert(report['blobs'] == 120)
+    assert(report['partitions'] == 0)
+    assert(report['complete'])
+
+def test_retry_from_continuation_token():
+    container = FakeContainerClient(['doc-{:04d}.pdf'.format(i) for i in range(500)], fail_at=[200, 400])
+    lister = BlobLister(container, page_size=100)
+    names = list()
+    report = lister.run(lambda blobs: names.extend([b.name for b in blobs]), 'd')
+    assert(len(names) == 500)
+    assert(len(set(names)) == 500)
+    assert(report['retries'] == 2)
+    # the failed pages are requested again, not the pages before them
+    assert(container.requests == 7)
+
+def test_retries_exhausted():
+    container = FakeContainerClient(['a.pdf'], fail_at=[0])
+    lister = BlobLister(container, max_attempts=1)
+    try:
+        lister.run(lambda blobs: None, 'a')
+        assert(False)
+    except IOError:
+        pass
+
+def test_listing_writer(tmp_path):
+    container = FakeContainerClient(container_names())
+    for outfile in [str(tmp_path / 'blobs.jsonl'), str(tmp_path / 'blobs.csv')]:
+        writer = ListingWriter(outfile)
+        report = BlobLister(container, workers=4, page_size=100).run(writer.write, 'dir1/,dir2/,root')
+        writer.close()
+        assert(report['blobs'] == 515)
+        with open(outfile, 'rt') as f:
+            if outfile.endswith('.csv'):
+                rows = list(csv.DictReader(f))
+            else:
+                rows = [json.loads(line) for line in f]
+        assert(len(rows) == 515)
+        row = [r for r in rows if r['name'] == 'dir1/doc-0000.pdf'][0]
+        assert(sorted(row.keys()) == ['etag', 'last_modified', 'name', 'size'])
+        assert(row['last_modified'] == '2020-10-19T12:00:00+00:00')
@@ -0,0 +1,113 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import hashlib
+
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import ContentSettings
+
+from blob_upload import BlobUploader, Throughput
+
+
+class FakeProps(object):
+
+    def __init__(self, size, md5):
+        self.size = size
+        self.content_settings = ContentSettings(content_md5=md5)
+
+
+class FakeBlobClient(object):
+    """
+    Holds the properties of one blob, and records the data and content
+    settings sent by upload_blob.
+    """
+
+    def __init__(self, props=None):
+        self.props = props
+        self.uploaded = None
+        self.settings = None
+
+    def get_blob_properties(self):
+        if self.props is None:
+            raise ResourceNotFoundError('not found')
+        return self.props
+
+    def upload_blob(self, data, length=None, overwrite=False, content_settings=None, max_concurrency=1):
+        chunks = list()
+        while True:
+            chunk = data.read(3)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        self.uploaded = b''.join(chunks)
+        self.settings = content_settings
+
+
+class FakeServiceClient(object):
+
+    def __init__(self, blob_client):
+        self.blob_client = blob_client
+
+    def get_blob_client(self, container=None, blob=None):
+        return self.blob_client
+
+
+def uploader(blob_client, mode):
+    return BlobUploader(FakeServiceClient(blob_client), 1, mode)
+
+def test_skip_identical(tmp_path):
+    path = tmp_path / 'a.pdf'
+    path.write_bytes(b'abcdefg')
+    md5 = hashlib.md5(b'abcdefg').digest()
+
+    identical = FakeBlobClient(FakeProps(7, bytearray(md5)))
+    assert(uploader(identical, 'skip-identical').upload_file(str(path), 'c', 'a.pdf')[0] == 'skipped')
+    assert(identical.uploaded is None)
+
+    changed = FakeBlobClient(FakeProps(7, bytearray(hashlib.md5(b'gfedcba').digest())))
+    assert(uploader(changed, 'skip-identical').upload_file(str(path), 'c', 'a.pdf')[0] == 'uploaded')
+    assert(changed.uploaded == b'abcdefg')
+    assert(bytes(changed.settings.content_md5) == md5)
+
+    resized = FakeBlobClient(FakeProps(8, bytearray(md5)))
+    assert(uploader(resized, 'skip-identical').upload_file(str(path), 'c', 'a.pdf')[0] == 'uploaded')
+
+    no_md5 = FakeBlobClient(FakeProps(7, None))
+    assert(uploader(no_md5, 'skip-identical').upload_file(str(path), 'c', 'a.pdf')[0] == 'uploaded')
+
+    missing = FakeBlobClient()
+    assert(uploader(missing, 'skip-identical').upload_file(str(path), 'c', 'a.pdf')[0] == 'uploaded')
+
+def test_overwrite_does_not_hash(tmp_path):
+    path = tmp_path / 'a.pdf'
+    path.write_bytes(b'abcdefg')
+    blob_client = FakeBlobClient(FakeProps(7, None))
+    u = uploader(blob_client, 'overwrite')
+    def no_md5(local_file_path):
+        raise AssertionError('the file was hashed')
+    u.file_md5 = no_md5
+    assert(u.upload_file(str(path), 'c', 'a.pdf')[0] == 'uploaded')
+    assert(blob_client.uploaded == b'abcdefg')
+    assert(blob_client.settings is None)
+
+    # a known MD5, i.e. from the sync_files manifest, is sent with the upload
+    md5 = hashlib.md5(b'abcdefg').digest()
+    assert(u.upload_file(str(path), 'c', 'a.pdf', md5)[0] == 'uploaded')
+    assert(bytes(blob_client.settings.content_md5) == md5)
+
+def test_throughput():
+    t = Throughput('test')
+    t.add('uploaded', 1048576)
+    t.add('uploaded', 3 * 1048576)
+    t.add('skipped', 1048576)
+    t.add('error', 10)
+    t.t1 = t.t1 - 2.0
+    s = t.summary()
+    assert(s['files'] == 2)
+    assert(s['mb'] == 4.0)
+    assert(s['counts'] == {'uploaded': 2, 'skipped': 1, 'error': 1})
+    assert(abs(s['elapsed'] - 2.0) < 0.5)
+    assert(abs(s['mb_per_sec'] - 4.0 / s['elapsed']) < 0.01)
+    assert(abs(s['files_per_sec'] - 2.0 / s['elapsed']) < 0.01)
@@ -0,0 +1,92 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+from cache import CachedResponse, QueryCache
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_key_is_normalized():
+    cache = QueryCache()
+    k1 = cache.key('airports', 'search', {'search': '*', 'Count': True})
+    k2 = cache.key('airports', 'search', {'count': True, 'search': '*'})
+    assert(k1 == k2)
+    assert(k1 != cache.key('documents', 'search', {'count': True, 'search': '*'}))
+    other = QueryCache(service='https://other.search.windows.net')
+    assert(k1 != other.key('airports', 'search', {'count': True, 'search': '*'}))
+
+def test_ttl_lru_and_counters():
+    clock = Clock()
+    cache = QueryCache(ttl=10, max_entries=2, clock=clock)
+    assert(cache.get('airports', 'lookup', 'CLT') is None)
+    cache.put('airports', 'lookup', 'CLT', CachedResponse(200, '{"pk": "CLT"}'))
+    cache.put('airports', 'lookup', 'XXX', CachedResponse(404, ''))
+    assert(cache.get('airports', 'lookup', 'XXX') is None)
+
+    r = cache.get('airports', 'lookup', 'CLT')
+    assert(r.status_code == 200)
+    assert(r.text == '{"pk": "CLT"}')
+
+    cache.put('airports', 'lookup', 'ATL', CachedResponse(200, '{}'))
+    cache.put('airports', 'lookup', 'DEN', CachedResponse(200, '{}'))
+    assert(cache.get('airports', 'lookup', 'CLT') is None)  # least recently used
+    assert(cache.get('airports', 'lookup', 'DEN') is not None)
+
+    clock.now = clock.now + 11
+    assert(cache.get('airports', 'lookup', 'DEN') is None)
+    s = cache.stats()
+    assert(s['hits'] == 2)
+    assert(s['misses'] == 4)
+    assert(s['evicted'] == 1)
+    assert(s['expired'] == 1)
+
+def test_disk_tier_and_invalidation(tmp_path):
+    clock = Clock()
+    cache_dir = str(tmp_path / 'cache')
+    params = {'search': '*', 'count': True}
+    cache1 = QueryCache(ttl=10, cache_dir=cache_dir, clock=clock)
+    cache1.put('airports', 'search', params, CachedResponse(200, '{"value": []}'))
+    cache1.put('documents', 'search', params, CachedResponse(200, '{"value": [1]}'))
+
+    # a second instance, i.e. the next CLI invocation, reads the disk tier
+    cache2 = QueryCache(ttl=10, cache_dir=cache_dir, clock=clock)
+    assert(cache2.get('airports', 'search', params).text == '{"value": []}')
+    assert(cache2.stats()['disk_hits'] == 1)
+
+    cache2.invalidate('airports')
+    cache3 = QueryCache(ttl=10, cache_dir=cache_dir, clock=clock)
+    assert(cache3.get('airports', 'search', params) is None)
+    assert(cache3.get('documents', 'search', params) is not None)
+
+    # the disk tier doesn't return the results of another service
+    other = QueryCache(ttl=10, cache_dir=cache_dir, clock=clock, service='https://other.search.windows.net')
+    assert(other.get('documents', 'search', params) is None)
+    cache3.invalidate()
+    assert(QueryCache(ttl=10, cache_dir=cache_dir, clock=clock).get('documents', 'search', params) is None)
+
+def test_disabled_with_zero_ttl():
+    cache = QueryCache(ttl=0)
+    cache.put('airports', 'lookup', 'CLT', CachedResponse(200, '{}'))
+    assert(cache.get('airports', 'lookup', 'CLT') is None)
+
+def test_from_env_is_opt_in(monkeypatch):
+    for name in ['AZURE_SEARCH_CACHE_TTL', 'AZURE_SEARCH_CACHE_SIZE', 'AZURE_SEARCH_CACHE_DIR']:
+        monkeypatch.delenv(name, raising=False)
+    cache = QueryCache.from_env()
+    assert(cache.enabled() == False)
+    assert(cache.cache_dir is None)
+    monkeypatch.setenv('AZURE_SEARCH_CACHE_TTL', '30')
+    cache = QueryCache.from_env()
+    assert(cache.enabled())
+    assert(cache.cache_dir is None)
+    monkeypatch.setenv('AZURE_SEARCH_CACHE_DIR', 'tmp/cache')
+    assert(QueryCache.from_env().cache_dir == 'tmp/cache')
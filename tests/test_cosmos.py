@@ -0,0 +1,120 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import json
+import threading
+
+import azure.cosmos.exceptions as exceptions
+
+from cosmos import CosmosClient
+
+
+def throttled(retry_after_ms=None):
+    e = exceptions.CosmosHttpResponseError(status_code=429, message='Request rate is large')
+    if retry_after_ms is not None:
+        e.headers = {'x-ms-retry-after-ms': retry_after_ms}
+    return e
+
+
+class FakeContainer(object):
+    """
+    Raises the given exceptions, in order, before each upsert succeeds, and
+    reports a request charge to the response_hook of each successful upsert.
+    """
+
+    def __init__(self, outcomes=[]):
+        self.outcomes = list(outcomes)
+        self.items = dict()
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def upsert_item(self, item, response_hook=None):
+        with self.lock:
+            self.calls = self.calls + 1
+            if len(self.outcomes) > 0:
+                raise self.outcomes.pop(0)
+            self.items[item['id']] = dict(item)
+        if response_hook is not None:
+            response_hook({'x-ms-request-charge': '6.5'}, item)
+
+
+def client(container):
+    # bypass the constructor, which connects to the CosmosDB account
+    c = CosmosClient.__new__(CosmosClient)
+    c.bulk_container = container
+    c.bulk_container_client = lambda dbname, cname: container
+    c.lock = threading.Lock()
+    c.counts = {'read': 0, 'upserted': 0, 'bypassed': 0, 'failed': 0, 'throttled': 0, 'ru': 0.0}
+    c.sleeps = list()
+    c.sleep = c.sleeps.append
+    return c
+
+def test_retry_after_ms():
+    c = client(FakeContainer([throttled('250'), throttled('1500')]))
+    assert(c.upsert_with_backoff({'id': '1', 'pk': 'CLT'}))
+    assert(c.sleeps == [0.25, 1.5])
+    assert(c.counts['throttled'] == 2)
+    assert(c.counts['upserted'] == 1)
+    assert(c.counts['ru'] == 6.5)
+    assert(c.counts['failed'] == 0)
+
+def test_backoff_without_retry_after():
+    c = client(FakeContainer([throttled(), throttled()]))
+    assert(c.upsert_with_backoff({'id': '1', 'pk': 'CLT'}))
+    assert(c.sleeps == [0.2, 0.4])
+
+def test_attempts_exhausted():
+    container = FakeContainer([throttled('10')] * 5)
+    c = client(container)
+    assert(c.upsert_with_backoff({'id': '1', 'pk': 'CLT'}, max_attempts=3) == False)
+    assert(container.calls == 3)
+    assert(len(c.sleeps) == 2)
+    assert(c.counts['failed'] == 1)
+    assert(c.counts['upserted'] == 0)
+
+def test_other_errors_are_not_retried():
+    container = FakeContainer([exceptions.CosmosHttpResponseError(status_code=400, message='bad')])
+    c = client(container)
+    assert(c.upsert_with_backoff({'id': '1', 'pk': 'CLT'}) == False)
+    assert(container.calls == 1)
+    assert(c.sleeps == [])
+    assert(c.counts['failed'] == 1)
+
+def test_prepare_airport_duplicates():
+    c = client(FakeContainer())
+    item = {'id': 'CLT', 'pk': 'CLT'}
+    assert(c.prepare_airport(item, 'no-duplicates'))
+    assert(item['id'] == 'CLT')
+    assert('epoch' in item)
+    ids = set()
+    for i in range(3):
+        item = {'id': 'CLT', 'pk': 'CLT'}
+        assert(c.prepare_airport(item, 'duplicates'))
+        ids.add(item['id'])
+    assert(len(ids) == 3)
+    assert('CLT' not in ids)
+    assert(c.prepare_airport({'id': 'x', 'pk': '4I7X'}, 'no-duplicates') == False)
+    assert(c.prepare_airport({'id': 'x'}, 'no-duplicates') == False)
+
+def test_bulk_load_duplicates(tmp_path):
+    infile = str(tmp_path / 'airports.jsonl')
+    with open(infile, 'wt') as f:
+        for pk in ['CLT', 'CLT', 'ATL', 'TOOLONG']:
+            f.write(json.dumps({'id': pk, 'pk': pk}) + '\n')
+
+    container = FakeContainer([throttled('1')])
+    c = client(container)
+    counts = c.bulk_load_airports('dev', 'airports', 'no-duplicates', 2, infile)
+    assert(counts['read'] == 4)
+    assert(counts['bypassed'] == 1)
+    assert(counts['upserted'] == 3)
+    assert(counts['throttled'] == 1)
+    assert(sorted(container.items.keys()) == ['ATL', 'CLT'])
+
+    container = FakeContainer()
+    c = client(container)
+    counts = c.bulk_load_airports('dev', 'airports', 'duplicates', 2, infile)
+    assert(counts['upserted'] == 3)
+    assert(len(container.items) == 3)
@@ -0,0 +1,71 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import base64
+import json
+import os
+
+from base import BaseClass
+from dump import IndexDumper
+from indexing import DocumentUploader
+from transport import Transport
+
+
+def documents_schema(name):
+    fields = list()
+    fields.append({'name': 'id', 'type': 'Edm.String', 'key': True})
+    fields.append({'name': 'content', 'type': 'Edm.String', 'searchable': True})
+    return {'name': name, 'fields': fields}
+
+def test_dump_and_reload_with_common_key_prefix(tmp_path, mock_search):
+    service, urls = mock_search()
+    transport = Transport(pool_size=8)
+    try:
+        # keys like the documents index; base64 blob urls sharing a long prefix
+        transport.post(urls.create_index(), {}, documents_schema('documents'))
+        docs = list()
+        for i in range(2500):
+            blob_url = 'https://example.blob.core.windows.net/documents/doc-{:05d}.txt'.format(i)
+            key = base64.urlsafe_b64encode(blob_url.encode('utf-8')).decode('utf-8').rstrip('=')
+            docs.append({'id': key, 'content': 'text {}'.format(i)})
+        uploader = DocumentUploader(transport, urls, {}, workers=2)
+        uploader.upload('documents', iter(docs))
+
+        dumper = IndexDumper(transport, urls, {}, partitions=4, page_size=300)
+        manifest = dumper.dump('documents', str(tmp_path / 'dump'))
+        assert(manifest['documents'] == 2500)
+        assert(manifest['expected'] == 2500)
+        assert(len(manifest['shards']) == 4)
+        for shard in manifest['shards']:
+            assert(shard['documents'] < 2500)
+
+        keys = list()
+        for shard in manifest['shards']:
+            for doc in BaseClass().iter_json_documents(shard['file']):
+                assert('@search.score' not in doc)
+                keys.append(doc['id'])
+        assert(keys == sorted([d['id'] for d in docs]))
+
+        # reload the shards into a new index
+        index_def = json.load(open(os.path.join(str(tmp_path / 'dump'), 'index.json')))
+        index_def['name'] = 'documents2'
+        transport.post(urls.create_index(), {}, index_def)
+        uploader = DocumentUploader(transport, urls, {}, workers=2, action='upload')
+        uploader.use_index_schema(index_def)
+        counts = uploader.upload_files('documents2', [s['file'] for s in manifest['shards']])
+        assert(counts['read'] == 2500)
+        assert(counts['succeeded'] == 2500)
+    finally:
+        transport.close()
+
+def test_range_filter_and_split():
+    dumper = IndexDumper(None, None, {})
+    dumper.key_name = 'pk'
+    assert(dumper.range_filter(None, None, None) is None)
+    assert(dumper.range_filter('A', 'M', "O'H") == "pk ge 'A' and pk lt 'M' and pk gt 'O''H'")
+    ranges = dumper.split_range('ab', 'ac', 'ab')
+    assert(ranges[0] == ('ab', 'ab-'))
+    assert(ranges[-1] == ('abz', 'ac'))
+    assert(len(ranges) == len(dumper.key_alphabet) + 1)
@@ -0,0 +1,50 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+from conftest import FakeResponse, TrackingTransport
+from federated import FederatedSearch, normalize_scores
+
+
+class FakeTransport(TrackingTransport):
+    """
+    Each index returns documents with scores on its own scale, after a delay of
+    0.1 seconds per index.
+    """
+
+    scales = {'documents': 10.0, 'airports': 1.0, 'empty': 0.0}
+
+    def delay(self, url):
+        return 0.1
+
+    def respond(self, url, json_body):
+        index = url.split('/indexes/')[1].split('/')[0]
+        if index == 'missing':
+            return FakeResponse(404, {'error': 'not found'})
+        scale = self.scales[index]
+        values = [{'@search.score': scale * (5 - i), 'id': '{}-{}'.format(index, i)} for i in range(5 if scale > 0 else 0)]
+        return FakeResponse(200, {'@odata.count': len(values), 'value': values[0:json_body['top']]})
+
+
+def test_normalize_scores():
+    assert(normalize_scores([]) == [])
+    values = [{'@search.score': 8.0}, {'@search.score': 4.0}, {'@search.score': 2.0}]
+    assert(normalize_scores(values) == [1.0, 2.0 / 6.0, 0.0])
+    assert(normalize_scores([{'@search.score': 3.0}, {'@search.score': 3.0}]) == [1.0, 1.0])
+
+def test_merged_top_k(tmp_path):
+    transport = FakeTransport()
+    federated = FederatedSearch(4, 5, transport)
+    federated.outfile = str(tmp_path / 'federated_search.json')
+    report = federated.run('documents,airports,empty,missing', 'charl*')
+    # the scores of each index's top 4 are normalized, so the airports rank with the documents;
+    # ties are ordered by the raw score
+    assert([doc['id'] for doc in report['value']] == ['documents-0', 'airports-0', 'documents-1', 'airports-1'])
+    assert([doc['@search.normalizedScore'] for doc in report['value']] == [1.0, 1.0, 0.666667, 0.666667])
+    assert(report['value'][1]['@search.index'] == 'airports')
+    assert(report['errors'] == 1)
+    assert(transport.peak == 4)
+    # the indexes are searched concurrently; the elapsed time is that of the slowest, not the sum
+    assert(report['sum_index_elapsed'] >= 0.4)
+    assert(report['elapsed'] < report['sum_index_elapsed'] / 2)
@@ -0,0 +1,67 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import threading
+
+from indexer_monitor import IndexerMonitor
+from mock_search_service import MockSearchService
+from transport import Transport
+
+
+def test_wait_for_runs(mock_search):
+    service, urls = mock_search(MockSearchService(indexer_seconds=0.3))
+    transport = Transport(pool_size=2)
+    sleeps = list()
+    def sleep(seconds):
+        sleeps.append(seconds)
+        threading.Event().wait(0.05)
+    try:
+        transport.post(urls.create_index(), {}, {'name': 'idx', 'fields': [{'name': 'id', 'type': 'Edm.String', 'key': True}]})
+        transport.post(urls.index_docs('idx'), {}, {'value': [{'id': str(i)} for i in range(20)]})
+        transport.post(urls.create_indexer(), {}, {'name': 'ixr', 'targetIndexName': 'idx', 'disabled': True})
+        monitor = IndexerMonitor(transport, urls, {}, min_interval=0.05, max_interval=0.2, timeout=10, sleep=sleep)
+        assert(monitor.last_start_time('ixr') is None)
+
+        transport.post(urls.run_indexer('ixr'), {})
+        result = monitor.wait('ixr')
+        assert(result['status'] == 'success')
+        assert(result['itemsProcessed'] == 20)
+        assert(result['elapsed'] == 0.3)
+        assert(result['docs_per_sec'] == 66.7)
+        assert(len(sleeps) > 0)
+
+        # the completed result of the previous run is ignored
+        previous = monitor.last_start_time('ixr')
+        threading.Event().wait(0.01)
+        transport.post(urls.run_indexer('ixr'), {})
+        result = monitor.wait('ixr', previous)
+        assert(result['status'] == 'success')
+    finally:
+        transport.close()
+
+def test_adaptive_interval_and_timeout():
+    class FakeClock(object):
+        now = 0.0
+        def __call__(self):
+            return self.now
+        def sleep(self, seconds):
+            self.now = self.now + seconds
+    clock = FakeClock()
+    monitor = IndexerMonitor(None, None, {}, min_interval=1, max_interval=4, timeout=20, clock=clock, sleep=clock.sleep)
+    statuses = [{'status': 'running', 'lastResult': {'startTime': 'a', 'status': 'inProgress', 'itemsProcessed': n}}
+                for n in [0, 10, 10, 10, 10]]
+    monitor.status = lambda name: statuses.pop(0) if len(statuses) > 1 else statuses[0]
+    try:
+        monitor.wait('ixr')
+        assert(False)
+    except TimeoutError:
+        pass
+    assert(clock.now > 20)
+
+def test_parse_time():
+    monitor = IndexerMonitor(None, None, {})
+    assert(monitor.run_seconds({'startTime': '2020-10-19T14:01:02.5Z', 'endTime': '2020-10-19T14:01:04.750Z'}) == 2.25)
+    assert(monitor.run_seconds({'startTime': '2020-10-19T14:01:02Z', 'endTime': None}) is None)
+    assert(monitor.run_seconds({'startTime': '2020-10-19T14:01:02+00:00', 'endTime': '2020-10-19T14:01:03.1234567Z'}) == 1.123)
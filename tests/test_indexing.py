@@ -0,0 +1,74 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import threading
+
+from conftest import FakeResponse
+from indexing import BatchSizer, DocumentUploader
+from schemas import Schemas
+from urls import Urls
+
+
+class FakeTransport(object):
+    """ Throttles the first post, and reports 503 for one document in the second. """
+
+    def __init__(self):
+        self.posts = list()
+        self.lock = threading.Lock()
+
+    def post(self, url, headers={}, json_body=None, **kwargs):
+        with self.lock:
+            self.posts.append(len(json_body['value']))
+            n = len(self.posts)
+        if n == 1:
+            return FakeResponse(503, {}, {'Retry-After': '0'})
+        if n == 2:
+            items = list()
+            for idx, doc in enumerate(json_body['value']):
+                if idx == 0:
+                    items.append({'key': doc['pk'], 'status': False, 'statusCode': 503})
+                else:
+                    items.append({'key': doc['pk'], 'status': True, 'statusCode': 200})
+            return FakeResponse(207, {'value': items})
+        return FakeResponse(200, {'value': []})
+
+def test_batch_sizer():
+    sizer = BatchSizer(initial_docs=100, max_docs=150)
+    sizer.on_success()
+    assert(sizer.target_docs() == 126)
+    sizer.on_success()
+    assert(sizer.target_docs() == 150)
+    sizer.on_throttle()
+    assert(sizer.target_docs() == 75)
+    for i in range(10):
+        sizer.on_throttle()
+    assert(sizer.target_docs() == 1)
+
+def test_prepare_projects_and_coerces():
+    uploader = DocumentUploader(FakeTransport(), Urls(), {})
+    uploader.use_index_schema(Schemas().read('airports_index_v1', {'name': 'airports'}))
+    doc = {'pk': 'CLT', 'name': 'Charlotte', 'latitude': '35.21', 'altitude': '748'}
+    prepared = uploader.prepare(doc)
+    assert(prepared == {'pk': 'CLT', 'name': 'Charlotte', 'latitude': 35.21, '@search.action': 'mergeOrUpload'})
+    assert(uploader.key_name == 'pk')
+
+def test_batches_respect_byte_limit():
+    uploader = DocumentUploader(FakeTransport(), Urls(), {})
+    uploader.sizer.max_bytes = 250
+    docs = [{'id': str(i), 'text': 'x' * 50} for i in range(10)]
+    sizes = [len(b) for b in uploader.batches(docs)]
+    assert(sum(sizes) == 10)
+    assert(max(sizes) == 2)
+
+def test_upload_retries_throttled_documents():
+    transport = FakeTransport()
+    uploader = DocumentUploader(transport, Urls(), {}, workers=1)
+    uploader.sizer = BatchSizer(initial_docs=10)
+    docs = [{'pk': 'A{}'.format(i)} for i in range(10)]
+    uploader.upload('airports', docs)
+    assert(transport.posts[0] == 10)                # throttled, then split in half
+    assert(uploader.counts['succeeded'] == 10)
+    assert(uploader.counts['failed'] == 0)
+    assert(uploader.counts['throttled'] == 2)
@@ -0,0 +1,148 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import json
+
+from lookup import BatchLookup, read_keys
+from mock_search_service import MockSearchService
+from scheduler import CircuitOpenError
+from transport import Transport
+
+
+def start_service(mock_search, n):
+    service = MockSearchService()
+    service.objects['indexes']['documents'] = {'name': 'documents', 'fields': [
+        {'name': 'id', 'type': 'Edm.String', 'key': 'true'}, {'name': 'url', 'type': 'Edm.String'}]}
+    service.documents['documents'] = dict()
+    for i in range(n):
+        key = 'aHR0cHM6Ly9kb2N1bWVudHMvZG9j{:04d}'.format(i)
+        service.documents['documents'][key] = {'id': key, 'url': 'https://documents/doc{}'.format(i)}
+    return mock_search(service)
+
+class FailingTransport(object):
+    """ Fails the requests whose url or body mentions one of the given keys. """
+
+    def __init__(self, transport, keys):
+        self.transport = transport
+        self.keys = keys
+
+    def check(self, text):
+        for key in self.keys:
+            if key in text:
+                raise CircuitOpenError('circuit open for 127.0.0.1; the service is failing')
+
+    def get(self, url, headers, **kwargs):
+        self.check(url)
+        return self.transport.get(url, headers, **kwargs)
+
+    def post(self, url, headers, json_body, **kwargs):
+        self.check(json.dumps(json_body))
+        return self.transport.post(url, headers, json_body, **kwargs)
+
+
+def lookup_keys():
+    present = ['aHR0cHM6Ly9kb2N1bWVudHMvZG9j{:04d}'.format(i) for i in range(0, 500, 2)]
+    missing = ['bWlzc2luZw{:04d}'.format(i) for i in range(10)] + ["o'brien", 'a|b']
+    return present, missing
+
+
+def test_read_keys(tmp_path):
+    keys_file = str(tmp_path / 'keys.txt')
+    with open(keys_file, 'wt') as f:
+        f.write('k1\n\n  k2 \nk1\nk3\n')
+    assert(read_keys(keys_file) == ['k1', 'k2', 'k3'])
+
+def test_choose_mode():
+    batch = BatchLookup(None, None, {}, workers=4)
+    assert(batch.choose_mode('auto', ['a', 'b']) == 'get')
+    assert(batch.choose_mode('auto', ['a', 'b', 'c', 'd', 'e']) == 'filter')
+    assert(batch.choose_mode('get', ['a', 'b', 'c', 'd', 'e']) == 'get')
+    try:
+        batch.choose_mode('scan', ['a'])
+        assert(False)
+    except ValueError:
+        pass
+
+def test_lookup_modes(tmp_path, mock_search):
+    service, urls = start_service(mock_search, 500)
+    transport = Transport()
+    present, missing = lookup_keys()
+    try:
+        reports = dict()
+        for mode in ['get', 'filter']:
+            requests_before = service.request_count
+            batch = BatchLookup(transport, urls, {}, workers=8, chunk_size=100)
+            batch.outdir = str(tmp_path)
+            reports[mode] = batch.lookup('documents', present + missing, mode)
+            reports[mode]['requests'] = service.request_count - requests_before
+        for report in reports.values():
+            assert(report['keys'] == 262)
+            assert(report['found'] == 250)
+            assert(report['missing'] == 12)
+            assert(report['errors'] == 0)
+            assert(sorted(report['missing_keys']) == sorted(missing))
+            assert(report['latency_ms']['p50'] > 0)
+        # each key is a request, vs the get_index request, 3 filter queries, and a get of the 'a|b' key
+        assert(reports['get']['requests'] == 262)
+        assert(reports['filter']['requests'] == 5)
+        with open(str(tmp_path / 'lookup_documents.jsonl'), 'rt') as f:
+            results = [json.loads(line) for line in f]
+        assert(len(results) == 262)
+        assert(len([r for r in results if r['found']]) == 250)
+    finally:
+        transport.close()
+
+def test_filter_mode_reads_the_index_with_the_admin_key(tmp_path, mock_search):
+    service, urls = start_service(mock_search, 20)
+    service.admin_key = 'admin'
+    transport = Transport()
+    present, missing = lookup_keys()
+    try:
+        query_headers, admin_headers = {'api-key': 'query'}, {'api-key': 'admin'}
+        batch = BatchLookup(transport, urls, query_headers, workers=2)
+        batch.outdir = str(tmp_path)
+        try:
+            batch.lookup('documents', present[0:10], 'filter')
+            assert(False)
+        except RuntimeError as e:
+            assert('403' in str(e))
+
+        batch = BatchLookup(transport, urls, query_headers, workers=2, admin_headers=admin_headers)
+        batch.outdir = str(tmp_path)
+        report = batch.lookup('documents', present[0:10] + missing[0:2], 'auto')
+        assert(report['mode'] == 'filter')
+        assert(report['found'] == 10)
+        assert(report['missing'] == 2)
+        assert(report['errors'] == 0)
+    finally:
+        transport.close()
+
+def test_failed_requests_are_recorded_per_key(tmp_path, mock_search):
+    service, urls = start_service(mock_search, 500)
+    transport = Transport()
+    present, missing = lookup_keys()
+    failing = FailingTransport(transport, [present[0], missing[0]])
+    try:
+        batch = BatchLookup(failing, urls, {}, workers=4)
+        batch.outdir = str(tmp_path)
+        report = batch.lookup('documents', present[0:10] + missing[0:2], 'get')
+        assert(report['errors'] == 2)
+        assert(report['found'] == 9)
+        assert(report['missing'] == 1)
+
+        # a failed filter query is an error of each key of its chunk
+        batch = BatchLookup(FailingTransport(transport, [present[0]]), urls, {}, workers=4, chunk_size=100)
+        batch.outdir = str(tmp_path)
+        report = batch.lookup('documents', present + missing, 'filter')
+        assert(report['keys'] == 262)
+        assert(report['errors'] == 100)
+        assert(report['found'] == 150)
+        with open(str(tmp_path / 'lookup_documents.jsonl'), 'rt') as f:
+            errors = [r for r in [json.loads(line) for line in f] if 'error' in r]
+        assert(errors[0]['key'] == present[0])
+        assert(errors[0]['status'] is None)
+        assert('circuit open' in errors[0]['error'])
+    finally:
+        transport.close()
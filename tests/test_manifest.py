@@ -0,0 +1,78 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import os
+
+from manifest import UploadManifest
+
+
+def write(path, text):
+    with open(path, 'wt') as f:
+        f.write(text)
+    return str(path)
+
+def test_refresh_and_delta(tmp_path):
+    a = write(tmp_path / 'a.pdf', 'aaaa')
+    b = write(tmp_path / 'b.pdf', 'bbbb')
+    c = write(tmp_path / 'c.pdf', 'cccc')
+    manifest_file = str(tmp_path / 'manifest.json')
+
+    m = UploadManifest(manifest_file)
+    entries = m.refresh([a, b, c])
+    assert(m.hashed == 3)
+    assert(entries[a]['size'] == 4)
+    assert(entries[a]['md5'] == 'dLhzN0VCANTTP4DEZj3F5Q==')
+    m.save()
+
+    blob_props = {
+        'a.pdf': (4, entries[a]['md5']),
+        'b.pdf': (4, 'stale'),
+        'gone.pdf': (9, 'xyz')
+    }
+    delta = m.delta(blob_props)
+    assert(delta['unchanged'] == [a])
+    assert(delta['changed'] == [b])
+    assert(delta['new'] == [c])
+    # gone.pdf has no manifest entry, so it was not uploaded by this tool
+    assert(delta['orphans'] == [])
+
+    # unchanged files are not re-hashed on the next run
+    m2 = UploadManifest(manifest_file)
+    write(tmp_path / 'c.pdf', 'cccccc')
+    m2.refresh([a, b, c])
+    assert(m2.hashed == 1)
+    assert(m2.entries[c]['size'] == 6)
+
+def test_orphans_come_from_the_previous_manifest(tmp_path):
+    a = write(tmp_path / 'a.pdf', 'aaaa')
+    b = write(tmp_path / 'b.pdf', 'bbbb')
+    manifest_file = str(tmp_path / 'manifest.json')
+    m = UploadManifest(manifest_file)
+    entries = m.refresh([a, b])
+    m.save()
+
+    os.remove(b)
+    blob_props = {
+        'a.pdf': (4, entries[a]['md5']),
+        'b.pdf': (4, entries[b]['md5']),
+        'other-tool.pdf': (5, 'xyz'),
+        'before-manifest.pdf': (6, None)
+    }
+    m2 = UploadManifest(manifest_file)
+    m2.refresh([a])
+    delta = m2.delta(blob_props)
+    assert(delta['unchanged'] == [a])
+    assert(delta['orphans'] == ['b.pdf'])
+
+    # an orphan which is not deleted stays in the manifest for the next run
+    m2.save()
+    m3 = UploadManifest(manifest_file)
+    m3.refresh([a])
+    assert(m3.delta(blob_props)['orphans'] == ['b.pdf'])
+    m3.forget_orphan('b.pdf')
+    m3.save()
+    m4 = UploadManifest(manifest_file)
+    m4.refresh([a])
+    assert(m4.delta(blob_props)['orphans'] == [])
@@ -0,0 +1,88 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import json
+
+from scheduler import RequestScheduler
+from metrics import JsonLinesSink, MetricsRecorder, operation_label, redact_headers
+from test_transport import start_server
+from transport import Transport
+
+
+class ListSink(object):
+
+    def __init__(self):
+        self.records = list()
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def close(self):
+        pass
+
+
+def test_request_records():
+    server = start_server()
+    sink = ListSink()
+    t = Transport(pool_size=2, metrics=MetricsRecorder([sink]))
+    try:
+        base = 'http://127.0.0.1:{}'.format(server.server_address[1])
+        t.post(base + '/indexes/airports/docs/search', {}, {'search': '*'})
+        t.get(base + '/indexes/airports/docs/CLT', {}, label='lookup_doc')
+        first, second = sink.records
+        assert(first['label'] == 'POST /indexes/*/docs/search')
+        assert(first['status'] == 200)
+        assert(first['reused_connection'] == False)
+        assert('connect_ms' in first and 'dns_ms' in first)
+        assert('tls_ms' not in first)
+        assert(first['ttfb_ms'] > 0)
+        assert(first['request_bytes'] == len(json.dumps({'search': '*'})))
+        assert(first['response_bytes'] > 0)
+        assert(first['retries'] == 0)
+        assert(second['label'] == 'lookup_doc')
+        assert(second['reused_connection'] == True)
+        assert('connect_ms' not in second)
+        assert(second['wall_ms'] >= second['ttfb_ms'])
+    finally:
+        t.close()
+        server.shutdown()
+        server.server_close()
+
+def test_errors_are_recorded():
+    sink = ListSink()
+    t = Transport(pool_size=1, metrics=MetricsRecorder([sink]), scheduler=RequestScheduler(max_attempts=1))
+    try:
+        t.get('http://127.0.0.1:1/indexes', {}, timeout=2)
+        assert(False)
+    except Exception:
+        pass
+    assert(sink.records[0]['status'] is None)
+    assert('error' in sink.records[0])
+
+def test_summary_and_jsonl_sink(tmp_path):
+    outfile = str(tmp_path / 'metrics.jsonl')
+    recorder = MetricsRecorder([JsonLinesSink(outfile)])
+    recorder.record({'label': 'run_indexer', 'wall_ms': 30.0, 'status': 202})
+    recorder.record({'label': 'create_index_documents', 'wall_ms': 100.0, 'status': 201, 'response_bytes': 10})
+    recorder.record({'label': 'create_index_documents', 'wall_ms': 50.0, 'status': 400, 'retries': 2})
+    recorder.close()
+    rows = MetricsRecorder.load(outfile).summary()
+    assert([r['label'] for r in rows] == ['create_index_documents', 'run_indexer'])
+    assert(rows[0]['requests'] == 2)
+    assert(rows[0]['errors'] == 1)
+    assert(rows[0]['retries'] == 2)
+    assert(rows[0]['mean_ms'] == 75.0)
+    assert(rows[0]['share'] == 0.8333)
+    assert(rows[0]['response_bytes'] == 10)
+
+def test_operation_label_and_redaction():
+    assert(operation_label('get', 'https://x.search.windows.net/indexers/documents/status?api-version=1') ==
+           'GET /indexers/*/status')
+    assert(operation_label('post', 'https://x/indexes/documents/docs/index') == 'POST /indexes/*/docs/index')
+    assert(operation_label('get', 'https://x/indexes/documents/docs/abc123') == 'GET /indexes/*/docs/*')
+    assert(operation_label('get', 'https://x/indexes') == 'GET /indexes')
+    headers = {'Content-Type': 'application/json', 'api-key': 'secret'}
+    assert(redact_headers(headers)['api-key'] == '<redacted>')
+    assert(headers['api-key'] == 'secret')
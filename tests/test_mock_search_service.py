@@ -0,0 +1,82 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import json
+
+from indexing import DocumentUploader
+from mock_search_service import MockSearchService, ODataFilter
+from schemas import Schemas
+from transport import Transport
+
+def test_odata_filter():
+    doc = {'pk': 'CLT', 'latitude': 35.2, 'size': 20000000, 'city': "Coeur d'Alene"}
+    assert(ODataFilter("pk eq 'CLT'").matches(doc))
+    assert(ODataFilter("pk gt 'CLE' and latitude lt 39").matches(doc))
+    assert(not ODataFilter("not (pk gt 'CLE') or latitude ge 39").matches(doc))
+    assert(ODataFilter("size gt 10000000").matches(doc))
+    assert(ODataFilter("search.in(pk, 'ATL|CLT', '|')").matches(doc))
+    assert(not ODataFilter("search.in(pk, 'ATL,DEN')").matches(doc))
+    assert(ODataFilter("city eq 'Coeur d''Alene'").matches(doc))
+    assert(not ODataFilter("missing gt 5").matches(doc))
+
+def test_index_lifecycle_push_search_and_lookup(mock_search):
+    service, urls = mock_search()
+    transport = Transport(pool_size=4)
+    headers = {'api-key': 'x'}
+    try:
+        schema = Schemas().read('airports_index_v1', {'name': 'airports'})
+        r = transport.post(urls.create_index(), headers, schema)
+        assert(r.status_code == 201)
+        r = transport.post(urls.create_index(), headers, schema)
+        assert(r.status_code == 409)
+
+        uploader = DocumentUploader(transport, urls, headers, workers=2)
+        uploader.use_index_schema(schema)
+        counts = uploader.upload_file('airports', 'data/us_airports.json')
+        assert(counts['failed'] == 0)
+        total = counts['succeeded']
+        assert(total > 1000)
+
+        params = {'count': True, 'search': 'charl*', 'orderby': 'pk', 'select': 'name,city,pk'}
+        resp_obj = json.loads(transport.post(urls.search_index('airports'), headers, params).text)
+        pks = [doc['pk'] for doc in resp_obj['value']]
+        assert(resp_obj['@odata.count'] == len(pks))
+        assert('CLT' in pks)
+        assert(pks == sorted(pks))
+
+        params = {'count': True, 'search': '*', 'filter': "pk gt 'X'", 'orderby': 'pk desc', 'top': 5}
+        resp_obj = json.loads(transport.post(urls.search_index('airports'), headers, params).text)
+        assert(len(resp_obj['value']) == 5)
+        assert(resp_obj['value'][0]['pk'] > resp_obj['value'][-1]['pk'] > 'X')
+
+        params = {'count': True, 'search': '*', 'top': 1500}
+        resp_obj = json.loads(transport.post(urls.search_index('airports'), headers, params).text)
+        assert(len(resp_obj['value']) == 1000)
+        assert(resp_obj['@search.nextPageParameters']['skip'] == 1000)
+
+        r = transport.get(urls.lookup_doc('airports', 'CLT'), headers)
+        assert(json.loads(r.text)['city'] == 'Charlotte')
+        assert(transport.get(urls.lookup_doc('airports', 'nope'), headers).status_code == 404)
+
+        assert(transport.delete(urls.modify_index('airports'), headers).status_code == 204)
+        assert(transport.get(urls.get_index('airports'), headers).status_code == 404)
+    finally:
+        transport.close()
+
+def test_injected_throttling_and_indexer_status(mock_search):
+    service, urls = mock_search(MockSearchService(throttle_rate=1.0, indexer_seconds=0.0))
+    transport = Transport(pool_size=2)
+    headers = {'api-key': 'x'}
+    try:
+        r = transport.get(urls.list_indexes(), headers, max_attempts=1)
+        assert(r.status_code == 503)
+        assert(r.headers['Retry-After'] == '1')
+        service.throttle_rate = 0.0
+        transport.post(urls.create_indexer(), headers, {'name': 'ixr', 'targetIndexName': 'none'})
+        assert(transport.post(urls.run_indexer('ixr'), headers).status_code == 202)
+        status = json.loads(transport.get(urls.get_indexer_status('ixr'), headers).text)
+        assert(status['lastResult']['status'] == 'success')
+    finally:
+        transport.close()
@@ -0,0 +1,86 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import io
+import json
+
+from cache import CachedResponse
+from mock_search_service import MockSearchService
+from output import ResponseWriter, output_mode_from_env, scan_json_object
+from transport import Transport
+
+
+def response_obj(n):
+    docs = [{'pk': 'k{:04d}'.format(i), 'name': 'airport "{}"'.format(i), 'latitude': 35.5 + i} for i in range(n)]
+    return {'@odata.context': 'https://x/$metadata', '@odata.count': 1234567, 'value': docs,
+            '@odata.nextLink': 'https://x/next'}
+
+
+def test_scan_json_object():
+    obj = response_obj(25)
+    text = json.dumps(obj, indent=2)
+    # small chunks split the names, strings, and numbers across reads
+    for chunk_size in [1, 7, 64, 100000]:
+        members = list(scan_json_object(io.StringIO(text), 'value', chunk_size))
+        assert([m[0] for m in members].count('value') == 25)
+        assert([m[1] for m in members if m[0] == 'value'] == obj['value'])
+        assert(('@odata.count', 1234567) in members)
+        assert(members[-1] == ('@odata.nextLink', 'https://x/next'))
+
+def test_scan_json_object_empty():
+    assert(list(scan_json_object(io.StringIO('{}'))) == [])
+    assert(list(scan_json_object(io.StringIO('{"value": [], "n": 1}'))) == [('n', 1)])
+    try:
+        list(scan_json_object(io.StringIO('{"value": [1, 2')))
+        assert(False)
+    except ValueError:
+        pass
+
+def test_save_and_summary(tmp_path):
+    writer = ResponseWriter('compact', chunk_size=16)
+    text = json.dumps(response_obj(10))
+    outfile = str(tmp_path / 'compact.json')
+    assert(writer.save(CachedResponse(200, text), outfile) == len(text))
+    with open(outfile, 'rt') as f:
+        assert(f.read() == text)
+    summary = writer.summary(outfile, 'pk')
+    assert(summary['documents'] == 10)
+    assert(summary['@odata.count'] == 1234567)
+    assert(summary['properties'] == ['@odata.context', '@odata.count', 'value', '@odata.nextLink'])
+    assert(summary['keys'][0] == 'k0000')
+    assert(summary['keys'][-1] == 'k0009')
+
+def test_output_mode_from_env(monkeypatch):
+    monkeypatch.setenv('AZURE_SEARCH_OUTPUT_MODE', 'Stream')
+    assert(output_mode_from_env() == 'stream')
+    monkeypatch.setenv('AZURE_SEARCH_OUTPUT_MODE', 'verbose')
+    try:
+        output_mode_from_env()
+        assert(False)
+    except ValueError as e:
+        assert('verbose' in str(e))
+    monkeypatch.delenv('AZURE_SEARCH_OUTPUT_MODE')
+    assert(output_mode_from_env() == 'pretty')
+
+def test_streamed_search_response(tmp_path, mock_search):
+    service = MockSearchService()
+    service.objects['indexes']['airports'] = {'name': 'airports', 'fields': [
+        {'name': 'pk', 'type': 'Edm.String', 'key': True}, {'name': 'name', 'type': 'Edm.String', 'searchable': True}]}
+    service.documents['airports'] = dict([('k{:04d}'.format(i), {'pk': 'k{:04d}'.format(i), 'name': 'a{}'.format(i)})
+                                          for i in range(300)])
+    service, urls = mock_search(service)
+    transport = Transport()
+    url = urls.search_index('airports')
+    try:
+        writer = ResponseWriter('stream', chunk_size=256)
+        r = transport.post(url, {}, {'search': '*', 'count': True, 'top': 200}, stream=True)
+        outfile = str(tmp_path / 'streamed.json')
+        writer.save(r, outfile, True)
+        summary = writer.summary(outfile, 'pk')
+        assert(summary['documents'] == 200)
+        assert(summary['@odata.count'] == 300)
+        assert(len(set(summary['keys'])) == 200)
+    finally:
+        transport.close()
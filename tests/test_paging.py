@@ -0,0 +1,67 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import json
+
+from indexing import DocumentUploader
+from paging import SearchPager
+from schemas import Schemas
+from transport import Transport
+
+
+def start_loaded_service(mock_search):
+    service, urls = mock_search()
+    transport = Transport(pool_size=4)
+    schema = Schemas().read('airports_index_v1', {'name': 'airports'})
+    transport.post(urls.create_index(), {}, schema)
+    uploader = DocumentUploader(transport, urls, {}, workers=2)
+    uploader.use_index_schema(schema)
+    uploader.upload_file('airports', 'data/us_airports.json')
+    # the airports data contains duplicate pk values, which are merged by key
+    r = transport.post(urls.search_index('airports'), {}, {'count': True, 'top': 0})
+    return urls, transport, json.loads(r.text)['@odata.count']
+
+def read_jsonl(infile):
+    with open(infile, 'rt') as f:
+        return [json.loads(line) for line in f]
+
+def test_export_sequential_and_parallel(tmp_path, mock_search):
+    urls, transport, total = start_loaded_service(mock_search)
+    try:
+        pager = SearchPager(transport, urls, {}, page_size=250)
+        params = {'count': True, 'search': '*', 'orderby': 'pk'}
+
+        outfile1 = str(tmp_path / 'seq.jsonl')
+        summary = pager.export('airports', params, outfile1)
+        assert(summary['documents'] == total)
+        assert(summary['count'] == total)
+        assert(summary['pages'] == (total + 249) // 250)
+        docs1 = read_jsonl(outfile1)
+        pks = [d['pk'] for d in docs1]
+        assert(pks == sorted(pks))
+        assert(len(set(pks)) == total)
+
+        outfile2 = str(tmp_path / 'par.jsonl')
+        summary = pager.export('airports', params, outfile2, workers=4)
+        assert(summary['documents'] == total)
+        assert(read_jsonl(outfile2) == docs1)
+    finally:
+        transport.close()
+
+def test_pages_respect_top_and_next_page_parameters(mock_search):
+    urls, transport, total = start_loaded_service(mock_search)
+    try:
+        pager = SearchPager(transport, urls, {}, page_size=100)
+        params = {'count': True, 'search': '*', 'orderby': 'pk', 'top': 230}
+        pages = list(pager.pages('airports', params))
+        assert([len(p['value']) for p in pages] == [100, 100, 30])
+
+        # a page larger than the service maximum of 1000 is continued by nextPageParameters
+        pager = SearchPager(transport, urls, {}, page_size=1500)
+        pages = list(pager.pages('airports', {'search': '*', 'orderby': 'pk'}))
+        assert(sum([len(p['value']) for p in pages]) == total)
+        assert('@search.nextPageParameters' in pages[0])
+    finally:
+        transport.close()
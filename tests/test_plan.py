@@ -0,0 +1,121 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import threading
+import time
+
+import pytest
+
+from conftest import FakeResponse
+from plan import PlanRunner, load_plan
+
+
+class FakeClient(object):
+    """ Records the order of the calls, and the peak number of concurrent calls. """
+
+    def __init__(self):
+        self.calls = list()
+        self.active, self.peak = 0, 0
+        self.lock = threading.Lock()
+
+    def call(self, name, status_code):
+        with self.lock:
+            self.active = self.active + 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.1)
+        with self.lock:
+            self.active = self.active - 1
+            self.calls.append(name)
+        return FakeResponse(status_code)
+
+    def delete_index(self, name):
+        return self.call('delete_index_' + name, 404)
+
+    def create_index(self, name, schema_file):
+        return self.call('create_index_' + name, 201)
+
+    def create_indexer(self, name, schema_file):
+        return self.call('create_indexer_' + name, 400 if name == 'bad' else 201)
+
+    def run_indexer(self, name):
+        # i.e. invoke while the circuit is open
+        self.call('run_indexer_' + name, 200)
+        return None
+
+    def wait_for_indexer(self, name):
+        self.call('wait_for_indexer_' + name, 200)
+        return {'indexer': name, 'status': 'success'}
+
+
+def step(sid, op, args, after=[], **kw):
+    s = {'id': sid, 'op': op, 'args': args, 'after': after}
+    s.update(kw)
+    return s
+
+def test_parallel_steps_and_dependencies():
+    client = FakeClient()
+    plan = {'name': 'test', 'steps': [
+        step('di1', 'delete_index', ['a'], ok_statuses=[404]),
+        step('di2', 'delete_index', ['b'], ok_statuses=[404]),
+        step('ci1', 'create_index', ['a', 's'], ['di1']),
+        step('ci2', 'create_index', ['b', 's'], ['di2']),
+        step('cx', 'create_indexer', ['a', 's'], ['ci1', 'ci2']),
+        step('w', 'wait_for_indexer', ['a'], ['cx'])]}
+    summary = PlanRunner(client, 4).run(plan)
+    assert(summary['failed'] == 0)
+    assert(client.peak == 2)
+    assert(client.calls[-2:] == ['create_indexer_a', 'wait_for_indexer_a'])
+    assert(set(client.calls[0:2]) == set(['delete_index_a', 'delete_index_b']))
+    assert([s['id'] for s in summary['steps']] == ['di1', 'di2', 'ci1', 'ci2', 'cx', 'w'])
+    assert(summary['steps'][0]['status_code'] == 404)
+    assert(summary['elapsed'] < 0.55)  # four levels of 0.1s, not six
+
+def test_failed_step_skips_dependents():
+    client = FakeClient()
+    plan = {'steps': [
+        step('di', 'delete_index', ['a']),
+        step('ci', 'create_index', ['a', 's']),
+        step('cx', 'create_indexer', ['bad', 's'], ['ci']),
+        step('w', 'wait_for_indexer', ['bad'], ['cx'])]}
+    summary = PlanRunner(client, 2).run(plan)
+    statuses = dict([(s['id'], s['status']) for s in summary['steps']])
+    assert(statuses == {'di': 'failed', 'ci': 'ok', 'cx': 'failed', 'w': 'skipped'})
+    assert(summary['failed'] == 3)
+    assert('wait_for_indexer_bad' not in client.calls)
+
+def test_no_response_fails_the_step():
+    client = FakeClient()
+    plan = {'steps': [
+        step('r', 'run_indexer', ['a']),
+        step('w', 'wait_for_indexer', ['a'], ['r'])]}
+    summary = PlanRunner(client, 2).run(plan)
+    statuses = dict([(s['id'], s['status']) for s in summary['steps']])
+    assert(statuses == {'r': 'failed', 'w': 'skipped'})
+    assert(summary['steps'][0]['error'] == 'no response')
+
+def test_validation():
+    runner = PlanRunner(FakeClient())
+    invalid_plans = [
+        {'steps': [step('a', 'create_index', []), step('a', 'create_index', [])]},
+        {'steps': [step('a', 'invoke', [])]},
+        {'steps': [step('a', 'create_index', [], ['x'])]},
+        {'steps': [step('a', 'create_index', [], ['b']), step('b', 'create_index', [], ['a'])]}]
+    for plan in invalid_plans:
+        try:
+            runner.validate(plan)
+            assert(False)
+        except ValueError:
+            pass
+
+def test_load_plans():
+    for infile in ['plans/recreate_documents.json', 'plans/reindex.json']:
+        plan = load_plan(infile)
+        PlanRunner(None).validate(plan)
+
+def test_load_yaml_plan(tmp_path):
+    pytest.importorskip('yaml')
+    yaml_file = tmp_path / 'plan.yaml'
+    yaml_file.write_text('name: y\nsteps:\n  - id: a\n    op: list_indexes\n')
+    assert(load_plan(str(yaml_file))['steps'][0]['op'] == 'list_indexes')
@@ -0,0 +1,107 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import json
+import os
+
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from dump import IndexDumper
+from mock_search_service import MockSearchService
+from reconcile import Reconciler, SpillPartitions, blob_path, decode_key, encode_key, epoch_seconds
+from transport import Transport
+
+Blob = namedtuple('Blob', ['name', 'last_modified'])
+
+container_url = 'https://cjoakimsearch.blob.core.windows.net/documents'
+
+
+def test_encode_key():
+    # a document key of the documents index
+    key = 'aHR0cHM6Ly9jam9ha2ltc2VhcmNoLmJsb2IuY29yZS53aW5kb3dzLm5ldC9kb2N1bWVudHMvMjAyMS1zdXBlci1jdWItYzEyNS1nYWxsZXJ5LTA0LTI0MDB4YXV0by5qcGc1'
+    path = blob_path(container_url, '2021-super-cub-c125-gallery-04-2400xauto.jpg')
+    assert(encode_key(path) == key)
+    assert(decode_key(key) == path)
+    assert(encode_key('ab') == 'YWI1')
+    assert(encode_key('abc') == 'YWJj0')
+    assert(decode_key('not base64!') is None)
+    assert(blob_path(container_url + '/', 'a dir/b c.pdf') == container_url + '/a%20dir/b%20c.pdf')
+
+def test_epoch_seconds():
+    expected = datetime(2020, 9, 18, 21, 19, 46, 995000, tzinfo=timezone.utc).timestamp()
+    assert(epoch_seconds('2020-09-18T21:19:46.9950000Z') == expected)
+    assert(epoch_seconds('2020-09-18T21:19:46.995+00:00') == expected)
+    assert(epoch_seconds('2020-09-18T23:19:46.995+02:00') == expected)
+    assert(epoch_seconds(datetime(2020, 9, 18, 21, 19, 46, 995000, tzinfo=timezone.utc)) == expected)
+    assert(epoch_seconds(None) is None)
+
+def test_spill_partitions(tmp_path):
+    outdir = str(tmp_path / 'spill')
+    spill = SpillPartitions(outdir, 'keys', 4)
+    for i in range(100):
+        spill.add(['key{}'.format(i), i])
+    spill.close()
+    records = list()
+    for p in range(4):
+        partition = list(spill.read(p))
+        assert(all([spill.partition(r[0]) == p for r in partition]))
+        records.extend(partition)
+    assert(sorted([r[1] for r in records]) == list(range(100)))
+    spill.remove()
+    assert(os.listdir(outdir) == [])
+
+def test_reconcile(tmp_path, mock_search):
+    service = MockSearchService()
+    service.objects['indexes']['documents'] = {'name': 'documents', 'fields': [
+        {'name': 'id', 'type': 'Edm.String', 'key': 'true'},
+        {'name': 'last_modified', 'type': 'Edm.DateTimeOffset'}]}
+    service.documents['documents'] = dict()
+    blobs = list()
+    for i in range(600):
+        name = 'doc-{:04d}.pdf'.format(i)
+        modified = datetime(2020, 9, 18, 12, 0, 0, tzinfo=timezone.utc)
+        if i % 100 == 1:
+            blobs.append(Blob(name, datetime(2020, 10, 1, 12, 0, 0, tzinfo=timezone.utc)))  # modified since indexed
+        elif i % 100 != 2:
+            blobs.append(Blob(name, modified))  # the others are deleted blobs
+        if i % 50 != 3:  # not yet indexed
+            key = encode_key(blob_path(container_url, name))
+            service.documents['documents'][key] = {'id': key, 'last_modified': '2020-09-18T12:00:00.0000000Z'}
+    service, urls = mock_search(service)
+    transport = Transport()
+    workdir = str(tmp_path / 'documents')
+    try:
+        reconciler = Reconciler(container_url, workdir, partitions=8)
+        assert(reconciler.add_blobs(iter(blobs)) == 594)
+        dumper = IndexDumper(transport, urls, {}, partitions=3, page_size=100)
+        assert(reconciler.add_index(dumper, 'documents') == 588)
+        report = reconciler.reconcile()
+        assert(report['missing'] == 12)
+        assert(report['orphaned'] == 6)
+        assert(report['stale'] == 6)
+        assert(report['matched'] == 582)
+        with open(report['files']['orphaned'], 'rt') as f:
+            orphaned = [json.loads(line) for line in f]
+        assert(sorted([o['path'] for o in orphaned])[0] == container_url + '/doc-0002.pdf')
+        with open(report['files']['missing'], 'rt') as f:
+            assert(sorted([json.loads(line)['name'] for line in f])[0] == 'doc-0003.pdf')
+        assert(sorted(os.listdir(os.path.join(workdir, 'spill'))) == [])
+    finally:
+        transport.close()
+
+def test_discard_after_a_failed_listing(tmp_path):
+    def failing_listing():
+        yield Blob('doc-0001.pdf', None)
+        raise RuntimeError('listing failed')
+    workdir = str(tmp_path / 'documents')
+    reconciler = Reconciler(container_url, workdir, partitions=4)
+    try:
+        reconciler.add_blobs(failing_listing())
+        assert(False)
+    except RuntimeError:
+        pass
+    reconciler.discard()
+    assert(os.listdir(os.path.join(workdir, 'spill')) == [])
@@ -0,0 +1,110 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import requests
+
+from scheduler import CircuitBreaker, CircuitOpenError, RequestScheduler, TokenBucket
+
+
+class FakeResponse(object):
+
+    def __init__(self, status_code, headers={}):
+        self.status_code = status_code
+        self.headers = headers
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now = self.now + seconds
+
+
+def sender(outcomes):
+    # returns a send function which yields the given responses or raises the given exceptions
+    outcomes = list(outcomes)
+    def send():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    return send
+
+def test_retries_honor_retry_after():
+    sleeps = list()
+    scheduler = RequestScheduler(sleep=sleeps.append)
+    throttled = FakeResponse(429, {'Retry-After': '2'})
+    send = sender([throttled, FakeResponse(503, {'retry-after-ms': '250'}),
+                   requests.exceptions.ConnectionError('reset'), FakeResponse(200)])
+    r, retries = scheduler.execute('post', 'https://x/indexes/a/docs/index', send)
+    assert(r.status_code == 200)
+    assert(throttled.closed)
+    assert(r.closed == False)
+    assert(retries == 3)
+    assert(sleeps[0:2] == [2.0, 0.25])
+    assert(0 <= sleeps[2] <= 2.0)
+
+def test_max_attempts_returns_last_response():
+    scheduler = RequestScheduler(max_attempts=3, sleep=lambda s: None)
+    r, retries = scheduler.execute('get', 'https://x/indexes', sender([FakeResponse(503)] * 3))
+    assert(r.status_code == 503)
+    assert(retries == 2)
+    r, retries = scheduler.execute('get', 'https://x/indexes', sender([FakeResponse(429)]), max_attempts=1)
+    assert(r.status_code == 429)
+    r, retries = scheduler.execute('get', 'https://x/indexes', sender([FakeResponse(404)]))
+    assert((r.status_code, retries) == (404, 0))
+
+def test_circuit_breaker_opens_and_recovers():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10, clock=clock)
+    breaker.on_failure()
+    assert(breaker.allow())
+    breaker.on_failure()
+    assert(breaker.state == 'open')
+    assert(breaker.allow() == False)
+    clock.now = 11
+    assert(breaker.allow())         # the trial request
+    assert(breaker.allow() == False)
+    breaker.on_failure()
+    assert(breaker.state == 'open')
+    clock.now = 22
+    assert(breaker.allow())
+    breaker.on_success()
+    assert(breaker.state == 'closed')
+
+    scheduler = RequestScheduler(max_attempts=2, failure_threshold=2, sleep=lambda s: None)
+    scheduler.execute('get', 'https://x/indexes', sender([FakeResponse(503), FakeResponse(503)]))
+    try:
+        scheduler.execute('get', 'https://x/indexes', sender([FakeResponse(200)]))
+        assert(False)
+    except CircuitOpenError:
+        pass
+    r, retries = scheduler.execute('get', 'https://other/indexes', sender([FakeResponse(200)]))
+    assert(r.status_code == 200)
+
+def test_token_bucket():
+    clock = Clock()
+    bucket = TokenBucket(rate=2, burst=2, clock=clock, sleep=clock.sleep)
+    assert(bucket.acquire() == 0.0)
+    assert(bucket.acquire() == 0.0)
+    assert(bucket.acquire() == 0.5)
+    assert(clock.now == 0.5)
+    assert(TokenBucket(0).acquire() == 0.0)
+
+def test_endpoint_class():
+    scheduler = RequestScheduler()
+    assert(scheduler.endpoint_class('post', 'https://x/indexes/a/docs/search?api-version=1') == 'query')
+    assert(scheduler.endpoint_class('get', 'https://x/indexes/a/docs/KEY') == 'query')
+    assert(scheduler.endpoint_class('post', 'https://x/indexes/a/docs/index') == 'admin')
+    assert(scheduler.endpoint_class('post', 'https://x/indexers/a/run') == 'admin')
@@ -0,0 +1,162 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import importlib.util
+import os
+import subprocess
+import sys
+
+from conftest import FakeResponse
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# search-client.py can't be imported by name, due to the hyphen
+spec = importlib.util.spec_from_file_location('search_client', os.path.join(repo_dir, 'search-client.py'))
+search_client = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(search_client)
+
+# the SearchClient constructor requires these, but the tests make no requests with them
+client_env = {
+    'AZURE_SEARCH_NAME': 'cjoakimsearch',
+    'AZURE_SEARCH_URL': 'https://cjoakimsearch.search.windows.net',
+    'AZURE_SEARCH_ADMIN_KEY': 'x',
+    'AZURE_SEARCH_QUERY_KEY': 'x'
+}
+for name, value in client_env.items():
+    os.environ.setdefault(name, value)
+
+
+def test_commands_are_client_methods():
+    for func, (method_name, arg_specs) in search_client.commands.items():
+        assert(callable(getattr(search_client.SearchClient, method_name, None)))
+
+def test_command_args():
+    assert(search_client.command_args('get_index', ['airports']) == ('get_index', ['airports']))
+    method_name, args = search_client.command_args('upload_documents', ['airports', 'data/us_airports.json'])
+    assert(args == ['airports', 'data/us_airports.json', None, 4])
+    method_name, args = search_client.command_args('bench_searches', ['auto', 'all', '20'])
+    assert(args == ['auto', 'all', 20, 4, 'bench'])
+    method_name, args = search_client.command_args('reindex', ['airports,documents'])
+    assert(args == [['airports', 'documents']])
+
+def test_command_args_missing():
+    try:
+        search_client.command_args('create_index', ['airports'])
+        assert(False)
+    except ValueError as e:
+        assert('create_index requires 2' in str(e))
+
+def test_run_command_circuit_open():
+    from scheduler import CircuitOpenError
+    client = search_client.SearchClient()
+    def search_index(idx_name, search_name, additional):
+        raise CircuitOpenError('circuit open for x; the service is failing')
+    client.search_index = search_index
+    search_client.run_command(client, 'search_index', ['airports', 'all_airports', None])
+    assert(client.failures == 1)
+    def get_index(name):
+        raise ValueError('other errors are not caught')
+    client.get_index = get_index
+    try:
+        search_client.run_command(client, 'get_index', ['airports'])
+        assert(False)
+    except ValueError:
+        pass
+
+def test_recreate_stops_at_the_first_failed_step():
+    client = search_client.SearchClient()
+    calls = list()
+    def call(name, result):
+        def f(*args):
+            calls.append(name)
+            return result
+        return f
+    client.teardown = call('teardown', True)
+    client.create_cosmos_datasource = call('create_cosmos_datasource', FakeResponse(201))
+    client.wait_for_object = call('wait_for_object', True)
+    client.create_index = call('create_index', FakeResponse(201))
+    client.create_indexer = call('create_indexer', FakeResponse(400))
+    client.wait_for_indexer = call('wait_for_indexer', {'status': 'success'})
+    result = client.recreate_airports()
+    assert(result['status'] == 'error')
+    assert(calls[-1] == 'create_indexer')
+    assert('wait_for_indexer' not in calls)
+
+    calls.clear()
+    client.create_index = call('create_index', None)  # i.e. the circuit is open
+    assert(client.recreate_airports()['status'] == 'error')
+    assert(calls[-1] == 'create_index')
+
+    calls.clear()
+    client.create_index = call('create_index', FakeResponse(201))
+    client.create_indexer = call('create_indexer', FakeResponse(201))
+    assert(client.recreate_airports() == {'status': 'success'})
+    assert(calls[-1] == 'wait_for_indexer')
+
+def test_wait_for_indexer_errors(monkeypatch):
+    import indexer_monitor
+    client = search_client.SearchClient()
+    def timeout(self, name, previous_start=None):
+        raise TimeoutError('indexer {} did not complete within 3600 seconds'.format(name))
+    def error(self, name, previous_start=None):
+        raise RuntimeError('get_indexer_status failed: 404')
+    monkeypatch.setattr(indexer_monitor.IndexerMonitor, 'wait', timeout)
+    assert(client.wait_for_indexer('airports')['status'] == 'timeout')
+    monkeypatch.setattr(indexer_monitor.IndexerMonitor, 'wait', error)
+    assert(client.wait_for_indexer('airports')['status'] == 'error')
+    assert(client.failures == 2)
+
+def test_wait_for_object_statuses(monkeypatch):
+    from scheduler import CircuitOpenError
+    client = search_client.SearchClient()
+    class FakeTransport(object):
+        def __init__(self, outcomes):
+            self.outcomes = list(outcomes)
+        def get(self, url, headers):
+            outcome = self.outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return FakeResponse(outcome)
+    monkeypatch.setattr(search_client.time, 'sleep', lambda seconds: None)
+
+    # only a 404 is deleted; a throttled or failed read is retried
+    client._transport = FakeTransport([200, 503, 500, 404])
+    assert(client.wait_for_object('indexes', 'airports', False))
+    assert(client._transport.outcomes == [])
+    client._transport = FakeTransport([404, 503, 200])
+    assert(client.wait_for_object('indexes', 'airports', True))
+    assert(client.failures == 0)
+
+    client._transport = FakeTransport([CircuitOpenError('circuit open for x; the service is failing')])
+    assert(client.wait_for_object('indexes', 'airports', False) == False)
+    import requests
+    client._transport = FakeTransport([requests.exceptions.ConnectionError('refused')])
+    assert(client.wait_for_object('indexes', 'airports', True) == False)
+    assert(client.failures == 2)
+
+def test_count_failure_on_several_threads():
+    from concurrent.futures import ThreadPoolExecutor
+    client = search_client.SearchClient()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for i in range(2000):
+            executor.submit(client.count_failure)
+    assert(client.failures == 2000)
+
+def test_lazy_dependencies():
+    client = search_client.SearchClient()
+    assert(client._transport is None)
+    assert(client._named_searches is None)
+    assert(client.urls is client.urls)
+    assert(client._transport is None)
+
+def test_display_env_does_not_import_requests():
+    code = "import runpy, sys; sys.argv = ['search-client.py', 'display_env']; " + \
+           "runpy.run_path('search-client.py', run_name='__main__'); " + \
+           "print('loaded: {}'.format(sorted([m for m in ['requests', 'docopt', 'schemas', 'transport'] if m in sys.modules])))"
+    env = dict(os.environ)
+    env['PYTHONPATH'] = repo_dir
+    p = subprocess.run([sys.executable, '-c', code], cwd=repo_dir, env=env, capture_output=True, text=True)
+    assert(p.returncode == 0)
+    assert('loaded: []' in p.stdout)
@@ -0,0 +1,200 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import copy
+import importlib.util
+import os
+
+from conftest import FakeResponse
+from mock_search_service import MockSearchService
+from schemas import Schemas
+from sync import SchemaSync, project
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeClient(object):
+
+    def __init__(self):
+        self.schemas = Schemas()
+
+
+class FakeCache(object):
+
+    def invalidate(self, index_name=None):
+        pass
+
+
+class ApplyClient(FakeClient):
+    """ Fails the PUT of the named objects, and optionally the wait for a delete. """
+
+    def __init__(self, failing_puts=[], deleted=True):
+        FakeClient.__init__(self)
+        self.urls = self
+        self.admin_headers = {}
+        self.cache = FakeCache()
+        self.failing_puts = failing_puts
+        self.deleted = deleted
+        self.calls = list()
+        self.reindexed = list()
+        self.failures = 0
+
+    def object(self, collection, name):
+        return '{}/{}'.format(collection, name)
+
+    def invoke(self, function_name, method, url, headers={}, json_body={}, ok_statuses=[]):
+        self.calls.append((method, url))
+        if method == 'put' and url in self.failing_puts:
+            self.count_failure()
+            return FakeResponse(400)
+        return FakeResponse(201)
+
+    def wait_for_object(self, collection, name, exists=True):
+        if not self.deleted:
+            self.count_failure()
+        return self.deleted
+
+    def count_failure(self, n=1):
+        self.failures = self.failures + n
+
+    def reindex(self, names):
+        self.reindexed.extend(names)
+
+
+def desired(collection, name, action, body={}):
+    return {'collection': collection, 'name': name, 'schema': '', 'action': action,
+            'body': dict(body, name=name), 'diffs': []}
+
+def index_schema():
+    return Schemas().read('airports_index_v1', {'name': 'airports'})
+
+def live_index(schema):
+    # as returned by the service; booleans, defaults for the unspecified attributes, and an etag
+    live = copy.deepcopy(project(schema, schema))
+    live['@odata.etag'] = '"0x8D85C1AF6F77C63"'
+    for field in live['fields']:
+        field['retrievable'] = True
+        field['analyzer'] = None
+    return live
+
+def search_client():
+    for name, value in {'AZURE_SEARCH_NAME': 'cjoakimsearch', 'AZURE_SEARCH_ADMIN_KEY': 'x',
+                        'AZURE_SEARCH_QUERY_KEY': 'x'}.items():
+        os.environ.setdefault(name, value)
+    spec = importlib.util.spec_from_file_location('search_client', os.path.join(repo_dir, 'search-client.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.SearchClient()
+
+
+def test_project():
+    desired = {'name': 'x', 'fields': [{'name': 'a', 'key': 'true'}, {'name': 'b', 'searchable': 'false'}]}
+    live = {'name': 'x', '@odata.etag': 'e', 'fields': [{'name': 'b', 'searchable': False, 'analyzer': None},
+                                                        {'name': 'a', 'key': True, 'retrievable': True}]}
+    assert(project(desired, live) == {'name': 'x', 'fields': [{'name': 'a', 'key': True}, {'name': 'b', 'searchable': False}]})
+    assert(project(desired, live) == project(desired, desired))
+
+def test_project_ignores_secrets():
+    desired = {'cognitiveServices': {'@odata.type': '#Microsoft.Azure.Search.CognitiveServicesByKey', 'key': 'secret'}}
+    live = {'cognitiveServices': {'@odata.type': '#Microsoft.Azure.Search.CognitiveServicesByKey', 'key': None}}
+    assert(project(desired, live) == project(desired, desired))
+
+def test_diff_none_and_create():
+    sync = SchemaSync(FakeClient())
+    schema = index_schema()
+    assert(sync.diff('indexes', schema, None) == ('create', []))
+    assert(sync.diff('indexes', schema, live_index(schema)) == ('none', []))
+
+def test_diff_added_field_is_an_update():
+    sync = SchemaSync(FakeClient())
+    schema = index_schema()
+    live = live_index(schema)
+    schema['fields'].insert(2, {'name': 'state', 'type': 'Edm.String', 'filterable': 'true'})
+    action, diffs = sync.diff('indexes', schema, live)
+    assert(action == 'update')
+    assert(diffs == [('field not in file1', 'state', {'name': 'state', 'type': 'Edm.String', 'filterable': True})])
+
+def test_diff_changed_or_removed_field_is_a_rebuild():
+    sync = SchemaSync(FakeClient())
+    schema = index_schema()
+    live = live_index(schema)
+    schema['fields'][5]['type'] = 'Edm.String'
+    action, diffs = sync.diff('indexes', schema, live)
+    assert(action == 'rebuild')
+    assert(diffs[0][0:2] == ('field is different', 'latitude'))
+
+    schema = index_schema()
+    del schema['fields'][-1]
+    action, diffs = sync.diff('indexes', schema, live)
+    assert(action == 'rebuild')
+    assert(diffs[0][0:2] == ('field not in file2', 'timezone_code'))
+
+def test_diff_updatable_changes():
+    sync = SchemaSync(FakeClient())
+    schema = index_schema()
+    live = live_index(schema)
+    schema['fields'][1]['synonymMaps'] = ['synmap']
+    assert(sync.diff('indexes', schema, live)[0] == 'update')
+
+    indexer = {'name': 'airports', 'targetIndexName': 'airports', 'schedule': {'interval': 'PT2H'}}
+    live = dict(indexer, schedule={'interval': 'PT12H'}, description=None)
+    action, diffs = sync.diff('indexers', indexer, live)
+    assert(action == 'update')
+    assert(diffs == [('property is different', 'schedule', {'interval': 'PT12H'}, {'interval': 'PT2H'})])
+
+def test_apply_skips_dependents_of_failed_puts():
+    client = ApplyClient(failing_puts=['indexes/airports'])
+    objects = [desired('indexes', 'airports', 'create'),
+               desired('indexes', 'documents', 'update'),
+               desired('indexers', 'airports', 'create', {'targetIndexName': 'airports'}),
+               desired('indexers', 'documents', 'update', {'targetIndexName': 'documents'})]
+    SchemaSync(client).apply(objects)
+    assert([obj['status'] for obj in objects] == ['failed', 'ok', 'skipped', 'ok'])
+    assert(('put', 'indexers/airports') not in client.calls)
+    assert(client.failures == 2)
+
+def test_apply_rebuild_waits_for_the_delete():
+    client = ApplyClient(deleted=False)
+    objects = [desired('indexes', 'airports', 'rebuild'),
+               desired('indexers', 'airports', 'none', {'targetIndexName': 'airports'})]
+    SchemaSync(client).apply(objects)
+    assert(objects[0]['status'] == 'failed')
+    assert(client.calls == [('delete', 'indexes/airports')])
+    assert(client.reindexed == [])
+
+    client = ApplyClient()
+    objects = [desired('indexes', 'airports', 'rebuild'),
+               desired('indexers', 'airports', 'none', {'targetIndexName': 'airports'})]
+    SchemaSync(client).apply(objects)
+    assert(client.calls == [('delete', 'indexes/airports'), ('put', 'indexes/airports')])
+    assert(client.reindexed == ['airports'])
+
+def test_sync_against_mock_service(tmp_path, mock_search):
+    service, urls = mock_search(MockSearchService(indexer_seconds=0.1))
+    client = search_client()
+    client.urls.search_url = urls.search_url
+    client.outdir = str(tmp_path)
+    state = {'synonymmaps': [{'name': 'synmap', 'schema': 'synonym_map_v1'}],
+             'indexes': [{'name': 'airports', 'schema': 'airports_index_v1'}],
+             'indexers': [{'name': 'airports', 'schema': 'airports_indexer_v1'}]}
+    try:
+        objects = SchemaSync(client).run(state, True)
+        assert([obj['action'] for obj in objects] == ['create', 'create', 'create'])
+        assert(sorted(service.objects['indexes'].keys()) == ['airports'])
+
+        # the service is now in the desired state, so nothing is changed
+        requests_before = service.request_count
+        objects = SchemaSync(client).run(state, True)
+        assert([obj['action'] for obj in objects] == ['none', 'none', 'none'])
+        assert(service.request_count - requests_before == 3)
+
+        # a removed field rebuilds the index, and reruns its indexer
+        service.objects['indexes']['airports']['fields'].append({'name': 'extra', 'type': 'Edm.String'})
+        objects = SchemaSync(client).run(state, True)
+        assert([obj['action'] for obj in objects] == ['none', 'rebuild', 'none'])
+        assert(len(service.objects['indexes']['airports']['fields']) == 8)
+        assert(client.failures == 0)
+    finally:
+        client.transport.close()
@@ -0,0 +1,64 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join('FunctionApp'))
+sys.path.insert(0, os.path.join('FunctionApp', 'TopWordsSkill'))
+
+import benchmark_topwords
+import topwords
+
+
+def test_sample_post_body():
+    text = 'The quick brown fox jumped over the lazy lazy lazy lazy dog, like a fox'
+    result = json.loads(topwords.getTopWords(text))
+    assert(result == ['lazy', 'fox', 'quick', 'brown', 'jumped', 'dog', 'like'])
+
+def test_scrubbing():
+    text = "Python's (dataframe) [Pandas]. \"Pandas\"!\tpandas?\nNumPy,numpy"
+    words = topwords.tokenize(text)
+    assert(words == ['pythons', 'dataframe', 'pandas', 'pandas', 'pandas', 'numpynumpy'])
+
+def test_max_words():
+    text = ' '.join(['word{}'.format(i) for i in range(5000)])
+    words = topwords.tokenize(text)
+    assert(len(words) == topwords.max_words)
+    assert(words[-1] == 'word1999')
+
+def test_same_results_as_legacy_implementation():
+    samples = benchmark_topwords.load_samples()
+    for sample in samples:
+        text = sample['mergedText']
+        assert(topwords.getTopWords(text) == benchmark_topwords.legacy_get_top_words(text))
+
+    alphabet = list('abcdeABCDE  \n\t.,!?\'"()[]\r-:Σς') + ['The', ' the ', ' and ']
+    rnd = random.Random(42)
+    for i in range(200):
+        text = ''.join([rnd.choice(alphabet) for j in range(400)])
+        assert(topwords.getTopWords(text) == benchmark_topwords.legacy_get_top_words(text))
+
+def test_document_scope_counts_past_max_words():
+    text = ' '.join(['filler{}'.format(i) for i in range(3000)]) + ' panda' * 5 + ' bamboo' * 3
+    assert(json.loads(topwords.getTopWords(text, 'prefix')) == [
+        'filler{}'.format(i) for i in range(20)])
+    result = json.loads(topwords.getTopWords(text, 'document'))
+    assert(result[0:2] == ['panda', 'bamboo'])
+
+def test_top_k_counter_bounded():
+    counter = topwords.TopKCounter(capacity=50, width=1024, depth=4)
+    rnd = random.Random(7)
+    for i in range(20000):
+        if i % 4 == 0:
+            counter.add('frequent{}'.format(i % 5))
+        else:
+            counter.add('rare{}'.format(rnd.randint(0, 100000)))
+    assert(len(counter.candidates) <= 50)
+    assert(len(counter.heap) <= 200)
+    top = [word for word, count in counter.most_common(5)]
+    assert(sorted(top) == ['frequent{}'.format(i) for i in range(5)])
@@ -0,0 +1,69 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import json
+import os
+import sys
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+sys.path.insert(0, os.path.join('FunctionApp'))
+
+import TopWordsSkill as skill
+
+text = 'The quick brown fox jumped over the lazy lazy lazy lazy dog, like a fox'
+expected = '["lazy", "fox", "quick", "brown", "jumped", "dog", "like"]'
+
+
+def broken_pool():
+    pool = ProcessPoolExecutor(max_workers=1)
+    try:
+        pool.submit(os._exit, 1).result()
+    except BrokenProcessPool:
+        pass
+    return pool
+
+def test_inline_path(monkeypatch):
+    monkeypatch.setattr(skill, 'large_text_chars', 1000)
+    recordId, t, work = skill.submit_value({'recordId': 'r1', 'data': {'text': text}})
+    assert(recordId == 'r1')
+    assert(work == expected)
+    assert(skill.transform_value(recordId, t, work) == {'recordId': 'r1', 'data': {'text': expected}})
+
+def test_pool_path(monkeypatch):
+    monkeypatch.setattr(skill, 'large_text_chars', 10)
+    recordId, t, work = skill.submit_value({'recordId': 'r1', 'data': {'text': text}})
+    assert(isinstance(work, Future))
+    assert(skill.transform_value(recordId, t, work)['data']['text'] == expected)
+
+def test_record_errors_are_isolated(monkeypatch):
+    monkeypatch.setattr(skill, 'large_text_chars', 40)
+    body = {'values': [
+        {'recordId': 'r1', 'data': {'text': text}},
+        {'recordId': 'r2', 'data': {}},
+        {'recordId': 'r3', 'data': {'text': 'fox fox dog'}},
+        {'recordId': 'r4', 'data': {'text': None}}
+    ]}
+    values = json.loads(skill.compose_response(body))['values']
+    assert([v['recordId'] for v in values] == ['r1', 'r2', 'r3', 'r4'])
+    assert(values[0]['data']['text'] == expected)
+    assert('errors' in values[1])
+    assert(values[2]['data']['text'] == '["fox", "dog"]')
+    assert('errors' in values[3])
+
+def test_broken_pool_is_replaced(monkeypatch):
+    monkeypatch.setattr(skill, 'large_text_chars', 10)
+    pool = broken_pool()
+    monkeypatch.setattr(skill, 'process_pool', pool)
+    recordId, t, work = skill.submit_value({'recordId': 'r1', 'data': {'text': text}})
+    assert(skill.process_pool is not pool)
+    assert(skill.transform_value(recordId, t, work)['data']['text'] == expected)
+
+    # a record whose worker died is resubmitted to a new pool
+    monkeypatch.setattr(skill, 'process_pool', broken_pool())
+    work = Future()
+    work.set_exception(BrokenProcessPool('a worker died'))
+    assert(skill.transform_value('r2', text, work)['data']['text'] == expected)
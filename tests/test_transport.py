@@ -0,0 +1,68 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import json
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from transport import Transport
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.reply({'method': 'GET', 'path': self.path})
+
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        body = json.loads(self.rfile.read(length))
+        self.reply({'method': 'POST', 'body': body})
+
+    def reply(self, obj):
+        data = json.dumps(obj).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), EchoHandler)
+    server.daemon_threads = True
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    return server
+
+def test_connections_are_reused():
+    server = start_server()
+    t = Transport(pool_size=2)
+    try:
+        url = 'http://127.0.0.1:{}/indexes'.format(server.server_address[1])
+        for i in range(5):
+            r = t.get(url, {'api-key': 'x'})
+            assert(r.status_code == 200)
+        r = t.post(url, {}, {'search': '*'})
+        assert(json.loads(r.text)['body'] == {'search': '*'})
+        stats = t.stats()['127.0.0.1:{}'.format(server.server_address[1])]
+        assert(stats['requests'] == 6)
+        assert(stats['connections'] == 1)
+        assert(stats['reused'] == 5)
+    finally:
+        t.close()
+        server.shutdown()
+        server.server_close()
+
+def test_invalid_method():
+    t = Transport(pool_size=1)
+    try:
+        t.request('patch', 'http://127.0.0.1:1/')
+        assert(False)
+    except ValueError:
+        pass
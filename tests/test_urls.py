@@ -217,3 +217,17 @@ def test_lookup_doc():
     assert(valid_url(url))
     assert(valid_version(url))
     assert(path(url) == '/indexes/things/docs/x123?api-version=2020-06-30')
+
+def test_index_docs():
+    url = Urls().index_docs('airports')
+    print('url: ' + url)
+    assert(valid_url(url))
+    assert(valid_version(url))
+    assert(path(url) == '/indexes/airports/docs/index?api-version=2020-06-30')
+
+def test_object():
+    url = Urls().object('datasources', 'azureblob-documents')
+    print('url: ' + url)
+    assert(valid_url(url))
+    assert(valid_version(url))
+    assert(path(url) == '/datasources/azureblob-documents?api-version=2020-06-30')
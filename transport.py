@@ -0,0 +1,156 @@
+__author__  = 'Chris Joakim'
+__email__   = "chjoakim@microsoft.com,christopher.joakim@gmail.com"
+__license__ = "MIT"
+__version__ = "2020.10.19"
+
+import os
+import threading
+import time
+import weakref
+
+from urllib.parse import urlparse
+
+import requests
+
+from metrics import MetricsRecorder, TimedHTTPAdapter
+from metrics import current_phases, operation_label, reset_phases
+from scheduler import RequestScheduler
+
+
+class Transport(object):
+    """
+    An instance of this class is created in main class SearchClient.  It holds a
+    single pooled, keep-alive requests.Session so that the many HTTP requests to
+    the Azure Search Service reuse their TCP+TLS connections rather than paying
+    a new handshake per call.  Per-host connection reuse statistics are kept, and
+    each request is timed and passed to the MetricsRecorder.  Requests are sent
+    via the RequestScheduler, which rate limits and retries them.
+    """
+
+    def __init__(self, pool_size=None, pool_connections=None, metrics=None, scheduler=None):
+        if pool_size is None:
+            pool_size = int(os.environ.get('AZURE_SEARCH_POOL_SIZE', '10'))
+        if pool_connections is None:
+            pool_connections = int(os.environ.get('AZURE_SEARCH_POOL_CONNECTIONS', '4'))
+        self.pool_size = pool_size
+        self.pool_connections = pool_connections
+        self.adapter = TimedHTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_size, pool_block=False)
+        self.session = requests.Session()
+        self.session.headers['Connection'] = 'keep-alive'
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self.host_stats = dict()
+        self.pool_seen = weakref.WeakKeyDictionary()
+        self.lock = threading.Lock()
+        self.metrics = metrics
+        if self.metrics is None:
+            self.metrics = MetricsRecorder.from_env()
+        self.scheduler = scheduler
+        if self.scheduler is None:
+            self.scheduler = RequestScheduler.from_env()
+
+    def get(self, url, headers={}, **kwargs):
+        return self.request('get', url, headers, None, **kwargs)
+
+    def post(self, url, headers={}, json_body=None, **kwargs):
+        return self.request('post', url, headers, json_body, **kwargs)
+
+    def put(self, url, headers={}, json_body=None, **kwargs):
+        return self.request('put', url, headers, json_body, **kwargs)
+
+    def delete(self, url, headers={}, **kwargs):
+        return self.request('delete', url, headers, None, **kwargs)
+
+    def request(self, method, url, headers={}, json_body=None, label=None, max_attempts=None, **kwargs):
+        # max_attempts=1 disables the retries, for callers with their own retry logic
+        method = method.lower()
+        if method not in ['get', 'post', 'put', 'delete']:
+            raise ValueError('unexpected http method: {}'.format(method))
+        if method in ['post', 'put']:
+            kwargs['json'] = json_body
+        if label is None:
+            label = operation_label(method, url)
+        reset_phases()
+        t1 = time.perf_counter()
+        def send():
+            return self.session.request(method.upper(), url, headers=headers, **kwargs)
+        try:
+            r, retries = self.scheduler.execute(method, url, send, max_attempts)
+        except Exception as e:
+            self.record_metrics(label, method, url, None, t1, kwargs, 0, e)
+            raise
+        self.record_metrics(label, method, url, r, t1, kwargs, retries)
+        self.record(url, r)
+        return r
+
+    def record_metrics(self, label, method, url, r, t1, kwargs, retries, error=None):
+        m = {'ts': round(time.time(), 3), 'label': label, 'method': method.upper()}
+        m['host'] = urlparse(url).netloc
+        m['path'] = urlparse(url).path
+        m['wall_ms'] = round((time.perf_counter() - t1) * 1000.0, 3)
+        for name, value in current_phases().items():
+            if name != 'connect_total_ms':
+                m[name] = round(value, 3)
+        m['reused_connection'] = 'connect_total_ms' not in current_phases()
+        m['status'], m['request_bytes'], m['response_bytes'], m['retries'] = None, None, None, retries
+        if r is not None:
+            m['status'] = r.status_code
+            body = r.request.body
+            m['request_bytes'] = len(body) if body is not None else 0
+            if kwargs.get('stream'):
+                # don't consume a streamed body; use the declared length, if any
+                length = r.headers.get('Content-Length')
+                m['response_bytes'] = int(length) if length is not None else None
+            else:
+                m['response_bytes'] = len(r.content)
+            urllib3_retries = getattr(r.raw, 'retries', None)
+            if urllib3_retries is not None:
+                m['retries'] = m['retries'] + len(urllib3_retries.history)
+        if error is not None:
+            m['error'] = str(error)
+        self.metrics.record(m)
+
+    def record(self, url, r):
+        # urllib3 keeps one connection pool per scheme/host/port; its counters tell
+        # us how many requests were sent vs how many new connections were opened.
+        host = urlparse(url).netloc
+        pool = getattr(r.raw, '_pool', None)
+        if pool is None:
+            pool = self.adapter.poolmanager.connection_from_url(url)
+        with self.lock:
+            if host not in self.host_stats:
+                self.host_stats[host] = {'requests': 0, 'connections': 0}
+            stats = self.host_stats[host]
+            stats['requests'] = stats['requests'] + 1
+            # a pool evicted from the poolmanager is replaced by a new one whose
+            # counters start over at zero, so accumulate per-pool deltas
+            seen = self.pool_seen.get(pool, 0)
+            stats['connections'] = stats['connections'] + (pool.num_connections - seen)
+            self.pool_seen[pool] = pool.num_connections
+
+    def stats(self):
+        results = dict()
+        with self.lock:
+            for host in sorted(self.host_stats.keys()):
+                s = self.host_stats[host]
+                reused = max(s['requests'] - s['connections'], 0)
+                ratio = 0.0
+                if s['requests'] > 0:
+                    ratio = float(reused) / float(s['requests'])
+                results[host] = {
+                    'requests': s['requests'],
+                    'connections': s['connections'],
+                    'reused': reused,
+                    'reuse_ratio': round(ratio, 4)
+                }
+        return results
+
+    def display_stats(self):
+        for host, s in self.stats().items():
+            print('transport: {}  requests: {}  connections: {}  reused: {}  reuse_ratio: {}'.format(
+                host, s['requests'], s['connections'], s['reused'], s['reuse_ratio']))
+
+    def close(self):
+        self.session.close()
+        self.metrics.close()
@@ -82,11 +82,18 @@ class Urls(BaseClass):
     def modify_skillset(self, name):
         return '{}/skillsets/{}?api-version={}'.format(self.search_url, name, self.search_api_version)
 
+    def object(self, collection, name):
+        # the url of any named object; i.e. collection 'indexes', 'indexers', or 'datasources'
+        return '{}/{}/{}?api-version={}'.format(self.search_url, collection, name, self.search_api_version)
+
     def search_index(self, idx_name):
         return '{}/indexes/{}/docs/search?api-version={}'.format(self.search_url, idx_name, self.search_api_version)
 
     def lookup_doc(self, index_name, doc_key):
         return '{}/indexes/{}/docs/{}?api-version={}'.format(self.search_url, index_name, doc_key, self.search_api_version)
 
+    def index_docs(self, index_name):
+        return '{}/indexes/{}/docs/index?api-version={}'.format(self.search_url, index_name, self.search_api_version)
+
 
 